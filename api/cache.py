@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from core.models import ContentVersion, Route, RoutePoint, Point, PointPhoto, PointAudio, PointVideo
+
+# Модели, от которых зависит ответ API маршрутов, и ключи их версий в ContentVersion
+CONTENT_MODELS = (Route, RoutePoint, Point, PointPhoto, PointAudio, PointVideo)
+CONTENT_VERSION_KEYS = ('routes', 'route_points', 'points')
+
+
+class ContentVersionCheck:
+    """
+    Общая версия контента из ContentVersion. Читается из базы не чаще раза в refresh_interval
+    секунд; изменения в этом же процессе (сигналы моделей) заставляют перечитать её сразу.
+    """
+
+    def __init__(self, keys=CONTENT_VERSION_KEYS, refresh_interval=1.0):
+        self.keys = keys
+        self.refresh_interval = refresh_interval
+        self._version = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def current(self):
+        if monotonic() - self._checked < self.refresh_interval:
+            return self._version
+        with self._lock:
+            if monotonic() - self._checked >= self.refresh_interval:
+                versions = dict(ContentVersion.objects.filter(key__in=self.keys).values_list('key', 'version'))
+                self._version = tuple(versions.get(key, 0) for key in self.keys)
+                self._checked = monotonic()
+        return self._version
+
+    def invalidate(self, **kwargs):
+        self._checked = float('-inf')
+
+
+content_version = ContentVersionCheck()
+for model in CONTENT_MODELS:
+    post_save.connect(content_version.invalidate, sender=model, dispatch_uid=f'api_cache_{model.__name__}_save')
+    post_delete.connect(content_version.invalidate, sender=model, dispatch_uid=f'api_cache_{model.__name__}_delete')
+
+
+class _Entry:
+    __slots__ = ('version', 'expires', 'etag', 'content', 'content_type')
+
+    def __init__(self, version, expires, etag, content, content_type):
+        self.version = version
+        self.expires = expires
+        self.etag = etag
+        self.content = content
+        self.content_type = content_type
+
+
+class VersionedResponseCacheMixin:
+    """
+    Кэш готовых GET-ответов публичного API в памяти процесса, пока не изменилась версия контента.
+
+    Повторный запрос отдаёт сохранённые байты без обращения к базе и сериализации, а с
+    If-None-Match и тем же ETag — 304 без тела. ETag — хэш тела ответа, поэтому он строгий.
+    Записи живут не дольше половины срока подписанных ссылок на медиа в S3, иначе клиент
+    получил бы просроченные ссылки.
+    """
+
+    content_version = content_version
+    response_cache_ttl = getattr(settings, 'AWS_QUERYSTRING_EXPIRE', 3600) / 2
+    response_cache_size = 256
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._responses = OrderedDict()  # (путь с параметрами, Accept) -> _Entry
+        cls._responses_lock = threading.Lock()
+
+    def _cached_response(self, request, entry):
+        if entry.etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(entry.content, content_type=entry.content_type)
+        response['ETag'] = entry.etag
+        # Клиент хранит ответ, но каждый раз сверяет ETag: контент может измениться в любой момент
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = (request.get_full_path(), request.META.get('HTTP_ACCEPT', ''))
+        version = self.content_version.current()
+        entry = self._responses.get(key)
+        if entry is not None and entry.version == version and monotonic() < entry.expires:
+            return self._cached_response(request, entry)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        response.render()
+        etag = f'"{hashlib.blake2b(response.content, digest_size=16).hexdigest()}"'
+        entry = _Entry(version, monotonic() + self.response_cache_ttl, etag, response.content, response['Content-Type'])
+        with self._responses_lock:
+            self._responses[key] = entry
+            self._responses.move_to_end(key)
+            while len(self._responses) > self.response_cache_size:
+                self._responses.popitem(last=False)
+        return self._cached_response(request, entry)
@@ -0,0 +1,164 @@
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from core.models import Route, RouteGeometry, RoutePoint, PointPhoto, PointAudio, PointVideo
+from core.route_geometry import compute_route_geometries
+
+_datetime = serializers.DateTimeField().to_representation
+
+
+def _uuid(value):
+    return str(value) if value is not None else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def _file(storage):
+    """Как FileField в DRF без request в контексте: url из хранилища или None"""
+    def represent(name):
+        return storage.url(name) if name else None
+    return represent
+
+
+def _compile(model, fields):
+    """
+    Заранее собранная карта полей: (ключ в ответе, поле в .values(), функция представления).
+    Функции повторяют to_representation полей, которые ModelSerializer строит для этих моделей.
+    """
+    compiled = []
+    for name, source in fields:
+        field = model._meta.get_field(name)
+        internal = field.get_internal_type()
+        if internal == 'UUIDField' or field.is_relation:
+            represent = _uuid
+        elif internal == 'FloatField':
+            represent = _float
+        elif internal in ('FileField', 'ImageField'):
+            represent = _file(field.storage)
+        elif internal == 'DateTimeField':
+            represent = _datetime
+        else:
+            represent = None  # Строки, числа и JSON отдаются как есть
+        compiled.append((name, source, represent))
+    return compiled
+
+
+def _row(compiled, values):
+    return {
+        name: represent(values[source]) if represent is not None and values[source] is not None else values[source]
+        for name, source, represent in compiled
+    }
+
+
+# Поля и их порядок — как в RouteSerializer, PointSerializer и RouteGeometrySerializer
+POINT_FIELDS = _compile(RoutePoint._meta.get_field('point').related_model, [
+    (name, f'point__{name}') for name in (
+        'id', 'name', 'description', 'latitude', 'longitude', 'text_content', 'photo', 'audio_file', 'video_file'
+    )
+])
+MEDIA_FIELDS = {
+    'photos': (PointPhoto, _compile(PointPhoto, [('id', 'id'), ('image', 'image')])),
+    'audios': (PointAudio, _compile(PointAudio, [('id', 'id'), ('file', 'file')])),
+    'videos': (PointVideo, _compile(PointVideo, [('id', 'id'), ('file', 'file')])),
+}
+GEOMETRY_FIELDS = _compile(RouteGeometry, [(name, name) for name in (
+    'point_count', 'length', 'duration', 'leg_distances',
+    'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
+    'center_latitude', 'center_longitude'
+)])
+
+
+class RouteValuesSerializer:
+    """
+    Тот же JSON, что у RouteSerializer, но из строк .values(): без объектов моделей
+    и полей сериализатора на каждую точку. Пять запросов на любой список маршрутов.
+    """
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def _geometries(self, routes):
+        rows = {
+            row['route_id']: row
+            for row in RouteGeometry.objects.filter(route_id__in=routes).values(
+                'route_id', 'route_version', *(source for _, source, _ in GEOMETRY_FIELDS)
+            )
+        }
+        stale = [route_id for route_id, route in routes.items()
+                 if route_id not in rows or rows[route_id]['route_version'] != route['version']]
+        if stale:
+            for route_id, geometry in compute_route_geometries(stale).items():
+                rows[route_id] = {source: getattr(geometry, source) for _, source, _ in GEOMETRY_FIELDS}
+        return {route_id: _row(GEOMETRY_FIELDS, row) for route_id, row in rows.items()}
+
+    def _points(self, route_ids):
+        route_points = list(RoutePoint.objects.filter(route_id__in=route_ids).order_by('order').values(
+            'route_id', 'order', *(source for _, source, _ in POINT_FIELDS)
+        ))
+        point_ids = {row['point__id'] for row in route_points}
+
+        media = {}
+        for key, (model, compiled) in MEDIA_FIELDS.items():
+            by_point = defaultdict(list)
+            for row in model.objects.filter(point_id__in=point_ids).values(
+                'point_id', *(source for _, source, _ in compiled)
+            ):
+                by_point[row['point_id']].append(_row(compiled, row))
+            media[key] = by_point
+
+        # Точка из нескольких маршрутов собирается один раз
+        points = {}
+        by_route = defaultdict(list)
+        for row in route_points:
+            point_id = row['point__id']
+            point = points.get(point_id)
+            if point is None:
+                point = points[point_id] = _row(POINT_FIELDS, row)
+                for key in MEDIA_FIELDS:
+                    point[key] = media[key].get(point_id, [])
+            by_route[row['route_id']].append({'order': row['order'], 'point': point})
+        return by_route
+
+    def serialize(self, route_ids):
+        routes = {
+            row['id']: row
+            for row in Route.objects.filter(id__in=route_ids).values(
+                'id', 'name', 'description', 'created_at', 'version'
+            )
+        }
+        points = self._points(list(routes))
+        geometries = self._geometries(routes)
+        return [
+            {
+                'id': str(route_id),
+                'name': routes[route_id]['name'],
+                'description': routes[route_id]['description'],
+                'points': points.get(route_id, []),
+                'geometry': geometries.get(route_id),
+                'created_at': _datetime(routes[route_id]['created_at']),
+            }
+            for route_id in route_ids if route_id in routes
+        ]
+
+
+class ValuesListMixin:
+    """
+    Быстрый список для read-only вьюсетов: если задан values_serializer_class, страница
+    собирается из .values() им, а не serializer_class. Порядок, фильтры и пагинация — те же.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list('pk', flat=True)
+        page = self.paginate_queryset(queryset)
+        ids = list(page if page is not None else queryset)
+        data = self.values_serializer_class(context=self.get_serializer_context()).serialize(ids)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,53 @@
+import json
+
+from django.db import connections
+from rest_framework.pagination import CursorPagination
+from rest_framework.settings import api_settings
+
+# Заголовок с оценкой общего числа записей, если её попросили параметром ?estimate_count=1
+COUNT_ESTIMATE_HEADER = 'X-Total-Count-Estimate'
+
+
+def estimate_count(queryset):
+    """
+    Примерное число строк запроса по статистике планировщика Postgres, без COUNT(*).
+    В других базах статистики нет — там считается точно.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CreatedCursorPagination(CursorPagination):
+    """
+    Постраничный вывод по курсору от новых записей к старым: каждая страница — выборка
+    по индексу (время создания, id) с LIMIT, без COUNT(*) и растущего OFFSET.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE or 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_estimate = None
+        if request.query_params.get('estimate_count') in ('1', 'true'):
+            self.count_estimate = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count_estimate is not None:
+            response[COUNT_ESTIMATE_HEADER] = str(self.count_estimate)
+        return response
+
+
+class CompletedCursorPagination(CreatedCursorPagination):
+    """То же для прохождений квестов: у них время создания — completed_at"""
+    ordering = ('-completed_at', '-id')
@@ -1,14 +1,19 @@
+import hmac
+
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from django.conf import settings
 
+
+def has_valid_token(authorization):
+    """Проверяет заголовок Authorization вида 'Token <API_TOKEN>'"""
+    api_token = getattr(settings, 'API_TOKEN', None)
+    if not api_token or not authorization or not authorization.startswith('Token '):
+        return False
+    return hmac.compare_digest(authorization.split(' ', 1)[1], api_token)
+
+
 class ReadOnlyOrTokenPermission(BasePermission):
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True
-        token = request.headers.get('Authorization')
-        if not token:
-            return False
-        if token.startswith('Token '):
-            token_key = token.split(' ', 1)[1]
-            return token_key == settings.API_TOKEN
-        return False
+        return has_valid_token(request.headers.get('Authorization'))
@@ -1,5 +1,8 @@
+from django.db import models
+from django.db.models import Prefetch
 from rest_framework import serializers
-from core.models import User, Quest, PromoCode, UserQuestProgress, Point, RoutePoint, Route, PointPhoto, PointAudio, PointVideo
+from core.models import User, Quest, PromoCode, UserQuestProgress, Point, RoutePoint, Route, RouteGeometry, PointPhoto, PointAudio, PointVideo
+from core.route_geometry import route_geometry, route_geometries
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -68,14 +71,54 @@ class RoutePointSerializer(serializers.ModelSerializer):
         model = RoutePoint
         fields = ('order', 'point')
 
+class RouteGeometrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RouteGeometry
+        fields = (
+            'point_count', 'length', 'duration', 'leg_distances',
+            'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
+            'center_latitude', 'center_longitude'
+        )
+
+# Точки маршрутов с медиа за фиксированное число запросов, сколько бы ни было маршрутов и точек
+ROUTE_POINTS_PREFETCH = Prefetch(
+    'routepoint_set',
+    queryset=RoutePoint.objects.select_related('point').prefetch_related(
+        'point__photos', 'point__audios', 'point__videos'
+    ).order_by('order'),
+    to_attr='ordered_points',
+)
+
+class RouteListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        routes = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Устаревшую геометрию считаем в памяти пачкой на весь список, а не по маршруту
+        route_geometries(routes)
+        return super().to_representation(routes)
+
 class RouteSerializer(serializers.ModelSerializer):
     points = serializers.SerializerMethodField()
+    geometry = serializers.SerializerMethodField()
 
     class Meta:
         model = Route
-        fields = ('id', 'name', 'description', 'points', 'created_at')
+        fields = ('id', 'name', 'description', 'points', 'geometry', 'created_at')
+        list_serializer_class = RouteListSerializer
 
     def get_points(self, obj):
-        # Берём все связанные точки в нужном порядке
-        rps = RoutePoint.objects.filter(route=obj).order_by('order')
-        return RoutePointSerializer(rps, many=True).data
\ No newline at end of file
+        # Точки в нужном порядке; RouteViewSet загружает их заранее (ROUTE_POINTS_PREFETCH)
+        rps = getattr(obj, 'ordered_points', None)
+        if rps is None:
+            rps = RoutePoint.objects.filter(route=obj).order_by('order')
+        return RoutePointSerializer(rps, many=True).data
+
+    def get_geometry(self, obj):
+        # Длина, время и границы хранятся посчитанными при изменении маршрута
+        geometry = route_geometry(obj)
+        return RouteGeometrySerializer(geometry).data if geometry else None
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    k = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    radius = serializers.FloatField(min_value=1, required=False, help_text="Радиус поиска, м")
@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Route, PointPhoto, PointAudio, PointVideo
+from core.testing import build_point, bulk_create_points, create_route, create_user
+from yandex_s3_storage import ClientDocsStorage
+from api.cache import content_version
+from api.fast import RouteValuesSerializer
+from api.serializers import ROUTE_POINTS_PREFETCH, RouteSerializer
+from api.views import RouteViewSet
+
+
+def fake_media_url(storage, name):
+    # Подписанные ссылки S3 требуют ключей и меняются со временем — в тестах ссылка постоянная
+    return f'https://media.test/{name}'
+
+
+class RouteApiTestCase(TestCase):
+    """Маршруты с точками и медиа для проверок API маршрутов"""
+
+    def setUp(self):
+        patcher = mock.patch.object(ClientDocsStorage, 'url', fake_media_url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = create_user()
+        self.routes = []
+
+    def add_routes(self, count, points_per_route):
+        for r in range(count):
+            number = len(self.routes)
+            points = bulk_create_points([
+                build_point(
+                    self.user,
+                    name=f"Точка {number}-{i}",
+                    description='Описание точки',
+                    text_content='Текст' if i % 2 else None,
+                    latitude=56.1 + i / 1000,
+                    longitude=47.2 + number / 1000,
+                    photo=f'points/photo/{number}-{i}.jpg' if i % 2 else None,
+                    audio_file=f'points/audio/{number}-{i}.mp3' if i % 3 == 0 else None,
+                    video_file=f'points/video/{number}-{i}.mp4' if i % 4 == 0 else None,
+                )
+                for i in range(points_per_route)
+            ])
+            PointPhoto.objects.bulk_create([PointPhoto(point=point, image=f'points/gallery/{point.id}.jpg')
+                                            for point in points])
+            PointAudio.objects.bulk_create([PointAudio(point=point, file=f'points/gallery/{point.id}.mp3')
+                                            for point in points[::2]])
+            PointVideo.objects.bulk_create([PointVideo(point=point, file=f'points/gallery/{point.id}.mp4')
+                                            for point in points[::3]])
+            self.routes.append(create_route(self.user, points, name=f"Маршрут {number}", description='Описание'))
+
+    def get(self, url):
+        # Готовые ответы кэшируются в памяти процесса — каждый запрос должен собираться заново
+        RouteViewSet._responses.clear()
+        content_version.invalidate()
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return response
+
+
+class RouteQueryCountTests(RouteApiTestCase):
+    """Число запросов к базе для /routes/ не зависит от числа маршрутов, точек и медиа"""
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(url)
+        return len(queries)
+
+    def test_list(self):
+        self.add_routes(1, 1)
+        expected = self.queries('/routes/')
+        self.add_routes(4, 12)
+        with self.assertNumQueries(expected):
+            self.get('/routes/')
+
+    def test_retrieve(self):
+        self.add_routes(1, 1)
+        expected = self.queries(f'/routes/{self.routes[0].id}/')
+        self.add_routes(1, 30)
+        with self.assertNumQueries(expected):
+            self.get(f'/routes/{self.routes[-1].id}/')
+
+
+class RouteValuesSerializerTests(RouteApiTestCase):
+    """RouteValuesSerializer отдаёт тот же JSON, что RouteSerializer, байт в байт"""
+
+    def assertSameJson(self):
+        renderer = JSONRenderer()
+        queryset = Route.objects.select_related('geometry').prefetch_related(
+            ROUTE_POINTS_PREFETCH
+        ).order_by('created_at')
+        ids = list(queryset.values_list('id', flat=True))
+        expected = renderer.render(RouteSerializer(queryset, many=True).data)
+        self.assertEqual(renderer.render(RouteValuesSerializer().serialize(ids)), expected)
+        return expected
+
+    def test_routes_with_media(self):
+        self.add_routes(3, 8)
+        content = self.assertSameJson()
+        # Медиа точек и галерей действительно попали в сравнение
+        self.assertIn(b'media.test/points/photo/', content)
+        self.assertIn(b'media.test/points/gallery/', content)
+
+    def test_shared_points_and_empty_route(self):
+        self.add_routes(1, 4)
+        self.routes.append(create_route(self.user, name='Пустой'))
+        points = [route_point.point for route_point in self.routes[0].routepoint_set.order_by('-order')]
+        self.routes.append(create_route(self.user, points, name='Обратный'))
+        self.assertSameJson()
+
+    def test_stale_geometry(self):
+        self.add_routes(2, 5)
+        # Геометрия посчитана для прошлой версии — обе реализации считают её заново
+        Route.objects.filter(id=self.routes[0].id).update(version=F('version') + 1)
+        self.assertSameJson()
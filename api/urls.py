@@ -5,7 +5,8 @@ from .views import (
     QuestViewSet,
     PromoCodeViewSet,
     UserQuestProgressViewSet,
-    RouteViewSet
+    RouteViewSet,
+    NearbyView
 )
 
 router = DefaultRouter()
@@ -16,5 +17,6 @@ router.register(r'progress', UserQuestProgressViewSet)
 router.register(r'routes', RouteViewSet, basename='route')
 
 urlpatterns = [
+    path('nearby/', NearbyView.as_view(), name='nearby'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -2,22 +2,29 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from core.models import User, Quest, PromoCode, UserQuestProgress, Route
+from core.geo import geo_index
+from core.models import User, Quest, PromoCode, UserQuestProgress, Route, Point
 from .serializers import (
     UserSerializer,
     QuestSerializer,
     PromoCodeSerializer,
-    UserQuestProgressSerializer, RouteSerializer
+    UserQuestProgressSerializer, RouteSerializer, ROUTE_POINTS_PREFETCH,
+    NearbyQuerySerializer
 )
 from .permissions import ReadOnlyOrTokenPermission
+from .cache import VersionedResponseCacheMixin
+from .fast import RouteValuesSerializer, ValuesListMixin
+from .pagination import CreatedCursorPagination, CompletedCursorPagination
 
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [ReadOnlyOrTokenPermission]
+    pagination_class = CreatedCursorPagination
 
 
 class QuestViewSet(viewsets.ModelViewSet):
@@ -37,12 +44,14 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
     queryset = PromoCode.objects.all()
     serializer_class = PromoCodeSerializer
     permission_classes = [ReadOnlyOrTokenPermission]
+    pagination_class = CreatedCursorPagination
 
 
 class UserQuestProgressViewSet(viewsets.ModelViewSet):
     queryset = UserQuestProgress.objects.all()
     serializer_class = UserQuestProgressSerializer
     permission_classes = [ReadOnlyOrTokenPermission]
+    pagination_class = CompletedCursorPagination
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -92,12 +101,50 @@ class UserQuestProgressViewSet(viewsets.ModelViewSet):
 
         return Response({'status': 'success'})
 
-class RouteViewSet(ReadOnlyModelViewSet):
+class RouteViewSet(VersionedResponseCacheMixin, ValuesListMixin, ReadOnlyModelViewSet):
     """
     Отдаёт только активные маршруты вместе с их точками.
     """
-    queryset = Route.objects.filter(is_active=True).order_by('created_at')
+    queryset = Route.objects.filter(is_active=True).select_related('geometry').prefetch_related(
+        ROUTE_POINTS_PREFETCH
+    ).order_by('created_at')
     serializer_class = RouteSerializer
+    # Список собирается из .values() с тем же JSON, что у RouteSerializer (api.fast)
+    values_serializer_class = RouteValuesSerializer
     permission_classes = [AllowAny]
 
 
+class NearbyView(APIView):
+    """
+    Ближайшие к координатам точки и активные маршруты: ?lat=&lon=&k=&radius=
+    Расстояния в метрах; у маршрута — до его ближайшей точки.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = NearbyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        lat, lon, k = query.validated_data['lat'], query.validated_data['lon'], query.validated_data['k']
+        radius = query.validated_data.get('radius')
+
+        points = geo_index.nearest_points(lat, lon, k, radius)
+        routes = geo_index.nearest_routes(lat, lon, k, radius)
+        point_rows = Point.objects.only('name', 'latitude', 'longitude').in_bulk([key for _, key in points])
+        route_names = dict(Route.objects.filter(id__in=[key for _, key in routes]).values_list('id', 'name'))
+
+        return Response({
+            'points': [
+                {
+                    'id': key,
+                    'name': point_rows[key].name,
+                    'latitude': point_rows[key].latitude,
+                    'longitude': point_rows[key].longitude,
+                    'distance': round(d),
+                }
+                for d, key in points if key in point_rows
+            ],
+            'routes': [
+                {'id': key, 'name': route_names[key], 'distance': round(d)}
+                for d, key in routes if key in route_names
+            ],
+        })
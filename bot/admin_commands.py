@@ -1,8 +1,12 @@
 from aiogram import types, Router, F
 from aiogram.filters import Command, CommandObject
-from asgiref.sync import sync_to_async
-from core.models import UserQuestProgress, PromoCode, User
+from .db import database_sync_to_async
+from core.models import UserQuestProgress, PromoCode, User, Broadcast
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+from .broadcast import progress_text, start_broadcast
 
 router = Router()
 
@@ -25,7 +29,7 @@ async def handle_approve(message: types.Message, command: CommandObject):
     progress_id = command.args
 
     # Получаем прогресс
-    get_progress = sync_to_async(lambda: UserQuestProgress.objects.select_related('user', 'quest').filter(id=progress_id).first())
+    get_progress = database_sync_to_async(lambda: UserQuestProgress.objects.select_related('user', 'quest').filter(id=progress_id).first())
     progress = await get_progress()
 
     if not progress:
@@ -37,7 +41,7 @@ async def handle_approve(message: types.Message, command: CommandObject):
         return
 
     # Находим свободный промокод
-    get_promo = sync_to_async(lambda: PromoCode.objects.filter(
+    get_promo = database_sync_to_async(lambda: PromoCode.objects.filter(
         quest=progress.quest,
         is_used=False
     ).first())
@@ -48,7 +52,7 @@ async def handle_approve(message: types.Message, command: CommandObject):
         return
 
     # Обновляем статус и привязываем промокод
-    @sync_to_async
+    @database_sync_to_async
     def update_progress():
         progress.status = UserQuestProgress.Status.APPROVED
         progress.promo_code = promo_code
@@ -84,7 +88,7 @@ async def handle_reject(message: types.Message, command: CommandObject):
     progress_id, reason = args
 
     # Получаем прогресс
-    get_progress = sync_to_async(lambda: UserQuestProgress.objects.select_related('user', 'quest').filter(id=progress_id).first())
+    get_progress = database_sync_to_async(lambda: UserQuestProgress.objects.select_related('user', 'quest').filter(id=progress_id).first())
     progress = await get_progress()
 
     if not progress:
@@ -96,7 +100,7 @@ async def handle_reject(message: types.Message, command: CommandObject):
         return
 
     # Обновляем статус и добавляем комментарий
-    @sync_to_async
+    @database_sync_to_async
     def update_progress():
         progress.status = UserQuestProgress.Status.REJECTED
         progress.admin_comment = reason
@@ -118,7 +122,7 @@ async def handle_reject(message: types.Message, command: CommandObject):
 async def cmd_make_admin(message: types.Message):
     """Назначение пользователя администратором"""
     # Проверяем, является ли отправитель уже администратором
-    sender = await User.objects.aget(telegram_id=message.from_user.id)
+    sender = await database_sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
     if not sender.is_admin:
         await message.answer("У вас нет прав для назначения администраторов.")
         return
@@ -135,9 +139,9 @@ async def cmd_make_admin(message: types.Message):
 
     # Находим пользователя и делаем его администратором
     try:
-        user = await User.objects.aget(telegram_id=user_id)
+        user = await database_sync_to_async(User.objects.get)(telegram_id=user_id)
         user.is_admin = True
-        await user.asave()
+        await database_sync_to_async(user.save)()
         await message.answer(f"✅ Пользователь {user.name} теперь администратор!")
     except User.DoesNotExist:
         await message.answer("❌ Пользователь не найден.")
@@ -146,7 +150,7 @@ async def cmd_make_admin(message: types.Message):
 async def cmd_remove_admin(message: types.Message):
     """Снятие прав администратора"""
     # Проверяем, является ли отправитель администратором
-    sender = await User.objects.aget(telegram_id=message.from_user.id)
+    sender = await database_sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
     if not sender.is_admin:
         await message.answer("У вас нет прав для снятия прав администратора.")
         return
@@ -163,9 +167,9 @@ async def cmd_remove_admin(message: types.Message):
 
     # Находим пользователя и снимаем права администратора
     try:
-        user = await User.objects.aget(telegram_id=user_id)
+        user = await database_sync_to_async(User.objects.get)(telegram_id=user_id)
         user.is_admin = False
-        await user.asave()
+        await database_sync_to_async(user.save)()
         await message.answer(f"✅ Пользователь {user.name} больше не администратор.")
     except User.DoesNotExist:
         await message.answer("❌ Пользователь не найден.")
@@ -174,7 +178,7 @@ async def cmd_remove_admin(message: types.Message):
 async def cmd_list_admins(message: types.Message):
     """Показать список всех администраторов"""
     # Проверяем, является ли отправитель администратором
-    sender = await User.objects.aget(telegram_id=message.from_user.id)
+    sender = await database_sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
     if not sender.is_admin:
         await message.answer("У вас нет прав для просмотра списка администраторов.")
         return
@@ -191,4 +195,44 @@ async def cmd_list_admins(message: types.Message):
         text += f"  Телефон: {admin.phone_number or 'Не указан'}\n"
         text += f"  Создан: {admin.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
 
-    await message.answer(text) 
\ No newline at end of file
+    await message.answer(text) 
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: types.Message, command: CommandObject):
+    """Рассылка сообщения всем пользователям бота"""
+    sender = await database_sync_to_async(User.objects.filter(telegram_id=message.from_user.id).first)()
+    if not sender or not sender.is_admin:
+        await message.answer("У вас нет прав для рассылки сообщений.")
+        return
+
+    if not command.args:
+        await message.answer("Использование: /broadcast <текст сообщения>")
+        return
+
+    total = await database_sync_to_async(User.objects.count)()
+    broadcast = await database_sync_to_async(Broadcast.objects.create)(text=command.args, created_by=sender, total=total)
+    progress = await message.answer(progress_text(broadcast))
+    broadcast.progress_chat_id = progress.chat.id
+    broadcast.progress_message_id = progress.message_id
+    await database_sync_to_async(broadcast.save)(update_fields=['progress_chat_id', 'progress_message_id'])
+
+    start_broadcast(message.bot, broadcast.id)
+
+@router.message(Command("broadcast_cancel"))
+async def cmd_broadcast_cancel(message: types.Message, command: CommandObject):
+    """Отмена идущей рассылки"""
+    sender = await database_sync_to_async(User.objects.filter(telegram_id=message.from_user.id).first)()
+    if not sender or not sender.is_admin:
+        await message.answer("У вас нет прав для отмены рассылки.")
+        return
+
+    try:
+        cancelled = await database_sync_to_async(Broadcast.objects.filter(
+            id=(command.args or '').strip(), status=Broadcast.Status.RUNNING
+        ).update)(status=Broadcast.Status.CANCELLED, finished_at=timezone.now())
+    except ValidationError:
+        cancelled = 0
+
+    if cancelled:
+        await message.answer("⏹ Рассылка будет остановлена после текущей порции.")
+    else:
+        await message.answer("❌ Идущая рассылка с таким ID не найдена.")
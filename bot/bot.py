@@ -2,17 +2,32 @@ import logging
 import os
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters.command import Command
+from aiogram.filters import StateFilter
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.client.default import DefaultBotProperties
-from core.models import User, RoutePoint, Route, Point
+from core.models import User, RoutePointPass
 from dotenv import load_dotenv
-from asgiref.sync import sync_to_async
+from .db import database_sync_to_async
 from aiogram.types import WebAppInfo
 from django.conf import settings
-from aiogram.types.input_file import FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import asyncio
+from functools import cache
+
+from .media_cache import answer_cached
+from .route_bundle import get_route_bundle, POINT_STORAGE
+from .walk_session import WalkSession, load_walk, save_walk
+from .fsm_storage import create_storage
+from .scheduler import message_scheduler
+from .broadcast import resume_broadcasts, stop_broadcasts
+from .sender import install_send_scheduler, send_scheduler
+from .callbacks import CallbackTable
+from .keyboards import get_routes_keyboard
+from .nearby import nearby_message
+from .progress import progress_recorder, find_unfinished_progress, get_progress, new_progress_id
+from .route_info import get_main_route_geometry, route_summary
+from .geofence import ARRIVAL_RADIUS, location_throttle, reached
 
 class RouteState(StatesGroup):
     waiting_for_next_point = State()
@@ -27,7 +42,10 @@ logger = logging.getLogger(__name__)
 token = os.getenv('TELEGRAM_BOT_TOKEN')
 
 # Инициализируем бота и диспетчер с новым синтаксисом
-dp = Dispatcher()
+# Состояния пользователей хранятся в базе и переживают перезапуск бота
+fsm_storage = create_storage()
+dp = Dispatcher(storage=fsm_storage)
+callbacks = CallbackTable(dp)
 bot = None
 
 # Регистрируем административные команды
@@ -36,18 +54,41 @@ from . import route_handlers
 dp.message.register(admin_commands.handle_approve, Command("approve"))
 dp.message.register(admin_commands.handle_reject, Command("reject"))
 
+
+@dp.startup()
+async def on_dispatcher_startup(bot: Bot):
+    """Подключает общие сервисы к боту при запуске диспетчера"""
+    install_send_scheduler(bot)
+    message_scheduler.start(bot)
+    await resume_broadcasts(bot)
+
+
+@dp.shutdown()
+async def on_dispatcher_shutdown():
+    """Останавливает фоновые задачи бота"""
+    await stop_broadcasts()
+    await message_scheduler.close()
+    await progress_recorder.close()
+    await send_scheduler.close()
+    await fsm_storage.close()
+
+@cache
 def get_main_keyboard():
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
             [
                 KeyboardButton(text="🎯 Получить маршрут"),
                 KeyboardButton(text="🎁 Мои промокоды")
+            ],
+            [
+                KeyboardButton(text="📍 Что рядом", request_location=True)
             ]
         ],
         resize_keyboard=True
     )
     return keyboard
 
+@cache
 def get_admin_keyboard():
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
@@ -58,6 +99,9 @@ def get_admin_keyboard():
             [
                 KeyboardButton(text="🎯 Получить маршрут"),
                 KeyboardButton(text="🎁 Мои промокоды")
+            ],
+            [
+                KeyboardButton(text="📍 Что рядом", request_location=True)
             ]
         ],
         resize_keyboard=True
@@ -66,9 +110,27 @@ def get_admin_keyboard():
 
 WEBAPP_URL = "https://gamecheb.ru"
 
+async def send_instructions(message: types.Message):
+    """Инструкция по маршруту; длина и время прогулки берутся из посчитанной геометрии маршрута"""
+    geometry = await get_main_route_geometry()
+    summary = route_summary(geometry) if geometry and geometry.point_count else ""
+    await message.answer(
+        "Надевай наушники и наслаждайся прогулкой в современном формате от GameCheb 😌\n\n"
+        "Инструкция по маршруту:\n\n"
+        "1. Заходи в бота.\n"
+        "2. Жми \"получить маршрут\".\n"
+        "3. Выбирай \"Квест по Чебоксарам\".\n"
+        "4. Следуй по точкам маршрута.\n"
+        "5. Когда дойдешь до указанной локации — слушай аудио.\n"
+        "6. Насладился объектом или локацией? Жми кнопку \"Я прошёл точку\" и двигайся дальше!\n\n"
+        + (f"{summary}\n\n" if summary else "") +
+        "🎁 После прохождения маршрута тебя ждет крутая возможность и секретный приз — мы ждем тебя в конце пути!\n\n"
+        "В случае любых сложностей или ошибок, пишите @dstepanv. Мы все починим и сделаем ваш опыт использования лучше)"
+    )
+
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
-    get_or_create = sync_to_async(User.objects.get_or_create)
+    get_or_create = database_sync_to_async(User.objects.get_or_create)
     logger.info(f"Сравнение айди {message.from_user.id in settings.ADMIN_IDS}")
     user, created = await get_or_create(
         telegram_id=message.from_user.id,
@@ -83,19 +145,7 @@ async def cmd_start(message: types.Message):
         reply_markup = get_admin_keyboard() if user.is_admin else get_main_keyboard()
         await message.answer("Добро пожаловать обратно! Чем могу помочь?", reply_markup=reply_markup)
         # Отправляем инструкцию
-        await message.answer(
-            "Надевай наушники и наслаждайся прогулкой в современном формате от GameCheb 😌\n\n"
-            "Инструкция по маршруту:\n\n"
-            "1. Заходи в бота.\n"
-            "2. Жми \"получить маршрут\".\n"
-            "3. Выбирай \"Квест по Чебоксарам\".\n"
-            "4. Следуй по точкам маршрута.\n"
-            "5. Когда дойдешь до указанной локации — слушай аудио.\n"
-            "6. Насладился объектом или локацией? Жми кнопку \"Я прошёл точку\" и двигайся дальше!\n\n"
-            "Всего маршрут включает 11 локаций, а вся прогулка займет не больше 1 часа.\n\n"
-            "🎁 После прохождения маршрута тебя ждет крутая возможность и секретный приз — мы ждем тебя в конце пути!\n\n"
-            "В случае любых сложностей или ошибок, пишите @dstepanv. Мы все починим и сделаем ваш опыт использования лучше)"
-        )
+        await send_instructions(message)
         return
 
     contact_keyboard = ReplyKeyboardMarkup(
@@ -109,11 +159,11 @@ async def cmd_start(message: types.Message):
 
 @dp.message(lambda message: message.contact is not None)
 async def handle_contact(message: types.Message):
-    get_user = sync_to_async(User.objects.get)
+    get_user = database_sync_to_async(User.objects.get)
     user = await get_user(telegram_id=message.from_user.id)
     user.phone_number = message.contact.phone_number
     user.is_verified = True
-    save_user = sync_to_async(user.save)
+    save_user = database_sync_to_async(user.save)
     await save_user()
 
 
@@ -130,95 +180,130 @@ async def handle_contact(message: types.Message):
     )
 
     # Отправляем инструкцию
-    await message.answer(
-        "Надевай наушники и наслаждайся прогулкой в современном формате от GameCheb 😌\n\n"
-        "Инструкция по маршруту:\n\n"
-        "1. Заходи в бота.\n"
-        "2. Жми \"получить маршрут\".\n"
-        "3. Выбирай \"Квест по Чебоксарам\".\n"
-        "4. Следуй по точкам маршрута.\n"
-        "5. Когда дойдешь до указанной локации — слушай аудио.\n"
-        "6. Насладился объектом или локацией? Жми кнопку \"Я прошёл точку\" и двигайся дальше!\n\n"
-        "Всего маршрут включает 11 локаций, а вся прогулка займет не больше 1 часа.\n\n"
-        "🎁 После прохождения маршрута тебя ждет крутая возможность и секретный приз — мы ждем тебя в конце пути!\n\n"
-        "В случае любых сложностей или ошибок, пишите @dstepanv. Мы все починим и сделаем ваш опыт использования лучше)"
-    )
+    await send_instructions(message)
 
 @dp.message(F.text == "🎯 Получить маршрут")
 async def handle_get_routes(message: types.Message):
-    get_routes = sync_to_async(lambda: list(Route.objects.filter(is_active=True)))
-    routes = await get_routes()
+    # Клавиатура перестраивается, только когда админ меняет маршруты
+    keyboard = await get_routes_keyboard()
 
-    if not routes:
+    if keyboard is None:
         await message.answer("Нет доступных маршрутов на данный момент.")
         return
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    for route in routes:
-        keyboard.inline_keyboard.append([InlineKeyboardButton(text=route.name, callback_data=f"route_{route.id}")])
-
     await message.answer("Выберите маршрут:", reply_markup=keyboard)
 
-@dp.callback_query(lambda c: c.data.startswith("route_") and not c.data.startswith("route_points_"))
-async def handle_route_selection(callback_query: types.CallbackQuery, state: FSMContext):
-    route_id = callback_query.data.split("_")[1]
-    get_route_points = sync_to_async(lambda: list(RoutePoint.objects.filter(route_id=route_id)))
-    route_points = await get_route_points()
-
-    if not route_points:
-        await callback_query.message.answer("Нет доступных точек для этого маршрута.")
+@dp.message(StateFilter(None), F.location)
+async def handle_nearby(message: types.Message):
+    """Ближайшие маршруты и точки к присланной геопозиции"""
+    text, keyboard = await nearby_message(message.location.latitude, message.location.longitude)
+    if text is None:
+        await message.answer("Рядом с вами пока нет маршрутов.")
         return
+    await message.answer(text, reply_markup=keyboard)
 
-    # Сохраняем данные маршрута и текущий индекс
-    await state.update_data(current_index=1, route_points=route_points)
-
-    # Сразу отправляем первую точку
-    first_point = route_points[0]
-    get_point = sync_to_async(lambda: Point.objects.get(id=first_point.point_id))
-    point = await get_point()
-
-    # Отправляем локацию точки
-    await callback_query.message.answer_location(latitude=point.latitude, longitude=point.longitude)
+async def send_point(message: types.Message, point):
+    """Отправляет точку скомпилированного маршрута: локацию, фото с описанием, видео и аудио"""
+    await message.answer_location(latitude=point.latitude, longitude=point.longitude)
 
     if point.photo:
         try:
-            await callback_query.message.answer_photo(
-                photo=FSInputFile(point.photo.path),
-                caption=f"📍 {point.name}"
-            )
+            await answer_cached(message, 'photo', point.photo.key, POINT_STORAGE, caption=f"📍 {point.name}")
             # Отправляем описание и текст отдельным сообщением
-            description_text = f"{point.description}\n\n{point.text_content if point.text_content else ''}"
+            description_text = f"{point.description}\n\n{point.text_content}"
             if description_text.strip():
-                await callback_query.message.answer(description_text)
+                await message.answer(description_text)
         except Exception as e:
             logging.error(f"Ошибка при отправке фото: {e}")
+            await message.answer("Не удалось загрузить фото точки.")
 
-    if point.audio_file:
-        try:
-            await callback_query.message.answer_audio(
-                audio=FSInputFile(point.audio_file.path),
-                caption=f"🎵 {point.name}"
-            )
-        except Exception as e:
-            logging.error(f"Ошибка при отправке аудио: {e}")
-
-    if point.video_file and point.video_file.name:
+    if point.video:
         try:
-            await callback_query.message.answer_video(
-                video=FSInputFile(point.video_file.path),
+            await answer_cached(
+                message, 'video', point.video.key, POINT_STORAGE,
                 caption=f"🎥 {point.name}",
                 width=None,
                 height=None
             )
         except Exception as e:
             logging.error(f"Ошибка при отправке видео: {e}")
+            await message.answer("Не удалось загрузить видео точки.")
+
+    if point.audio:
+        try:
+            await answer_cached(message, 'audio', point.audio.key, POINT_STORAGE, caption=f"🎵 {point.name}")
+        except Exception as e:
+            logging.error(f"Ошибка при отправке аудио: {e}")
+            await message.answer("Не удалось загрузить аудио точки.")
 
-    await callback_query.message.answer(
-        "Начинаем маршрут. Нажмите 'Я прошел точку' для продолжения.",
-        reply_markup=ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="Я прошел точку")]], resize_keyboard=True)
+NEXT_POINT_KEYBOARD = ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="Я прошел точку")]], resize_keyboard=True)
+
+async def start_walk(message: types.Message, state: FSMContext, bundle, telegram_id, progress=None):
+    """Начинает маршрут с первой точки или, если передано прохождение, с места остановки"""
+    index = progress['points_passed'] if progress else 0
+    await send_point(message, bundle.points[index])
+
+    # В FSM сохраняем только компактную запись о прохождении, точки берутся из скомпилированного маршрута
+    if progress:
+        walk = WalkSession.start(
+            bundle.id, bundle.version, str(progress['id']), index, int(progress['started_at'].timestamp())
+        )
+    else:
+        walk = WalkSession.start(bundle.id, bundle.version, new_progress_id())
+        progress_recorder.started(walk, telegram_id)
+    walk.advance(bundle.version)
+    await save_walk(state, walk)
+
+    await message.answer(
+        "Начинаем маршрут. Нажмите 'Я прошел точку' для продолжения "
+        "или включите трансляцию геопозиции — точки будут открываться сами, когда вы до них дойдёте.",
+        reply_markup=NEXT_POINT_KEYBOARD
     )
     await state.set_state(RouteState.waiting_for_next_point)
 
+@callbacks.action("route", legacy_prefix="route_")
+async def handle_route_selection(callback_query: types.CallbackQuery, state: FSMContext):
+    route_id = callback_query.data[len("route:"):]  # у старых кнопок route_<id> префикс той же длины
+    bundle = await get_route_bundle(route_id)
+
+    if not bundle or not bundle.points:
+        await callback_query.message.answer("Нет доступных точек для этого маршрута.")
+        return
+
+    progress = await find_unfinished_progress(callback_query.from_user.id, bundle.id)
+    if progress and 0 < progress['points_passed'] < len(bundle.points):
+        await callback_query.message.answer(
+            f"Вы уже начинали этот маршрут и остановились на точке {progress['points_passed'] + 1} "
+            f"из {len(bundle.points)}. Продолжить с неё?",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+                InlineKeyboardButton(text="▶️ Продолжить", callback_data=f"resume:{progress['id']}"),
+                InlineKeyboardButton(text="🔄 Начать заново", callback_data=f"restart:{bundle.id}")
+            ]])
+        )
+        return
+
+    await start_walk(callback_query.message, state, bundle, callback_query.from_user.id)
+
+@callbacks.action("restart")
+async def handle_route_restart(callback_query: types.CallbackQuery, state: FSMContext):
+    bundle = await get_route_bundle(callback_query.data.split(":")[1])
+    if not bundle or not bundle.points:
+        await callback_query.message.answer("Нет доступных точек для этого маршрута.")
+        return
+    await start_walk(callback_query.message, state, bundle, callback_query.from_user.id)
+
+@callbacks.action("resume")
+async def handle_route_resume(callback_query: types.CallbackQuery, state: FSMContext):
+    progress = await get_progress(callback_query.from_user.id, callback_query.data.split(":")[1])
+    bundle = await get_route_bundle(str(progress['route_id'])) if progress else None
+    if not bundle or not bundle.points:
+        await callback_query.message.answer("Маршрут больше недоступен.")
+        return
+    # Маршрут могли укоротить, пока пользователь не проходил его
+    if progress['points_passed'] >= len(bundle.points):
+        progress = None
+    await start_walk(callback_query.message, state, bundle, callback_query.from_user.id, progress)
+
 async def send_completion_messages(message: types.Message):
     """Отправка сообщений о завершении маршрута"""
     try:
@@ -234,89 +319,87 @@ async def send_completion_messages(message: types.Message):
             "https://forms.gle/Tkb3YpWUx3w1Dg427"
         )
         
-        # Ждем 10 секунд перед отправкой формы обратной связи
-        await asyncio.sleep(120)
-        
-        await message.answer(
+        # Форму обратной связи отправляем через 2 минуты, отправка переживёт перезапуск бота
+        await message_scheduler.schedule(
+            message.chat.id,
             "Оставь пожалуйста обратную связь о прохождении маршрута. Нам очень важно твое мнение, чтобы становится лучше каждый день)\n\n"
             "Форма обратной связи:\n"
-            "https://forms.gle/RzJkY2u1ESKNZBW26"
+            "https://forms.gle/RzJkY2u1ESKNZBW26",
+            delay=120
         )
     except Exception as e:
         logging.error(f"Ошибка при отправке сообщений о завершении маршрута: {e}")
 
-@dp.message(F.text == "Я прошел точку")
-async def handle_next_point(message: types.Message, state: FSMContext):
-    # Проверка состояния FSM
-    current_state = await state.get_state()
-    if current_state != RouteState.waiting_for_next_point.state:
-        await message.answer("Вы не в маршруте. Нажмите 'Я прошел точку' для продолжения.")
+async def advance_walk(message: types.Message, state: FSMContext, walk=None, bundle=None, via=RoutePointPass.Via.BUTTON):
+    """Отмечает текущую точку пройденной и отправляет следующую или завершает маршрут"""
+    if walk is None:
+        walk = await load_walk(state)
+        bundle = await get_route_bundle(walk.route_id, walk.route_version) if walk else None
+
+    if not bundle or walk.index >= len(bundle.points):
+        await message.answer("Маршрут больше недоступен.", reply_markup=get_main_keyboard())
+        await state.clear()
         return
-    data = await state.get_data()
-    route_points = data.get('route_points', [])
-    current_index = data.get('current_index', 0)
 
-    route_point = route_points[current_index]
-    get_point = sync_to_async(lambda: Point.objects.get(id=route_point.point_id))
-    point = await get_point()
+    await send_point(message, bundle.points[walk.index])
 
-    # Отправляем локацию точки
-    await message.answer_location(latitude=point.latitude, longitude=point.longitude)
+    # В базу прохождение попадёт пачкой вместе с другими, без отдельной записи на каждое нажатие
+    if walk.index > 0:
+        progress_recorder.passed(walk, message.from_user.id, bundle.points[walk.index - 1], walk.index - 1, via)
 
-    # Отправляем фото, если оно есть
-    if point.photo:
-        try:
-            await message.answer_photo(
-                photo=FSInputFile(point.photo.path),
-                caption=f"📍 {point.name}"
-            )
-            # Отправляем описание и текст отдельным сообщением
-            description_text = f"{point.description}\n\n{point.text_content if point.text_content else ''}"
-            if description_text.strip():
-                await message.answer(description_text)
-        except Exception as e:
-            logging.error(f"Ошибка при отправке фото: {e}")
-            await message.answer("Не удалось загрузить фото точки.")
+    # Переходим к следующей точке; если маршрут пересобрали во время прохождения, дальше идём по новой версии
+    walk.advance(bundle.version)
+    await save_walk(state, walk)
 
-    # Отправляем видео, если оно есть
-    if point.video_file and point.video_file.name:
-        try:
-            await message.answer_video(
-                video=FSInputFile(point.video_file.path),
-                caption=f"🎥 {point.name}",
-                width=None,
-                height=None
-            )
-        except Exception as e:
-            logging.error(f"Ошибка при отправке видео: {e}")
-            await message.answer("Не удалось загрузить видео точки.")
+    if walk.index >= len(bundle.points):
+        # Маршрут заканчивается последней точкой: она пройдена, когда отправлена
+        progress_recorder.passed(
+            walk, message.from_user.id, bundle.points[-1], len(bundle.points) - 1, via, completed=True
+        )
+        await send_completion_messages(message)
+        await state.clear()
+        return
 
-    # Отправляем аудио, если оно есть
-    if point.audio_file:
-        try:
-            await message.answer_audio(
-                audio=FSInputFile(point.audio_file.path),
-                caption=f"🎵 {point.name}"
-            )
-        except Exception as e:
-            logging.error(f"Ошибка при отправке аудио: {e}")
-            await message.answer("Не удалось загрузить аудио точки.")
+    # Отправляем сообщение о следующей точке
+    await message.answer("Нажмите 'Я прошел точку' для продолжения.", reply_markup=NEXT_POINT_KEYBOARD)
 
-    # Увеличиваем индекс для следующей точки
-    current_index += 1
-    await state.update_data(current_index=current_index)
+@dp.message(F.text == "Я прошел точку")
+async def handle_next_point(message: types.Message, state: FSMContext):
+    # Проверка состояния FSM
+    current_state = await state.get_state()
+    if current_state != RouteState.waiting_for_next_point.state:
+        await message.answer("Вы не в маршруте. Нажмите 'Я прошел точку' для продолжения.")
+        return
+    await advance_walk(message, state)
 
-    if current_index >= len(route_points):
-        # Запускаем отправку сообщений в отдельной задаче
-        asyncio.create_task(send_completion_messages(message))
-        await state.clear()
+async def check_arrival(message: types.Message, state: FSMContext):
+    """Переходит к следующей точке, если пользователь дошёл до текущей"""
+    walk = await load_walk(state)
+    bundle = await get_route_bundle(walk.route_id, walk.route_version) if walk else None
+    if not bundle or not 0 < walk.index <= len(bundle.points):
         return
+    # Пользователь идёт к последней отправленной точке
+    if reached(bundle, walk.index - 1, message.location.latitude, message.location.longitude):
+        location_throttle.arrived()
+        await advance_walk(message, state, walk, bundle, RoutePointPass.Via.LOCATION)
+
+@dp.message(RouteState.waiting_for_next_point, F.location)
+async def handle_route_location(message: types.Message, state: FSMContext):
+    """Геопозиция во время маршрута: трансляция включает автоматический переход по точкам"""
+    if message.location.live_period:
+        await message.answer(
+            f"Трансляция геопозиции включена: когда вы подойдёте к точке ближе чем на {ARRIVAL_RADIUS:.0f} м, "
+            "следующая откроется сама. Кнопка 'Я прошел точку' тоже работает."
+        )
+    location_throttle.allow(message.from_user.id)
+    await check_arrival(message, state)
 
-    # Отправляем сообщение о следующей точке
-    await message.answer(
-        "Нажмите 'Я прошел точку' для продолжения.",
-        reply_markup=ReplyKeyboardMarkup(keyboard=[[KeyboardButton(text="Я прошел точку")]], resize_keyboard=True)
-    )
+@dp.edited_message(RouteState.waiting_for_next_point, F.location)
+async def handle_live_location(message: types.Message, state: FSMContext):
+    """Обновления трансляции геопозиции; обрабатываются не чаще раза в несколько секунд на пользователя"""
+    if not location_throttle.allow(message.from_user.id):
+        return
+    await check_arrival(message, state)
 
 async def on_startup(dispatcher):
     # Удаляем любой существующий webhook и сбрасываем очередь апдейтов
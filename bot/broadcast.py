@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from time import monotonic
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Broadcast, BroadcastDelivery, User
+from .db import database_sync_to_async
+from .sender import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Сколько пользователей читать из базы и отправлять за один шаг
+CHUNK_SIZE = 500
+# Как часто обновлять сообщение с прогрессом, секунд
+PROGRESS_INTERVAL = 3
+
+_running = {}  # id рассылки -> задача
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours} ч {minutes} мин"
+    if minutes:
+        return f"{minutes} мин {seconds} с"
+    return f"{seconds} с"
+
+
+def progress_text(broadcast, rate=None):
+    """Текст сообщения о ходе рассылки"""
+    processed = broadcast.sent + broadcast.failed
+    lines = [
+        f"📣 Рассылка: {broadcast.get_status_display().lower()}",
+        f"Обработано {processed} из {broadcast.total}",
+        f"✅ Доставлено: {broadcast.sent}",
+        f"❌ Не доставлено: {broadcast.failed}",
+    ]
+    if broadcast.status == Broadcast.Status.RUNNING and rate:
+        remaining = max(broadcast.total - processed, 0)
+        lines.append(f"Скорость: {rate:.1f} сообщ./с, осталось ~{_format_duration(remaining / rate)}")
+    if broadcast.status == Broadcast.Status.RUNNING:
+        lines.append(f"\nОтменить: /broadcast_cancel {broadcast.id}")
+    return "\n".join(lines)
+
+
+def _next_chunk(broadcast):
+    """Следующая порция пользователей после контрольной точки и те из них, кому уже отправлено"""
+    users = User.objects.order_by('id').values_list('id', 'telegram_id')
+    if broadcast.last_user_id:
+        users = users.filter(id__gt=broadcast.last_user_id)
+    users = list(users[:CHUNK_SIZE])
+    done = set(BroadcastDelivery.objects.filter(
+        broadcast=broadcast, user_id__in=[user_id for user_id, _ in users]
+    ).values_list('user_id', flat=True))
+    return users, done
+
+
+def _save_chunk(broadcast, deliveries, last_user_id):
+    """Записывает результаты порции и сдвигает контрольную точку одной транзакцией"""
+    sent = sum(1 for d in deliveries if d.status == BroadcastDelivery.Status.SENT)
+    with transaction.atomic():
+        BroadcastDelivery.objects.bulk_create(deliveries, ignore_conflicts=True)
+        Broadcast.objects.filter(id=broadcast.id).update(
+            last_user_id=last_user_id,
+            sent=F('sent') + sent,
+            failed=F('failed') + len(deliveries) - sent,
+        )
+    broadcast.refresh_from_db(fields=['status', 'sent', 'failed', 'last_user_id'])
+
+
+def _finish(broadcast):
+    Broadcast.objects.filter(id=broadcast.id, status=Broadcast.Status.RUNNING).update(
+        status=Broadcast.Status.DONE, finished_at=timezone.now()
+    )
+    broadcast.refresh_from_db()
+
+
+async def _deliver(bot, broadcast, user_id, telegram_id):
+    try:
+        # Текст рассылки — обычный текст из команды, а не HTML: '<' и '&' в нём не должны ломать разбор
+        await bot.send_message(telegram_id, broadcast.text, parse_mode=None)
+        status, error = BroadcastDelivery.Status.SENT, ''
+    except TelegramForbiddenError as e:
+        status, error = BroadcastDelivery.Status.BLOCKED, str(e)
+    except Exception as e:
+        status, error = BroadcastDelivery.Status.FAILED, str(e)
+    return BroadcastDelivery(broadcast_id=broadcast.id, user_id=user_id, status=status, error=error)
+
+
+async def _show_progress(bot, broadcast, rate=None):
+    if not broadcast.progress_chat_id:
+        return
+    try:
+        await bot.edit_message_text(
+            progress_text(broadcast, rate),
+            chat_id=broadcast.progress_chat_id,
+            message_id=broadcast.progress_message_id,
+        )
+    except TelegramBadRequest:
+        pass  # Текст не изменился или сообщение удалено
+
+
+async def run_broadcast(bot, broadcast_id):
+    """
+    Отправляет рассылку всем пользователям порциями по CHUNK_SIZE.
+    После каждой порции результаты и контрольная точка сохраняются, поэтому после
+    перезапуска рассылка продолжается с того же места; повторно сообщение могут
+    получить только пользователи из порции, прерванной на середине.
+    """
+    broadcast = await database_sync_to_async(Broadcast.objects.get)(id=broadcast_id)
+    started = monotonic()
+    processed = 0
+    last_progress = 0
+
+    while broadcast.status == Broadcast.Status.RUNNING:
+        users, done = await database_sync_to_async(_next_chunk)(broadcast)
+        if not users:
+            await database_sync_to_async(_finish)(broadcast)
+            break
+
+        # Рассылка идёт с низким приоритетом: лимиты Telegram соблюдает общий планировщик отправки
+        with bulk_sends():
+            deliveries = await asyncio.gather(*(
+                _deliver(bot, broadcast, user_id, telegram_id)
+                for user_id, telegram_id in users if user_id not in done
+            ))
+        await database_sync_to_async(_save_chunk)(broadcast, deliveries, users[-1][0])
+
+        processed += len(deliveries)
+        if monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = monotonic()
+            await _show_progress(bot, broadcast, processed / (last_progress - started))
+
+    await _show_progress(bot, broadcast)
+    logger.info(f"Рассылка {broadcast.id}: {broadcast.get_status_display()}, доставлено {broadcast.sent}, "
+                f"не доставлено {broadcast.failed}")
+
+
+def start_broadcast(bot, broadcast_id):
+    """Запускает рассылку в фоне, если она ещё не идёт в этом процессе"""
+    task = _running.get(broadcast_id)
+    if task is None or task.done():
+        task = _running[broadcast_id] = asyncio.create_task(run_broadcast(bot, broadcast_id))
+        task.add_done_callback(lambda t: _log_failure(broadcast_id, t))
+    return task
+
+
+def _log_failure(broadcast_id, task):
+    _running.pop(broadcast_id, None)
+    if not task.cancelled() and task.exception():
+        logger.error(f"Рассылка {broadcast_id} остановлена с ошибкой: {task.exception()}")
+
+
+async def resume_broadcasts(bot):
+    """Продолжает рассылки, прерванные перезапуском бота"""
+    ids = await database_sync_to_async(
+        lambda: list(Broadcast.objects.filter(status=Broadcast.Status.RUNNING).values_list('id', flat=True))
+    )()
+    for broadcast_id in ids:
+        logger.info(f"Продолжаем рассылку {broadcast_id}")
+        start_broadcast(bot, broadcast_id)
+
+
+async def stop_broadcasts():
+    """Останавливает задачи рассылок; в базе они остаются незавершёнными и продолжатся при запуске"""
+    for task in list(_running.values()):
+        task.cancel()
+    _running.clear()
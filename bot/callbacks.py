@@ -0,0 +1,53 @@
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+
+
+def callback_action(data):
+    """Действие кнопки: callback-данные имеют вид «действие» или «действие:аргументы»"""
+    return data.partition(':')[0] if data else None
+
+
+class CallbackTable:
+    """
+    Обработчики callback-кнопок роутера в одном словаре «действие → обработчик».
+
+    Вместо отдельного фильтра на каждую кнопку (aiogram проверяет их по очереди) роутер
+    получает один обработчик, который находит нужный по действию одним обращением
+    к словарю — сколько бы действий ни было.
+    """
+
+    def __init__(self, router: Router):
+        self._handlers = {}
+        self._legacy = []  # (префикс, действие) для кнопок старого формата без двоеточия
+        router.callback_query.register(self._dispatch, self._match)
+
+    def action(self, name, legacy_prefix=None):
+        """Регистрирует обработчик действия; legacy_prefix — как выглядели такие кнопки раньше"""
+        if name in self._handlers:
+            raise ValueError(f"Обработчик callback-действия '{name}' уже зарегистрирован")
+
+        def register(handler):
+            self._handlers[name] = CallableObject(handler)
+            if legacy_prefix:
+                self._legacy.append((legacy_prefix, name))
+            return handler
+        return register
+
+    @property
+    def actions(self):
+        return list(self._handlers)
+
+    def _match(self, callback):
+        handler = self._handlers.get(callback_action(callback.data))
+        # В старом формате аргументы шли без двоеточия, например route_<id>
+        if handler is None and self._legacy and callback.data and ':' not in callback.data:
+            for prefix, name in self._legacy:
+                if callback.data.startswith(prefix):
+                    handler = self._handlers[name]
+                    break
+        if handler is None:
+            return False
+        return {'callback_handler': handler}
+
+    async def _dispatch(self, callback, callback_handler, **kwargs):
+        return await callback_handler.call(callback, **kwargs)
@@ -0,0 +1,29 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+# Число потоков для запросов бота к базе, у каждого потока своё соединение
+DB_THREADS = int(os.getenv('BOT_DB_THREADS', 8))
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='bot-db')
+
+
+def _with_connection(func):
+    @wraps(func)
+    def inner(*args, **kwargs):
+        # Соединение потока переиспользуется, пока не устарело (CONN_MAX_AGE) или не сломалось
+        close_old_connections()
+        return func(*args, **kwargs)
+    return inner
+
+
+def database_sync_to_async(func):
+    """
+    Аналог sync_to_async для ORM в обработчиках бота. Обычный sync_to_async выполняет
+    весь код в одном потоке, и запросы разных пользователей ждут друг друга;
+    здесь запросы идут параллельно в пуле из DB_THREADS потоков.
+    """
+    return sync_to_async(_with_connection(func), thread_sensitive=False, executor=_executor)
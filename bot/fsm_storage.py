@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from time import monotonic
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+from django.db import router, transaction
+from django.utils import timezone
+
+from core.models import FSMRecord
+from .db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'touched')
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data or {}
+        self.touched = monotonic()
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM-хранилище в базе проекта (Postgres или SQLite, см. core.routers.FSMRouter).
+
+    Чтение идёт из памяти, в базу пользователь попадает один раз после перезапуска.
+    Изменения копятся в памяти и пишутся пачкой раз в flush_interval секунд: сколько бы
+    раз обработчик ни менял состояние, в базу уходит одна запись на ключ. Записи,
+    которые не менялись ttl секунд, считаются брошенными и удаляются.
+    """
+
+    def __init__(self, ttl=7 * 24 * 3600, flush_interval=0.5, idle_timeout=600,
+                 evict_interval=300, key_builder=None):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.idle_timeout = min(idle_timeout, ttl)
+        self.evict_interval = evict_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._records = {}  # ключ -> _Record, кэш прочитанных и изменённых записей
+        self._dirty = set()
+        self._loading = {}  # ключ -> задача загрузки, чтобы не читать одну запись дважды
+        self._task = None
+        self._last_evict = monotonic()
+
+        self._flushes = 0
+        self._written = 0
+        self._rejected = 0
+        self._failures = 0  # Неудачных записей подряд, от них растёт пауза до следующей
+        self._evicted = 0
+
+    def _load(self, key):
+        row = FSMRecord.objects.filter(
+            key=key, expires_at__gt=timezone.now()
+        ).values_list('state', 'data').first()
+        return _Record(*row) if row else _Record()
+
+    async def _get(self, storage_key):
+        key = self.key_builder.build(storage_key)
+        record = self._records.get(key)
+        if record is None:
+            task = self._loading.get(key)
+            if task is None:
+                task = self._loading[key] = asyncio.ensure_future(database_sync_to_async(self._load)(key))
+                task.add_done_callback(lambda _: self._loading.pop(key, None))
+            loaded = await asyncio.shield(task)
+            record = self._records.setdefault(key, loaded)
+        record.touched = monotonic()
+        return key, record
+
+    def _changed(self, key):
+        self._dirty.add(key)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def set_state(self, key, state=None):
+        key, record = await self._get(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._changed(key)
+
+    async def get_state(self, key):
+        _, record = await self._get(key)
+        return record.state
+
+    async def set_data(self, key, data):
+        key, record = await self._get(key)
+        # Словарь записи только заменяется целиком, поэтому его можно писать в базу без копирования
+        record.data = data.copy()
+        self._changed(key)
+
+    async def get_data(self, key):
+        _, record = await self._get(key)
+        return record.data.copy()
+
+    def _write_rows(self, batch):
+        expires_at = timezone.now() + timedelta(seconds=self.ttl)
+        upserts = [
+            FSMRecord(key=key, state=state, data=data, expires_at=expires_at)
+            for key, state, data in batch if state is not None or data
+        ]
+        # Пустое состояние без данных — сессия завершена, строка больше не нужна
+        deleted = [key for key, state, data in batch if state is None and not data]
+
+        with transaction.atomic(using=router.db_for_write(FSMRecord)):
+            if upserts:
+                FSMRecord.objects.bulk_create(
+                    upserts,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['key'],
+                    update_fields=['state', 'data', 'updated_at', 'expires_at'],
+                )
+            if deleted:
+                FSMRecord.objects.filter(key__in=deleted).delete()
+
+    def _write(self, batch):
+        """
+        Пишет пачку одной транзакцией, а если она не прошла — по одной записи.
+        Возвращает ключи записей, которые не удалось записать, хотя остальные записались:
+        ошибка в самих данных, повторять их бесполезно. Если не записалось ничего, это
+        ошибка базы — исключение пробрасывается, и вся пачка повторится позже.
+        """
+        try:
+            self._write_rows(batch)
+            return []
+        except Exception:
+            if len(batch) == 1:
+                raise
+        rejected = []
+        error = None
+        for row in batch:
+            try:
+                self._write_rows([row])
+            except Exception as e:
+                rejected.append((row[0], e))
+                error = e
+        if len(rejected) == len(batch):
+            raise error
+        return rejected
+
+    async def flush(self):
+        """Записывает в базу все изменения, накопленные с прошлой записи"""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        batch = [(key, self._records[key].state, self._records[key].data) for key in keys]
+        try:
+            rejected = await database_sync_to_async(self._write)(batch)
+        except Exception:
+            # Не потеряли изменения: запишем их в следующий раз
+            self._dirty |= keys
+            raise
+        for key, error in rejected:
+            # Состояние остаётся в памяти, но в базу его не повторяем, чтобы не блокировать остальных
+            logger.error(f"Состояние FSM {key} не записано в базу и пропущено: {error}")
+        self._flushes += 1
+        self._written += len(batch) - len(rejected)
+        self._rejected += len(rejected)
+
+    def _delete_expired(self):
+        return FSMRecord.objects.filter(expires_at__lte=timezone.now()).delete()[0]
+
+    async def evict(self):
+        """Убирает из памяти давно не используемые записи, а из базы — просроченные"""
+        now = monotonic()
+        self._last_evict = now
+        for key in [
+            k for k, r in self._records.items()
+            if k not in self._dirty and now - r.touched > self.idle_timeout
+        ]:
+            del self._records[key]
+        self._evicted += await database_sync_to_async(self._delete_expired)()
+
+    async def _run(self):
+        while True:
+            # Пока база недоступна, повторяем всё реже: 0.5, 1, 2 ... до 64 интервалов
+            await asyncio.sleep(self.flush_interval * 2 ** min(self._failures, 7))
+            try:
+                await self.flush()
+                if monotonic() - self._last_evict > self.evict_interval:
+                    await self.evict()
+                self._failures = 0
+            except Exception as e:
+                self._failures += 1
+                logger.error(f"Ошибка записи состояний FSM в базу: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояния FSM при остановке: {e}")
+
+    def metrics(self):
+        return {
+            'cached': len(self._records),
+            'dirty': len(self._dirty),
+            'flushes': self._flushes,
+            'written': self._written,
+            'rejected': self._rejected,
+            'expired_deleted': self._evicted,
+        }
+
+
+def create_storage():
+    """FSM-хранилище по переменной окружения FSM_STORAGE: db (по умолчанию) или memory"""
+    if os.getenv('FSM_STORAGE', 'db') == 'memory':
+        return MemoryStorage()
+    return DatabaseStorage(ttl=int(os.getenv('FSM_TTL', 7 * 24 * 3600)))
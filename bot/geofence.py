@@ -0,0 +1,86 @@
+import math
+import os
+from time import monotonic
+
+EARTH_RADIUS = 6371000  # м
+
+# На каком расстоянии от точки считать, что пользователь до неё дошёл, м
+ARRIVAL_RADIUS = float(os.getenv('GEOFENCE_RADIUS', 40))
+# Как часто обрабатывать обновления трансляции геопозиции одного пользователя, секунд
+UPDATE_INTERVAL = float(os.getenv('GEOFENCE_INTERVAL', 5))
+
+
+_targets = {}  # (маршрут, версия) -> геометрия точек
+
+
+def route_targets(bundle):
+    """
+    Геометрия точек скомпилированного маршрута для быстрой проверки расстояния:
+    широта и долгота в радианах и косинус широты. Считается один раз на версию маршрута.
+    """
+    key = (bundle.id, bundle.version)
+    targets = _targets.get(key)
+    if targets is None:
+        if len(_targets) >= 256:
+            _targets.clear()
+        targets = _targets[key] = tuple(
+            (math.radians(point.latitude), math.radians(point.longitude), math.cos(math.radians(point.latitude)))
+            for point in bundle.points
+        )
+    return targets
+
+
+def distance_to(target, latitude, longitude):
+    """Расстояние до точки маршрута, м; на десятках метров плоское приближение точнее, чем нужно"""
+    lat, lon, cos_lat = target
+    dx = (math.radians(longitude) - lon) * cos_lat
+    dy = math.radians(latitude) - lat
+    return EARTH_RADIUS * math.hypot(dx, dy)
+
+
+class LocationThrottle:
+    """
+    Пропускает не больше одного обновления геопозиции в interval секунд на пользователя.
+    Трансляция присылает обновления часто, а для проверки прихода к точке хватает редких.
+    """
+
+    def __init__(self, interval=UPDATE_INTERVAL, max_users=100000):
+        self.interval = interval
+        self.max_users = max_users
+        self._last = {}  # пользователь -> время последнего обработанного обновления
+
+        self._accepted = 0
+        self._throttled = 0
+        self._arrivals = 0
+
+    def allow(self, user_id):
+        now = monotonic()
+        last = self._last.get(user_id)
+        if last is not None and now - last < self.interval:
+            self._throttled += 1
+            return False
+        if len(self._last) >= self.max_users:
+            # Забываем тех, кто давно ничего не присылал
+            self._last = {user: t for user, t in self._last.items() if now - t < self.interval}
+        self._last[user_id] = now
+        self._accepted += 1
+        return True
+
+    def arrived(self):
+        self._arrivals += 1
+
+    def metrics(self):
+        return {
+            'users': len(self._last),
+            'accepted': self._accepted,
+            'throttled': self._throttled,
+            'arrivals': self._arrivals,
+        }
+
+
+def reached(bundle, index, latitude, longitude, radius=ARRIVAL_RADIUS):
+    """Дошёл ли пользователь до точки маршрута с индексом index"""
+    return distance_to(route_targets(bundle)[index], latitude, longitude) <= radius
+
+
+location_throttle = LocationThrottle()
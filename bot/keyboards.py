@@ -0,0 +1,37 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from core.models import ContentVersion, Route
+from .db import database_sync_to_async
+
+_cache = {}  # ключ данных -> (версия, готовая клавиатура)
+
+
+def content_version(key):
+    """Текущая версия данных; увеличивается сигналами core.signals при изменениях"""
+    return ContentVersion.objects.filter(key=key).values_list('version', flat=True).first() or 0
+
+
+def versioned_keyboard(key, build):
+    """
+    Клавиатура из кэша, пока версия данных key не изменилась; иначе build() строит её заново.
+    Проверка версии — один запрос по уникальному индексу вместо выборки и сборки клавиатуры.
+    """
+    version = content_version(key)
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    keyboard = build()
+    _cache[key] = (version, keyboard)
+    return keyboard
+
+
+def _build_routes_keyboard():
+    routes = Route.objects.filter(is_active=True).order_by('created_at').values_list('id', 'name')
+    buttons = [[InlineKeyboardButton(text=name, callback_data=f"route:{route_id}")] for route_id, name in routes]
+    return InlineKeyboardMarkup(inline_keyboard=buttons) if buttons else None
+
+
+@database_sync_to_async
+def get_routes_keyboard():
+    """Клавиатура выбора маршрута; None, если активных маршрутов нет"""
+    return versioned_keyboard('routes', _build_routes_keyboard)
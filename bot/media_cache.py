@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, URLInputFile, InputMediaPhoto
+from django.db.models.signals import post_save, post_delete
+
+from core.models import TelegramFileCache, Route, Point, PointPhoto, PointAudio, PointVideo
+from .db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+# Сколько файлов помнить в каждом кэше процесса; вытесняются давно не отправлявшиеся
+MEDIA_CACHE_SIZE = 10000
+
+
+class _LRU:
+    """Словарь ограниченного размера: при переполнении удаляется давно не использованный ключ"""
+
+    def __init__(self, maxsize=MEDIA_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        if key not in self._items:
+            return default
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def set(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._items.pop(key, default)
+
+
+# (имя в хранилище, хэш содержимого) -> (тип медиа, file_id)
+_file_ids = _LRU()
+# Ключи, которых точно нет в базе, чтобы не ходить в неё на каждую отправку
+_missing = _LRU()
+# имя в хранилище -> хэш содержимого
+_hashes = _LRU()
+# Блокировки, чтобы одновременные отправки одного файла загружали его только один раз:
+# ключ -> [блокировка, сколько отправок её ждут или держат]; запись живёт, пока она нужна
+_upload_locks = {}
+
+# Модели с медиа и их файловые поля: при изменении записи хэши её файлов нужно пересчитать
+MEDIA_MODELS = {
+    Route: ('photo',),
+    Point: ('photo', 'audio_file', 'video_file'),
+    PointPhoto: ('image',),
+    PointAudio: ('file',),
+    PointVideo: ('file',),
+}
+
+
+def forget_hashes(sender, instance, **kwargs):
+    """
+    Сбрасывает запомненные хэши файлов записи: файл могли удалить и загрузить заново
+    под тем же именем, и по старому хэшу ушёл бы file_id прежнего содержимого.
+    """
+    for field in MEDIA_MODELS[sender]:
+        field_file = getattr(instance, field)
+        if field_file:
+            _hashes.pop(field_file.name)
+
+
+for model in MEDIA_MODELS:
+    post_save.connect(forget_hashes, sender=model, dispatch_uid=f'media_cache_{model.__name__}_save')
+    post_delete.connect(forget_hashes, sender=model, dispatch_uid=f'media_cache_{model.__name__}_delete')
+
+
+def content_hash(storage, name):
+    """Хэш содержимого файла: ETag для S3 (без скачивания), sha256 для остальных хранилищ"""
+    with storage.open(name, 'rb') as f:
+        obj = getattr(f, 'obj', None)
+        if obj is not None:
+            return obj.e_tag.strip('"')
+        digest = hashlib.sha256()
+        for chunk in f.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def upload_input(storage, name):
+    """Файл для первой загрузки в Telegram: с диска, если он локальный, иначе по ссылке"""
+    try:
+        return FSInputFile(storage.path(name))
+    except NotImplementedError:
+        return URLInputFile(storage.url(name))
+
+
+def cached_content_hash(storage, name):
+    """Хэш содержимого файла с запоминанием по имени; ошибки хранилища не глотаются"""
+    value = _hashes.get(name)
+    if value is None:
+        value = content_hash(storage, name)
+        _hashes.set(name, value)
+    return value
+
+
+def remember_hash(name, value):
+    """Запоминает уже известный хэш файла (например, из собранного маршрута)"""
+    if name not in _hashes:
+        _hashes.set(name, value)
+
+
+async def get_key(field_file):
+    """Ключ кэша для файла модели"""
+    name = field_file.name
+    value = _hashes.get(name)
+    if value is None:
+        value = await database_sync_to_async(cached_content_hash)(field_file.storage, name)
+    return name, value
+
+
+def _load_file_id(key):
+    return TelegramFileCache.objects.filter(
+        storage_name=key[0], content_hash=key[1]
+    ).values_list('media_type', 'file_id').first()
+
+
+async def get_file_id(key, kind):
+    """Возвращает известный file_id для ключа или None"""
+    if key not in _file_ids and key not in _missing:
+        cached = await database_sync_to_async(_load_file_id)(key)
+        if cached:
+            _file_ids.set(key, cached)
+        else:
+            _missing.set(key, True)
+
+    cached = _file_ids.get(key)
+    if cached and cached[0] == kind:
+        return cached[1]
+    return None
+
+
+def seed(key, kind, file_id):
+    """Заполняет кэш заранее известным file_id (или его отсутствием) без запроса к базе"""
+    if key in _file_ids or key in _missing:
+        return
+    if file_id:
+        _file_ids.set(key, (kind, file_id))
+    else:
+        _missing.set(key, True)
+
+
+async def remember(key, kind, file_id):
+    """Сохраняет file_id после первой загрузки файла"""
+    if not file_id:
+        return
+    _file_ids.set(key, (kind, file_id))
+    _missing.pop(key)
+    await database_sync_to_async(TelegramFileCache.objects.update_or_create)(
+        storage_name=key[0],
+        content_hash=key[1],
+        defaults={'media_type': kind, 'file_id': file_id}
+    )
+
+
+async def forget(key):
+    """Удаляет file_id, который Telegram больше не принимает"""
+    _file_ids.pop(key)
+    _missing.set(key, True)
+    await database_sync_to_async(
+        TelegramFileCache.objects.filter(storage_name=key[0], content_hash=key[1]).delete
+    )()
+
+
+def sent_file_id(message, kind):
+    """Достаёт file_id из отправленного сообщения"""
+    if kind == 'photo':
+        return message.photo[-1].file_id if message.photo else None
+    media = getattr(message, kind, None) or message.document or message.animation
+    return media.file_id if media else None
+
+
+async def answer_cached(message, kind, key, storage, **kwargs):
+    """Отправляет медиа по file_id, а при первой отправке загружает файл и запоминает его file_id"""
+    send = getattr(message, f"answer_{kind}")
+
+    file_id = await get_file_id(key, kind)
+    if file_id:
+        try:
+            return await send(file_id, **kwargs)
+        except TelegramBadRequest as e:
+            logger.warning(f"file_id для {key[0]} больше не действителен: {e}")
+            await forget(key)
+
+    entry = _upload_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            # Пока ждали блокировку, файл мог загрузить другой обработчик
+            file_id = await get_file_id(key, kind)
+            if file_id:
+                return await send(file_id, **kwargs)
+
+            upload = await database_sync_to_async(upload_input)(storage, key[0])
+            sent = await send(upload, **kwargs)
+            await remember(key, kind, sent_file_id(sent, kind))
+            return sent
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _upload_locks[key]
+
+
+async def answer_media(message, kind, field_file, **kwargs):
+    """Отправляет фото/аудио/видео из поля модели с использованием кэша file_id"""
+    key = await get_key(field_file)
+    return await answer_cached(message, kind, key, field_file.storage, **kwargs)
+
+
+async def answer_photo_group(message, field_files, caption=None):
+    """Отправляет альбом фото, загружая в Telegram только ещё не известные файлы"""
+    keys = [await get_key(field_file) for field_file in field_files]
+
+    media_group = []
+    uploaded = []
+    for i, (key, field_file) in enumerate(zip(keys, field_files)):
+        media = await get_file_id(key, 'photo')
+        if not media:
+            media = await database_sync_to_async(upload_input)(field_file.storage, key[0])
+            uploaded.append(i)
+        media_group.append(InputMediaPhoto(media=media, caption=caption if i == 0 else None))
+
+    sent = await message.answer_media_group(media_group)
+    for i in uploaded:
+        await remember(keys[i], 'photo', sent_file_id(sent[i], 'photo'))
+    return sent
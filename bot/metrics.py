@@ -0,0 +1,10 @@
+def latency_summary(samples):
+    """Средняя, p95 и максимальная задержка в миллисекундах по выборке в секундах"""
+    latencies = sorted(samples)
+    if not latencies:
+        return {'avg_ms': 0, 'p95_ms': 0, 'max_ms': 0}
+    return {
+        'avg_ms': round(sum(latencies) / len(latencies) * 1000, 1),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1),
+    }
@@ -0,0 +1,48 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from core.geo import geo_index
+from core.models import Point, Route
+from .db import database_sync_to_async
+
+NEARBY_ROUTES = 5
+NEARBY_POINTS = 5
+# Дальше этого маршруты и точки «рядом» не считаются, м
+NEARBY_RADIUS = 50000
+
+
+def format_distance(meters):
+    if meters < 1000:
+        return f"{round(meters)} м"
+    return f"{meters / 1000:.1f} км".replace('.', ',')
+
+
+def _nearby(lat, lon):
+    routes = geo_index.nearest_routes(lat, lon, NEARBY_ROUTES, NEARBY_RADIUS)
+    points = geo_index.nearest_points(lat, lon, NEARBY_POINTS, NEARBY_RADIUS)
+    route_names = dict(Route.objects.filter(id__in=[key for _, key in routes]).values_list('id', 'name'))
+    point_names = dict(Point.objects.filter(id__in=[key for _, key in points]).values_list('id', 'name'))
+    return (
+        [(d, key, route_names[key]) for d, key in routes if key in route_names],
+        [(d, point_names[key]) for d, key in points if key in point_names],
+    )
+
+
+async def nearby_message(lat, lon):
+    """Текст и кнопки выбора маршрута для ответа на присланную геопозицию; (None, None) — рядом ничего нет"""
+    routes, points = await database_sync_to_async(_nearby)(lat, lon)
+    if not routes and not points:
+        return None, None
+
+    lines = []
+    if routes:
+        lines.append("🗺 Маршруты рядом:")
+        lines += [f"{i}. {name} — {format_distance(d)}" for i, (d, _, name) in enumerate(routes, 1)]
+    if points:
+        lines.append("\n📍 Ближайшие точки:" if routes else "📍 Ближайшие точки:")
+        lines += [f"• {name} — {format_distance(d)}" for d, name in points]
+
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"🎯 {name}", callback_data=f"route:{route_id}")]
+        for _, route_id, name in routes
+    ]) if routes else None
+    return "\n".join(lines), keyboard
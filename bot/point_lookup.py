@@ -0,0 +1,32 @@
+import uuid
+
+from core.models import Point, PointPhoto
+from .db import database_sync_to_async
+
+
+def _find_points(handle):
+    try:
+        return list(Point.objects.filter(id=uuid.UUID(handle)))
+    except ValueError:
+        pass
+    points = list(Point.objects.filter(short_id=handle))
+    if points:
+        return points
+    # Кнопки, созданные до того, как короткий id точки удлинили из-за совпадения
+    return list(Point.objects.filter(short_id__startswith=handle)[:2])
+
+
+async def find_points(handle):
+    """
+    Точки по id из callback-данных: полному UUID или короткому Point.short_id.
+    Поиск идёт по уникальному индексу; больше одной точки — id неоднозначен.
+    """
+    return await database_sync_to_async(_find_points)(handle.lower())
+
+
+def find_point_photo(point, photo_id):
+    """Дополнительное фото точки по началу его id (фото точки берутся по индексу point_id)"""
+    for photo in PointPhoto.objects.filter(point=point):
+        if str(photo.id).startswith(photo_id):
+            return photo
+    raise PointPhoto.DoesNotExist
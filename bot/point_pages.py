@@ -0,0 +1,89 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db.models import Exists, OuterRef, Q
+
+from core.models import Point, RoutePoint
+from .db import database_sync_to_async
+from .point_search import search_points
+
+POINTS_PER_PAGE = 10
+
+# Ключ данных FSM, где лежат курсоры просмотренных страниц
+CURSORS_KEY = 'points_cursors'
+
+
+@dataclass(slots=True)
+class PointsPage:
+    """Страница точек: сами точки, номер, есть ли следующая и ключ последней точки"""
+    points: list
+    number: int
+    has_next: bool
+    cursor: list | None = None
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __bool__(self):
+        return bool(self.points)
+
+
+def points_queryset(filter_type="all", exclude_route=None):
+    """Точки по фильтру в порядке от новых к старым (ключ сортировки — created_at, id)"""
+    points = Point.objects.all()
+    if exclude_route is not None:
+        points = points.exclude(Exists(RoutePoint.objects.filter(route_id=exclude_route, point=OuterRef('pk'))))
+    if filter_type == "unused":
+        # Анти-join вместо выгрузки всех point_id из маршрутов
+        points = points.filter(~Exists(RoutePoint.objects.filter(point=OuterRef('pk'))))
+    return points.order_by('-created_at', '-id')
+
+
+def _fetch_page(filter_type, search_query, exclude_route, page, cursor):
+    if filter_type == "search" and search_query:
+        # Результаты поиска упорядочены по релевантности, ключа для курсора у них нет
+        rows = search_points(search_query, (page - 1) * POINTS_PER_PAGE, POINTS_PER_PAGE + 1)
+    elif cursor:
+        created_at, point_id = datetime.fromisoformat(cursor[0]), cursor[1]
+        # Отдельное условие created_at <= ... даёт базе границу для прохода по индексу
+        points = points_queryset(filter_type, exclude_route).filter(
+            Q(created_at__lte=created_at), Q(created_at__lt=created_at) | Q(id__lt=point_id)
+        )
+        rows = list(points[:POINTS_PER_PAGE + 1])
+    else:
+        # Курсора нет только у первой страницы или если состояние потеряно
+        offset = (page - 1) * POINTS_PER_PAGE
+        rows = list(points_queryset(filter_type, exclude_route)[offset:offset + POINTS_PER_PAGE + 1])
+
+    has_next = len(rows) > POINTS_PER_PAGE
+    rows = rows[:POINTS_PER_PAGE]
+    last = [rows[-1].created_at.isoformat(), str(rows[-1].id)] if rows else None
+    return PointsPage(rows, page, has_next, last)
+
+
+async def get_points_page(filter_type="all", search_query=None, page=1, state=None, exclude_route=None):
+    """
+    Страница точек с пагинацией по ключу (created_at, id): база читает только
+    POINTS_PER_PAGE + 1 строк, сколько бы точек ни было. Курсоры уже открытых
+    страниц хранятся в FSM, поэтому по кнопкам ◀️/▶️ можно ходить в обе стороны.
+    exclude_route — не показывать точки, уже добавленные в этот маршрут.
+    Поиск (filter_type="search") отдаёт результаты по релевантности, см. point_search.
+    """
+    scope = f"{filter_type}:{search_query or ''}:{exclude_route or ''}"
+    cursors = {}
+    if state is not None:
+        saved = (await state.get_data()).get(CURSORS_KEY) or {}
+        if saved.get('scope') == scope:
+            cursors = saved.get('pages', {})
+
+    page_obj = await database_sync_to_async(_fetch_page)(
+        filter_type, search_query, exclude_route, page, cursors.get(str(page)) if page > 1 else None
+    )
+
+    if state is not None and page_obj.has_next and filter_type != "search":
+        cursors[str(page + 1)] = page_obj.cursor
+        await state.update_data({CURSORS_KEY: {'scope': scope, 'pages': cursors}})
+    return page_obj
@@ -0,0 +1,69 @@
+import re
+from functools import cache
+
+from django.db import connection
+from django.db.models import Q
+
+from core.models import Point
+
+# Выражение должно совпадать с индексом point_search_vector_idx (миграция 0012_point_search)
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(text_content, '')), 'C')"
+)
+
+PG_SEARCH_SQL = f"""
+    SELECT * FROM core_point
+    WHERE ({PG_SEARCH_VECTOR}) @@ websearch_to_tsquery('russian', %(query)s)
+       OR %(query)s <%% name
+    ORDER BY greatest(
+        ts_rank({PG_SEARCH_VECTOR}, websearch_to_tsquery('russian', %(query)s)),
+        word_similarity(%(query)s, name)
+    ) DESC, created_at DESC
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+SQLITE_SEARCH_SQL = """
+    SELECT core_point.* FROM core_point_fts
+    JOIN core_point ON core_point.id = core_point_fts.point_id
+    WHERE core_point_fts MATCH %s
+    ORDER BY bm25(core_point_fts, 0, 10.0, 3.0, 1.0), core_point.created_at DESC
+    LIMIT %s OFFSET %s
+"""
+
+
+@cache
+def search_backend():
+    """Чем искать в текущей базе: postgres, fts5 или icontains"""
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite' and 'core_point_fts' in connection.introspection.table_names():
+        return 'fts5'
+    return 'icontains'
+
+
+def _fts5_query(query):
+    # Каждое слово — как префикс, чтобы «собор» находил «соборная», а кавычки пользователя не ломали запрос
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def search_points(query, offset=0, limit=10):
+    """
+    Точки по запросу в названии, описании и тексте, самые подходящие первыми.
+    На Postgres — полнотекстовый поиск с учётом словоформ и триграммы по названию
+    (находят и с опечаткой), локально на SQLite — FTS5, без них — icontains.
+    """
+    backend = search_backend()
+    if backend == 'postgres':
+        return list(Point.objects.raw(PG_SEARCH_SQL, {'query': query, 'limit': limit, 'offset': offset}))
+    if backend == 'fts5':
+        match = _fts5_query(query)
+        if not match:
+            return []
+        return list(Point.objects.raw(SQLITE_SEARCH_SQL, [match, limit, offset]))
+    return list(
+        Point.objects.filter(
+            Q(name__icontains=query) | Q(description__icontains=query) | Q(text_content__icontains=query)
+        ).order_by('-created_at', '-id')[offset:offset + limit]
+    )
@@ -0,0 +1,18 @@
+from collections import defaultdict
+
+from core.models import RoutePoint
+from .db import database_sync_to_async
+
+
+def _route_names_by_point(point_ids):
+    usage = defaultdict(list)
+    for point_id, route_name in RoutePoint.objects.filter(
+        point_id__in=point_ids
+    ).values_list('point_id', 'route__name'):
+        usage[point_id].append(route_name)
+    return usage
+
+
+async def get_point_usage(points):
+    """Названия маршрутов, в которых используется каждая точка страницы, — одним запросом"""
+    return await database_sync_to_async(_route_names_by_point)([point.id for point in points])
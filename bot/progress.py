@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import User, Route, Point, UserRouteProgress, RoutePointPass
+from .db import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FIELDS = ['status', 'points_passed', 'last_point', 'route_version', 'updated_at', 'completed_at']
+
+
+class ProgressRecorder:
+    """
+    Запись прохождения маршрутов в базу с отложенной записью.
+
+    Обработчик только кладёт событие в память и сразу отвечает пользователю; раз в
+    flush_interval секунд накопленное пишется одной транзакцией: прохождения — одной
+    вставкой с обновлением (несколько нажатий одного пользователя схлопываются в одну строку),
+    пройденные точки — одной вставкой. Id прохождения создаётся в боте и хранится в FSM,
+    поэтому для записи не нужно ничего читать из базы.
+    """
+
+    def __init__(self, flush_interval=0.3):
+        self.flush_interval = flush_interval
+        self._progress = {}  # id прохождения -> поля строки UserRouteProgress
+        self._passes = []
+        self._task = None
+        self._lock = asyncio.Lock()  # записи по порядку: иначе старое состояние может затереть новое
+
+        self._flushes = 0
+        self._written = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def _changed(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _update(self, walk, telegram_id, **fields):
+        if not walk.progress_id:
+            return  # Прохождение начато до того, как бот стал его записывать
+        # Каждое событие несёт полное состояние прохождения: более новое просто заменяет старое
+        self._progress[walk.progress_id] = {
+            'telegram_id': telegram_id,
+            'route_id': walk.route_id,
+            'route_version': walk.route_version,
+            'started_at': datetime.fromtimestamp(walk.started_at, dt_timezone.utc),
+            'updated_at': timezone.now(),
+            'status': UserRouteProgress.Status.IN_PROGRESS,
+            'points_passed': 0,
+            'last_point_id': None,
+            'completed_at': None,
+            **fields,
+        }
+        self._changed()
+
+    def started(self, walk, telegram_id):
+        """Пользователь начал маршрут"""
+        self._update(walk, telegram_id)
+
+    def passed(self, walk, telegram_id, point, position, via=RoutePointPass.Via.BUTTON, completed=False):
+        """Пользователь прошёл точку маршрута с номером position; completed — это была последняя"""
+        now = timezone.now()
+        fields = {'points_passed': position + 1, 'last_point_id': point.id}
+        if completed:
+            fields.update(status=UserRouteProgress.Status.COMPLETED, completed_at=now)
+        self._update(walk, telegram_id, **fields)
+        self._passes.append(RoutePointPass(
+            progress_id=walk.progress_id, point_id=point.id, position=position, via=via, passed_at=now
+        ))
+
+    def _write(self, progress, passes):
+        users = dict(User.objects.filter(
+            telegram_id__in={record['telegram_id'] for record in progress.values()}
+        ).values_list('telegram_id', 'id'))
+        # Маршрут или точку могли удалить из базы, пока пользователь шёл по скомпилированной копии
+        routes = set(map(str, Route.objects.filter(
+            id__in={record['route_id'] for record in progress.values()}
+        ).values_list('id', flat=True)))
+        points = set(map(str, Point.objects.filter(
+            id__in={item.point_id for item in passes}
+        ).values_list('id', flat=True)))
+
+        rows = []
+        for progress_id, record in progress.items():
+            user_id = users.get(record['telegram_id'])
+            if user_id is None or record['route_id'] not in routes:
+                continue  # Незарегистрированный пользователь или удалённый маршрут — записывать некуда
+            last_point_id = record['last_point_id']
+            rows.append(UserRouteProgress(
+                id=progress_id,
+                user_id=user_id,
+                route_id=record['route_id'],
+                route_version=record['route_version'],
+                status=record['status'],
+                points_passed=record['points_passed'],
+                last_point_id=last_point_id if last_point_id in points else None,
+                started_at=record['started_at'],
+                updated_at=record['updated_at'],
+                completed_at=record['completed_at'],
+            ))
+        written = {row.id for row in rows}
+        passes = [item for item in passes if item.progress_id in written]
+        for item in passes:
+            if item.point_id not in points:
+                item.point_id = None
+
+        try:
+            self._save(rows, passes)
+            return len(rows) + len(passes), 0
+        except Exception:
+            if len(rows) <= 1:
+                raise
+
+        # Пачка не записалась — пишем по прохождению, чтобы одна плохая запись не держала остальные
+        by_progress = {}
+        for item in passes:
+            by_progress.setdefault(item.progress_id, []).append(item)
+        written = rejected = 0
+        error = None
+        for row in rows:
+            row_passes = by_progress.get(row.id, [])
+            try:
+                self._save([row], row_passes)
+                written += 1 + len(row_passes)
+            except Exception as e:
+                logger.error(f"Прохождение {row.id} не записано в базу и пропущено: {e}")
+                rejected += 1
+                error = e
+        if rejected == len(rows):
+            raise error  # Не записалось ничего — вероятно, недоступна база, повторим всё позже
+        return written, rejected
+
+    def _save(self, rows, passes):
+        with transaction.atomic():
+            UserRouteProgress.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['id'], update_fields=PROGRESS_FIELDS
+            )
+            RoutePointPass.objects.bulk_create(passes, batch_size=500)
+
+    async def flush(self):
+        """Записывает в базу всё, что накопилось с прошлой записи"""
+        async with self._lock:
+            if not self._progress and not self._passes:
+                return
+            progress, self._progress = self._progress, {}
+            passes, self._passes = self._passes, []
+            try:
+                written, rejected = await database_sync_to_async(self._write)(progress, passes)
+            except Exception:
+                self._failed += 1
+                # Вернём события в буфер; более новое состояние тех же прохождений важнее
+                for progress_id, record in progress.items():
+                    self._progress.setdefault(progress_id, record)
+                self._passes[:0] = passes
+                raise
+            self._flushes += 1
+            self._written += written
+            self._rejected += rejected
+
+    async def _run(self):
+        failures = 0
+        while self._progress or self._passes:
+            # Пока база недоступна, повторяем всё реже: 0.3, 0.6, 1.2 ... до 128 интервалов
+            await asyncio.sleep(self.flush_interval * 2 ** min(failures, 7))
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.error(f"Ошибка записи прохождения маршрутов в базу: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Не удалось сохранить прохождение маршрутов при остановке: {e}")
+
+    def metrics(self):
+        return {
+            'pending_progress': len(self._progress),
+            'pending_passes': len(self._passes),
+            'flushes': self._flushes,
+            'written': self._written,
+            'rejected': self._rejected,
+            'failed_flushes': self._failed,
+        }
+
+
+def _find_unfinished(telegram_id, route_id):
+    return UserRouteProgress.objects.filter(
+        user__telegram_id=telegram_id, route_id=route_id, status=UserRouteProgress.Status.IN_PROGRESS
+    ).order_by('-updated_at').values('id', 'points_passed', 'started_at').first()
+
+
+async def find_unfinished_progress(telegram_id, route_id):
+    """Последнее незавершённое прохождение маршрута пользователем или None"""
+    # Сначала дописываем буфер, чтобы не пропустить только что пройденные точки
+    try:
+        await progress_recorder.flush()
+    except Exception as e:
+        logger.error(f"Ошибка записи прохождения маршрутов в базу: {e}")
+    return await database_sync_to_async(_find_unfinished)(telegram_id, route_id)
+
+
+def _get_progress(telegram_id, progress_id):
+    return UserRouteProgress.objects.filter(
+        id=progress_id, user__telegram_id=telegram_id, status=UserRouteProgress.Status.IN_PROGRESS
+    ).values('id', 'route_id', 'points_passed', 'started_at').first()
+
+
+async def get_progress(telegram_id, progress_id):
+    """Незавершённое прохождение пользователя по id или None"""
+    try:
+        return await database_sync_to_async(_get_progress)(telegram_id, uuid.UUID(progress_id))
+    except ValueError:
+        return None
+
+
+def new_progress_id():
+    return str(uuid.uuid4())
+
+
+progress_recorder = ProgressRecorder()
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+from django.conf import settings
+
+from core.models import Route, RoutePoint, Point, TelegramFileCache
+from .db import database_sync_to_async
+from . import media_cache
+
+logger = logging.getLogger(__name__)
+
+# Сколько скомпилированных маршрутов держать в памяти процесса
+BUNDLE_CACHE_SIZE = 64
+
+BUNDLE_DIR = Path(getattr(settings, 'ROUTE_BUNDLE_DIR', Path(settings.BASE_DIR) / 'cache' / 'route_bundles'))
+
+# Все медиа точки лежат в одном хранилище (ClientDocsStorage)
+POINT_STORAGE = Point._meta.get_field('photo').storage
+
+# Поля точки с медиа и тип медиа для отправки в Telegram
+MEDIA_FIELDS = (('photo', 'photo'), ('video_file', 'video'), ('audio_file', 'audio'))
+
+
+@dataclass(frozen=True, slots=True)
+class MediaRef:
+    """Ссылка на файл точки в хранилище и его file_id в Telegram на момент сборки"""
+    name: str
+    content_hash: str
+    file_id: str | None = None
+
+    @property
+    def key(self):
+        return self.name, self.content_hash
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledPoint:
+    id: str
+    name: str
+    description: str
+    text_content: str
+    latitude: float
+    longitude: float
+    photo: MediaRef | None = None
+    video: MediaRef | None = None
+    audio: MediaRef | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRoute:
+    """Неизменяемая копия маршрута определённой версии для прохождения в боте"""
+    id: str
+    version: int
+    name: str
+    points: tuple
+    # False, если какой-то файл не удалось прочитать: такой маршрут не сохраняется и не кэшируется
+    complete: bool = True
+
+    def __len__(self):
+        return len(self.points)
+
+
+_bundles = OrderedDict()  # (route_id, версия) -> CompiledRoute
+
+
+def _media_ref(field_file, kind, file_ids, failed):
+    if not field_file or not field_file.name:
+        return None
+    name = field_file.name
+    try:
+        content_hash = media_cache.cached_content_hash(field_file.storage, name)
+    except Exception as e:
+        logger.error(f"Не удалось прочитать файл {name} при сборке маршрута: {e}")
+        failed.append(name)
+        return None
+    cached = file_ids.get((name, content_hash))
+    file_id = cached[1] if cached and cached[0] == kind else None
+    return MediaRef(name, content_hash, file_id)
+
+
+def compile_route(route_id):
+    """Собирает маршрут из базы: точки по порядку, тексты, координаты и медиа"""
+    route = Route.objects.filter(id=route_id).values('id', 'name', 'version').first()
+    if route is None:
+        return None
+
+    route_points = list(RoutePoint.objects.filter(route_id=route_id).select_related('point'))
+    names = [
+        getattr(rp.point, field).name
+        for rp in route_points for field, _ in MEDIA_FIELDS
+        if getattr(rp.point, field)
+    ]
+    file_ids = {
+        (storage_name, content_hash): (media_type, file_id)
+        for storage_name, content_hash, media_type, file_id in TelegramFileCache.objects.filter(
+            storage_name__in=names
+        ).values_list('storage_name', 'content_hash', 'media_type', 'file_id')
+    }
+
+    points = []
+    failed = []
+    for rp in route_points:
+        point = rp.point
+        media = {kind: _media_ref(getattr(point, field), kind, file_ids, failed) for field, kind in MEDIA_FIELDS}
+        points.append(CompiledPoint(
+            id=str(point.id),
+            name=point.name,
+            description=point.description,
+            text_content=point.text_content or '',
+            latitude=point.latitude,
+            longitude=point.longitude,
+            **media
+        ))
+
+    return CompiledRoute(str(route['id']), route['version'], route['name'], tuple(points), complete=not failed)
+
+
+def _bundle_path(route_id, version):
+    return BUNDLE_DIR / f"{route_id}.v{version}.json"
+
+
+def _load_from_disk(route_id, version):
+    try:
+        with open(_bundle_path(route_id, version), encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Повреждённый файл маршрута {route_id} v{version}: {e}")
+        return None
+
+    points = tuple(
+        CompiledPoint(**{
+            **point,
+            **{kind: MediaRef(**point[kind]) if point[kind] else None for _, kind in MEDIA_FIELDS}
+        })
+        for point in data['points']
+    )
+    return CompiledRoute(data['id'], data['version'], data['name'], points)
+
+
+def _save_to_disk(bundle):
+    """Записывает маршрут на диск атомарно и удаляет файлы прошлых версий"""
+    try:
+        BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _bundle_path(bundle.id, bundle.version)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(bundle), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        for old in BUNDLE_DIR.glob(f"{bundle.id}.v*.json"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить маршрут {bundle.id} на диск: {e}")
+
+
+def _seed_file_ids(bundle, authoritative):
+    """Передаёт file_id из маршрута в кэш медиа, чтобы отправка точек не ходила в базу"""
+    for point in bundle.points:
+        for _, kind in MEDIA_FIELDS:
+            ref = getattr(point, kind)
+            if ref is None:
+                continue
+            media_cache.remember_hash(ref.name, ref.content_hash)
+            # Отсутствие file_id в файле с диска могло устареть, верим только свежей сборке
+            if ref.file_id or authoritative:
+                media_cache.seed(ref.key, kind, ref.file_id)
+
+
+def _remember(bundle):
+    _bundles[(bundle.id, bundle.version)] = bundle
+    _bundles.move_to_end((bundle.id, bundle.version))
+    while len(_bundles) > BUNDLE_CACHE_SIZE:
+        _bundles.popitem(last=False)
+
+
+def _get_bundle(route_id, version):
+    if version is None:
+        version = Route.objects.filter(id=route_id).values_list('version', flat=True).first()
+        if version is None:
+            return None
+
+    bundle = _load_from_disk(route_id, version)
+    if bundle is not None:
+        _seed_file_ids(bundle, authoritative=False)
+        return bundle
+
+    # Запрошенной версии нет — собираем текущую, она заменит устаревшую
+    bundle = compile_route(route_id)
+    if bundle is None:
+        return None
+    _seed_file_ids(bundle, authoritative=True)
+    if not bundle.complete:
+        # Без части медиа маршрут отдаём только в этот раз, следующий запрос соберёт его заново
+        logger.warning(f"Маршрут {bundle.name} v{bundle.version} собран без части медиа и не сохранён")
+        return bundle
+    _save_to_disk(bundle)
+    logger.info(f"Собран маршрут {bundle.name} v{bundle.version}: {len(bundle)} точек")
+    return bundle
+
+
+async def get_route_bundle(route_id, version=None):
+    """
+    Возвращает скомпилированный маршрут. Если версия известна и маршрут уже в памяти,
+    база не используется совсем; без версии берётся текущая версия маршрута.
+    """
+    route_id = str(route_id)
+    if version is not None:
+        bundle = _bundles.get((route_id, version))
+        if bundle is not None:
+            _bundles.move_to_end((route_id, version))
+            return bundle
+
+    bundle = await database_sync_to_async(_get_bundle)(route_id, version)
+    if bundle is not None and bundle.complete:
+        _remember(bundle)
+    return bundle
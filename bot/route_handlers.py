@@ -1,75 +1,49 @@
 import uuid
 import logging
+from functools import cache, lru_cache
 
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, Video, URLInputFile
+from aiogram.types import Message, CallbackQuery, Video
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from asgiref.sync import sync_to_async
+from bot.db import database_sync_to_async
 from core.models import User, Route, RoutePoint, Point, PointPhoto, PointAudio, PointVideo
 from django.conf import settings
-from django.core.paginator import Paginator
 import logging
 
 from bot.states import RouteStates
+from bot.media_cache import answer_media, answer_photo_group
+from bot.point_usage import get_point_usage
+from bot.point_pages import get_points_page, points_queryset
+from bot.point_lookup import find_points, find_point_photo
+from bot.callbacks import CallbackTable
+from bot.nearby import format_distance
+from core.route_order import plan_route_order, apply_route_order
+from core.route_geometry import route_geometry
+from bot.route_info import format_duration
 
 router = Router()
-
-# Константы для пагинации
-POINTS_PER_PAGE = 10
+callbacks = CallbackTable(router)
 
 async def get_points_by_routes():
     """Группирует точки по маршрутам"""
-    routes = await sync_to_async(list)(Route.objects.filter(is_active=True).order_by('name'))
+    routes = await database_sync_to_async(list)(Route.objects.filter(is_active=True).order_by('name'))
     grouped_points = {}
     
     for route in routes:
-        route_points = await sync_to_async(list)(
+        route_points = await database_sync_to_async(list)(
             RoutePoint.objects.filter(route=route).order_by('order').select_related('point')
         )
         if route_points:
             grouped_points[route] = route_points
     
     # Получаем неиспользуемые точки
-    used_point_ids = await sync_to_async(list)(
-        RoutePoint.objects.values_list('point_id', flat=True)
-    )
-    unused_points = await sync_to_async(list)(
-        Point.objects.exclude(id__in=used_point_ids).order_by('-created_at')
-    )
+    unused_points = await database_sync_to_async(list)(points_queryset("unused"))
     
     return grouped_points, unused_points
 
-async def get_filtered_points(filter_type="all", search_query=None, page=1):
-    """Получает отфильтрованные точки с пагинацией"""
-    if filter_type == "unused":
-        # Только неиспользуемые точки
-        used_point_ids = await sync_to_async(list)(
-            RoutePoint.objects.values_list('point_id', flat=True)
-        )
-        points = await sync_to_async(list)(
-            Point.objects.exclude(id__in=used_point_ids).order_by('-created_at')
-        )
-    elif filter_type == "search" and search_query:
-        # Поиск по названию (нечувствительный к регистру)
-        print(f"DEBUG: Поиск по запросу '{search_query}' (регистр не учитывается)")
-        points = await sync_to_async(list)(
-            Point.objects.filter(name__icontains=search_query).order_by('-created_at')
-        )
-        print(f"DEBUG: Найдено {len(points)} точек")
-        for point in points:
-            print(f"DEBUG: Точка: '{point.name}' (запрос: '{search_query}')")
-    else:
-        # Все точки
-        points = await sync_to_async(list)(Point.objects.all().order_by('-created_at'))
-    
-    # Пагинация
-    paginator = Paginator(points, POINTS_PER_PAGE)
-    page_obj = paginator.get_page(page)
-    
-    return page_obj, paginator.num_pages
-
+@cache
 def get_points_filter_keyboard():
     """Клавиатура для фильтрации точек"""
     keyboard = InlineKeyboardMarkup(
@@ -92,7 +66,8 @@ def get_points_filter_keyboard():
     )
     return keyboard
 
-def get_points_pagination_keyboard(current_page, total_pages, filter_type="all", search_query=None):
+@lru_cache(maxsize=1024)
+def get_points_pagination_keyboard(current_page, has_next, filter_type="all", search_query=None):
     """Клавиатура для пагинации точек"""
     keyboard = []
     
@@ -104,10 +79,10 @@ def get_points_pagination_keyboard(current_page, total_pages, filter_type="all",
         )
     
     nav_buttons.append(
-        InlineKeyboardButton(text=f"{current_page}/{total_pages}", callback_data="current_page")
+        InlineKeyboardButton(text=f"{current_page}", callback_data="current_page")
     )
     
-    if current_page < total_pages:
+    if has_next:
         nav_buttons.append(
             InlineKeyboardButton(text="▶️", callback_data=f"page_points:{filter_type}:{current_page+1}:{search_query or ''}")
         )
@@ -124,12 +99,13 @@ def get_points_pagination_keyboard(current_page, total_pages, filter_type="all",
 async def check_admin(user_id: int) -> bool:
     """Проверяет, является ли пользователь администратором"""
     try:
-        user = await User.objects.aget(telegram_id=user_id)
+        user = await database_sync_to_async(User.objects.get)(telegram_id=user_id)
         return user.is_admin
     except User.DoesNotExist:
         return False
 
 
+@cache
 def get_admin_keyboard():
     """Клавиатура для админа"""
     keyboard = ReplyKeyboardMarkup(
@@ -141,6 +117,9 @@ def get_admin_keyboard():
             [
                 KeyboardButton(text="🎯 Получить маршрут"),
                 KeyboardButton(text="🎁 Мои промокоды")
+            ],
+            [
+                KeyboardButton(text="📍 Что рядом", request_location=True)
             ]
         ],
         resize_keyboard=True
@@ -148,6 +127,7 @@ def get_admin_keyboard():
     return keyboard
 
 
+@cache
 def get_points_management_keyboard():
     """Клавиатура для управления точками"""
     keyboard = InlineKeyboardMarkup(
@@ -164,6 +144,7 @@ def get_points_management_keyboard():
     return keyboard
 
 
+@cache
 def get_routes_management_keyboard():
     """Клавиатура для управления маршрутами"""
     keyboard = InlineKeyboardMarkup(
@@ -204,7 +185,7 @@ async def handle_routes_menu(message: Message):
     )
 
 
-@router.callback_query(F.data == "list_points")
+@callbacks.action("list_points")
 async def handle_list_points_callback(callback: CallbackQuery):
     """Показать меню фильтрации точек"""
     if not await check_admin(callback.from_user.id):
@@ -216,20 +197,20 @@ async def handle_list_points_callback(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "list_routes")
+@callbacks.action("list_routes")
 async def handle_list_routes_callback(callback: CallbackQuery):
     """Показать список маршрутов"""
     if not await check_admin(callback.from_user.id):
         return
 
-    routes = await sync_to_async(list)(Route.objects.all().order_by('-created_at'))
+    routes = await database_sync_to_async(list)(Route.objects.all().order_by('-created_at'))
     if not routes:
         await callback.message.answer("Список маршрутов пуст.")
         return
 
     text = "🗺 Список маршрутов:\n\n"
     for route in routes:
-        points_count = await sync_to_async(RoutePoint.objects.filter(route=route).count)()
+        points_count = await database_sync_to_async(RoutePoint.objects.filter(route=route).count)()
         text += f"• {route.name}\n"
         text += f"  ID: {route.id}\n"
         text += f"  Описание: {route.description}\n"
@@ -249,7 +230,7 @@ async def handle_list_routes_callback(callback: CallbackQuery):
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
 
-@router.callback_query(F.data == "back_to_points_menu")
+@callbacks.action("back_to_points_menu")
 async def handle_back_to_points_menu(callback: CallbackQuery):
     """Возврат в меню точек"""
     await callback.message.answer(
@@ -258,7 +239,7 @@ async def handle_back_to_points_menu(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "back_to_routes_menu")
+@callbacks.action("back_to_routes_menu")
 async def handle_back_to_routes_menu(callback: CallbackQuery):
     """Возврат в меню маршрутов"""
     await callback.message.answer(
@@ -267,7 +248,7 @@ async def handle_back_to_routes_menu(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "back_to_main")
+@callbacks.action("back_to_main")
 async def handle_back_to_main(callback: CallbackQuery):
     """Возврат в главное меню"""
     await callback.message.answer(
@@ -276,7 +257,7 @@ async def handle_back_to_main(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "create_point")
+@callbacks.action("create_point")
 async def handle_create_point(callback: CallbackQuery, state: FSMContext):
     """Начало создания новой точки"""
     if not await check_admin(callback.from_user.id):
@@ -286,7 +267,7 @@ async def handle_create_point(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите название точки:")
 
 
-@router.callback_query(F.data == "create_route")
+@callbacks.action("create_route")
 async def handle_create_route(callback: CallbackQuery, state: FSMContext):
     """Начало создания нового маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -324,9 +305,9 @@ async def handle_point_location(message: Message, state: FSMContext):
     latitude = message.location.latitude
     longitude = message.location.longitude
 
-    user = await sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
+    user = await database_sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
 
-    point = await sync_to_async(Point.objects.create)(
+    point = await database_sync_to_async(Point.objects.create)(
         name=name,
         description=description,
         latitude=latitude,
@@ -362,9 +343,9 @@ async def handle_route_name(message: Message, state: FSMContext):
     data = await state.get_data()
     if 'route_id' in data:
         try:
-            route = await Route.objects.aget(id=data['route_id'])
+            route = await database_sync_to_async(Route.objects.get)(id=data['route_id'])
             route.name = message.text
-            await route.asave()
+            await database_sync_to_async(route.save)()
             await message.answer("Название маршрута успешно обновлено.")
             await state.clear()
             callback = CallbackQuery(
@@ -390,9 +371,9 @@ async def handle_route_description(message: Message, state: FSMContext):
     data = await state.get_data()
     if 'route_id' in data:
         try:
-            route = await Route.objects.aget(id=data['route_id'])
+            route = await database_sync_to_async(Route.objects.get)(id=data['route_id'])
             route.description = message.text
-            await route.asave()
+            await database_sync_to_async(route.save)()
             await message.answer("Описание маршрута успешно обновлено.")
             await state.clear()
             callback = CallbackQuery(
@@ -415,9 +396,9 @@ async def handle_route_description(message: Message, state: FSMContext):
 
         description = message.text
 
-        user = await sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
+        user = await database_sync_to_async(User.objects.get)(telegram_id=message.from_user.id)
 
-        route = await sync_to_async(Route.objects.create)(
+        route = await database_sync_to_async(Route.objects.create)(
             name=name,
             description=description,
             created_by=user
@@ -431,7 +412,7 @@ async def handle_route_description(message: Message, state: FSMContext):
                 inline_keyboard=[
                     [
                         InlineKeyboardButton(text="📸 Добавить фото", callback_data=f"add_route_photo:{str(route.id)}"),
-                        InlineKeyboardButton(text="➕ Добавить точку", callback_data=f"add_pt:{str(route.id)[:8]}")
+                        InlineKeyboardButton(text="➕ Добавить точку", callback_data=f"add_pt:{str(route.id)}")
                     ],
                     [
                         InlineKeyboardButton(text="✅ Готово", callback_data="list_routes")
@@ -441,7 +422,7 @@ async def handle_route_description(message: Message, state: FSMContext):
         )
 
 
-@router.callback_query(F.data.startswith("add_pt:"))
+@callbacks.action("add_pt")
 async def handle_add_point_to_route(callback: CallbackQuery, state: FSMContext):
     """Добавление точки в маршрут"""
     if not await check_admin(callback.from_user.id):
@@ -450,38 +431,32 @@ async def handle_add_point_to_route(callback: CallbackQuery, state: FSMContext):
     route_id = callback.data.split(":")[1]
 
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
 
-    existing_points = await sync_to_async(list)(
-        RoutePoint.objects.filter(route=route).values_list('point_id', flat=True))
-    available_points = await sync_to_async(list)(Point.objects.exclude(id__in=existing_points))
+    # Первая страница точек, которых ещё нет в маршруте
+    page_obj = await get_points_page(page=1, state=state, exclude_route=route.id)
 
-    if not available_points:
+    if not page_obj:
         await callback.message.answer("Нет доступных точек для добавления в маршрут.")
         return
 
-    # Группируем доступные точки по категориям
     text = f"➕ Добавление точки в маршрут '{route.name}'\n\n"
-    text += f"📋 Доступно точек: {len(available_points)}\n\n"
     
-    # Показываем первые 15 точек с группировкой
-    for i, point in enumerate(available_points[:15], 1):
+    for i, point in enumerate(page_obj, 1):
         text += f"{i}. {point.name}\n"
         text += f"   📍 {point.description[:50]}{'...' if len(point.description) > 50 else ''}\n"
         text += f"   📅 {point.created_at.strftime('%d.%m.%Y')}\n\n"
     
-    if len(available_points) > 15:
-        text += f"... и еще {len(available_points) - 15} точек\n"
+    if page_obj.has_next:
         text += "Используйте поиск для быстрого нахождения нужной точки."
 
     # Создаем клавиатуру с пагинацией
     keyboard = []
     
-    # Показываем первые 10 точек
-    for point in available_points[:10]:
+    for point in page_obj:
         keyboard.append([
             InlineKeyboardButton(
                 text=f"📍 {point.name}",
@@ -490,7 +465,7 @@ async def handle_add_point_to_route(callback: CallbackQuery, state: FSMContext):
         ])
     
     # Добавляем навигацию если точек много
-    if len(available_points) > 10:
+    if page_obj.has_next:
         keyboard.append([
             InlineKeyboardButton(text="◀️", callback_data="current_page"),
             InlineKeyboardButton(text="1", callback_data="current_page"),
@@ -511,7 +486,7 @@ async def handle_add_point_to_route(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("sel_pt:"))
+@callbacks.action("sel_pt")
 async def handle_select_point_for_route(callback: CallbackQuery):
     """Обработка выбора точки для добавления в маршрут"""
     if not await check_admin(callback.from_user.id):
@@ -520,17 +495,21 @@ async def handle_select_point_for_route(callback: CallbackQuery):
     _, route_id, point_id = callback.data.split(":")
 
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
-        point = await Point.objects.aget(id=uuid.UUID(point_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
+        # Из результатов поиска приходит короткий id точки, из списка — полный
+        all_points = await find_points(point_id)
+        if len(all_points) != 1:
+            raise Point.DoesNotExist
+        point = all_points[0]
     except (Route.DoesNotExist, Point.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут или точка не найдены.")
         return
 
-    max_order = await sync_to_async(
+    max_order = await database_sync_to_async(
         lambda: RoutePoint.objects.filter(route=route).order_by('-order').values_list('order', flat=True).first())()
     new_order = (max_order or 0) + 1
 
-    await sync_to_async(RoutePoint.objects.create)(
+    await database_sync_to_async(RoutePoint.objects.create)(
         route=route,
         point=point,
         order=new_order
@@ -540,7 +519,7 @@ async def handle_select_point_for_route(callback: CallbackQuery):
     await handle_view_route(callback)
 
 
-@router.callback_query(F.data.startswith("view_route:"))
+@callbacks.action("view_route")
 async def handle_view_route(callback: CallbackQuery):
     """Просмотр конкретного маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -548,25 +527,24 @@ async def handle_view_route(callback: CallbackQuery):
 
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
 
     if route.photo:
-        await callback.message.answer_photo(
-            photo=URLInputFile(route.photo.url),
-            caption=f"🗺 {route.name}"
-        )
+        await answer_media(callback.message, 'photo', route.photo, caption=f"🗺 {route.name}")
 
     text = f"🗺 Маршрут: {route.name}\n"
     text += f"ID: {route.id}\n"
     text += f"Описание: {route.description}\n"
     text += f"Создан: {route.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
 
-    route_points = await sync_to_async(list)(
+    route_points = await database_sync_to_async(list)(
         RoutePoint.objects.filter(route=route).order_by('order').select_related('point'))
     if route_points:
+        geometry = await database_sync_to_async(route_geometry)(route)
+        text += f"Длина: {format_distance(geometry.length)}, прогулка около {format_duration(geometry.duration)}\n\n"
         text += "📍 Точки маршрута:\n"
         for i, route_point in enumerate(route_points, 1):
             text += f"{i}. {route_point.point.name}\n"
@@ -583,6 +561,9 @@ async def handle_view_route(callback: CallbackQuery):
                 InlineKeyboardButton(text="➕ Добавить точку", callback_data=f"add_pt:{str(route.id)}"),
                 InlineKeyboardButton(text="➖ Удалить точку", callback_data=f"remove_point_from_route:{str(route.id)}")
             ],
+            [
+                InlineKeyboardButton(text="🧭 Оптимизировать порядок", callback_data=f"opt_order:{str(route.id)}")
+            ],
             [
                 InlineKeyboardButton(text="🔙 Назад к списку", callback_data="list_routes")
             ]
@@ -592,7 +573,73 @@ async def handle_view_route(callback: CallbackQuery):
     await callback.message.answer(text, reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("remove_point_from_route:"))
+@callbacks.action("opt_order")
+async def handle_optimize_route_order(callback: CallbackQuery):
+    """Предлагает более короткий порядок обхода точек маршрута"""
+    if not await check_admin(callback.from_user.id):
+        return
+
+    route_id = callback.data.split(":")[1]
+    try:
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
+    except (Route.DoesNotExist, ValueError):
+        await callback.message.answer("Маршрут не найден.")
+        return
+
+    route_points, new_route_points, before, after = await database_sync_to_async(plan_route_order)(route.id)
+    if len(route_points) < 3:
+        await callback.message.answer("В маршруте меньше трёх точек, менять порядок нечего.")
+        return
+    if before - after < 1:
+        await callback.message.answer(
+            f"Текущий порядок уже оптимален: {format_distance(before)} пешком.",
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔙 Вернуться к маршруту", callback_data=f"view_route:{route_id}")]
+            ])
+        )
+        return
+
+    text = f"🧭 Новый порядок точек маршрута '{route.name}':\n"
+    for i, route_point in enumerate(new_route_points, 1):
+        text += f"{i}. {route_point.point.name}\n"
+    text += f"\nСейчас: {format_distance(before)}\nПосле: {format_distance(after)} "
+    text += f"(на {round((before - after) / before * 100)}% короче)"
+
+    await callback.message.answer(
+        text,
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Применить", callback_data=f"apply_order:{route_id}"),
+                InlineKeyboardButton(text="🔙 Отмена", callback_data=f"view_route:{route_id}")
+            ]
+        ])
+    )
+
+
+@callbacks.action("apply_order")
+async def handle_apply_route_order(callback: CallbackQuery):
+    """Применяет оптимизированный порядок точек маршрута"""
+    if not await check_admin(callback.from_user.id):
+        return
+
+    route_id = callback.data.split(":")[1]
+    try:
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
+    except (Route.DoesNotExist, ValueError):
+        await callback.message.answer("Маршрут не найден.")
+        return
+
+    # Порядок считается заново: точки могли измениться после предложения
+    _, new_route_points, before, after = await database_sync_to_async(plan_route_order)(route.id)
+    await database_sync_to_async(apply_route_order)(route.id, new_route_points)
+
+    await callback.message.answer(
+        f"✅ Порядок точек маршрута '{route.name}' обновлён: {format_distance(before)} → {format_distance(after)}."
+    )
+    await handle_view_route(callback)
+
+
+@callbacks.action("remove_point_from_route")
 async def handle_remove_point_from_route(callback: CallbackQuery):
     """Удаление точки из маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -600,12 +647,12 @@ async def handle_remove_point_from_route(callback: CallbackQuery):
 
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
 
-    route_points = await sync_to_async(list)(
+    route_points = await database_sync_to_async(list)(
         RoutePoint.objects.filter(route=route).select_related('point').order_by('order'))
     if not route_points:
         await callback.message.answer("В маршруте нет точек.")
@@ -627,7 +674,7 @@ async def handle_remove_point_from_route(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("rm_pt:"))
+@callbacks.action("rm_pt")
 async def handle_remove_point_from_route_confirm(callback: CallbackQuery):
     """Подтверждение удаления точки из маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -635,14 +682,14 @@ async def handle_remove_point_from_route_confirm(callback: CallbackQuery):
 
     _, route_id, point_id = callback.data.split(":")
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
-        point = await Point.objects.aget(id=uuid.UUID(point_id))
-        route_point = await sync_to_async(RoutePoint.objects.get)(route=route, point=point)
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
+        point = await database_sync_to_async(Point.objects.get)(id=uuid.UUID(point_id))
+        route_point = await database_sync_to_async(RoutePoint.objects.get)(route=route, point=point)
     except (Route.DoesNotExist, Point.DoesNotExist, RoutePoint.DoesNotExist):
         await callback.message.answer("Маршрут или точка не найдены.")
         return
 
-    await sync_to_async(route_point.delete)()
+    await database_sync_to_async(route_point.delete)()
 
     await callback.message.answer(
         f"✅ Точка '{point.name}' успешно удалена из маршрута '{route.name}'",
@@ -659,7 +706,7 @@ async def handle_remove_point_from_route_confirm(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("edit_rt:"))
+@callbacks.action("edit_rt")
 async def handle_edit_route(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -667,7 +714,7 @@ async def handle_edit_route(callback: CallbackQuery, state: FSMContext):
 
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
@@ -696,7 +743,7 @@ async def handle_edit_route(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "edit_route_name")
+@callbacks.action("edit_route_name")
 async def handle_edit_route_name(callback: CallbackQuery, state: FSMContext):
     """Редактирование названия маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -720,7 +767,7 @@ async def handle_edit_route_name(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите новое название маршрута:", reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "edit_route_description")
+@callbacks.action("edit_route_description")
 async def handle_edit_route_description(callback: CallbackQuery, state: FSMContext):
     """Редактирование описания маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -744,7 +791,7 @@ async def handle_edit_route_description(callback: CallbackQuery, state: FSMConte
     await callback.message.answer("Введите новое описание маршрута:", reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("edit_pt:"))
+@callbacks.action("edit_pt")
 async def handle_edit_point(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования точки"""
     if not await check_admin(callback.from_user.id):
@@ -753,10 +800,7 @@ async def handle_edit_point(callback: CallbackQuery, state: FSMContext):
     short_point_id = callback.data.split(":")[1]
 
     try:
-        # Поиск UUID по startswith вручную (медленно, но работает)
-        all_points = await sync_to_async(list)(
-            Point.objects.filter(id__icontains=short_point_id)
-        )
+        all_points = await find_points(short_point_id)
         if not all_points:
             raise Point.DoesNotExist
         elif len(all_points) > 1:
@@ -808,7 +852,7 @@ async def handle_edit_point(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("del_pt:"))
+@callbacks.action("del_pt")
 async def handle_delete_point(callback: CallbackQuery):
     """Удаление точки"""
     if not await check_admin(callback.from_user.id):
@@ -817,12 +861,12 @@ async def handle_delete_point(callback: CallbackQuery):
     short_point_id = callback.data.split(":")[1]
     logging.info(short_point_id)
     try:
-        point = await Point.objects.aget(id=uuid.UUID(short_point_id))
+        point = await database_sync_to_async(Point.objects.get)(id=uuid.UUID(short_point_id))
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
 
-    route_points = await sync_to_async(RoutePoint.objects.filter(point=point).count)()
+    route_points = await database_sync_to_async(RoutePoint.objects.filter(point=point).count)()
     if route_points > 0:
         await callback.message.answer(
             "Нельзя удалить точку, так как она используется в маршрутах. "
@@ -830,12 +874,12 @@ async def handle_delete_point(callback: CallbackQuery):
         )
         return
 
-    await point.adelete()
+    await database_sync_to_async(point.delete)()
     await callback.message.answer("Точка успешно удалена.")
     await handle_list_points_callback(callback)
 
 
-@router.callback_query(F.data.startswith("edit_pt_text:"))
+@callbacks.action("edit_pt_text")
 async def handle_edit_point_text(callback: CallbackQuery, state: FSMContext):
     """Редактирование текста точки"""
     if not await check_admin(callback.from_user.id):
@@ -843,7 +887,7 @@ async def handle_edit_point_text(callback: CallbackQuery, state: FSMContext):
 
     short_point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=uuid.UUID(short_point_id))
+        point = await database_sync_to_async(Point.objects.get)(id=uuid.UUID(short_point_id))
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -853,7 +897,7 @@ async def handle_edit_point_text(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите новый текст для точки:")
 
 
-@router.callback_query(F.data.startswith("edit_pt_photo:"))
+@callbacks.action("edit_pt_photo")
 async def handle_edit_point_photo(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования фото точки"""
     if not await check_admin(callback.from_user.id):
@@ -861,9 +905,7 @@ async def handle_edit_point_photo(callback: CallbackQuery, state: FSMContext):
 
     short_point_id = callback.data.split(":")[1]
     try:
-        all_points = await sync_to_async(list)(
-            Point.objects.filter(id__icontains=short_point_id)
-        )
+        all_points = await find_points(short_point_id)
         if not all_points:
             raise Point.DoesNotExist
         elif len(all_points) > 1:
@@ -875,7 +917,7 @@ async def handle_edit_point_photo(callback: CallbackQuery, state: FSMContext):
         await callback.message.answer("Точка не найдена.")
         return
 
-    photos = await sync_to_async(list)(point.photos.all())
+    photos = await database_sync_to_async(list)(point.photos.all())
     has_old_photo = bool(point.photo)
     
     total_photos = len(photos) + (1 if has_old_photo else 0)
@@ -942,15 +984,10 @@ async def handle_point_photo_edit(message: Message, state: FSMContext, bot):
         return
 
     try:
-        if len(point_id) <= 8:
-            all_points = await sync_to_async(list)(
-                Point.objects.filter(id__icontains=point_id)
-            )
-            if not all_points:
-                raise Point.DoesNotExist
-            point = all_points[0]
-        else:
-            point = await Point.objects.aget(id=point_id)
+        all_points = await find_points(point_id)
+        if len(all_points) != 1:
+            raise Point.DoesNotExist
+        point = all_points[0]
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
@@ -973,7 +1010,7 @@ async def handle_point_photo_edit(message: Message, state: FSMContext, bot):
     
     if mode == "edit":
         if photo_type == "old":
-            @sync_to_async
+            @database_sync_to_async
             def update_photo():
                 point.photo.save(f"{point.name}.jpg", ContentFile(photo_bytes), save=True)
                 return point
@@ -981,10 +1018,10 @@ async def handle_point_photo_edit(message: Message, state: FSMContext, bot):
             await update_photo()
             await message.answer("Основное фото точки успешно обновлено.")
         else:
-            @sync_to_async
+            @database_sync_to_async
             def update_specific_photo():
                 try:
-                    photo_obj = PointPhoto.objects.get(id__icontains=photo_id, point=point)
+                    photo_obj = find_point_photo(point, photo_id)
                     photo_obj.image.save(f"{point.name}_{photo.file_id}.jpg", ContentFile(photo_bytes), save=True)
                     return photo_obj
                 except PointPhoto.DoesNotExist:
@@ -996,7 +1033,7 @@ async def handle_point_photo_edit(message: Message, state: FSMContext, bot):
             else:
                 await message.answer("Ошибка: выбранное фото не найдено.")
     else:
-        @sync_to_async
+        @database_sync_to_async
         def create_photo():
             photo_obj = PointPhoto(point=point)
             photo_obj.image.save(f"{point.name}_{photo.file_id}.jpg", ContentFile(photo_bytes), save=True)
@@ -1012,7 +1049,7 @@ async def handle_point_photo_edit(message: Message, state: FSMContext, bot):
         from_user=message.from_user,
         chat_instance=str(message.chat.id),
         message=message,
-        data=f"view_pt:{str(point.id)[:8]}"
+        data=f"view_pt:{point.short_id}"
     )
     await handle_view_point(new_callback)
 
@@ -1031,7 +1068,7 @@ async def handle_point_audio_edit(message: Message, state: FSMContext, bot):
         return
 
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
@@ -1053,7 +1090,7 @@ async def handle_point_audio_edit(message: Message, state: FSMContext, bot):
     from django.core.files.base import ContentFile
     
     if mode == "edit":
-        @sync_to_async
+        @database_sync_to_async
         def update_audio():
             point.audio_file.save(f"{point.name}.mp3", ContentFile(audio_bytes), save=True)
             return point
@@ -1061,7 +1098,7 @@ async def handle_point_audio_edit(message: Message, state: FSMContext, bot):
         await update_audio()
         await message.answer("Аудио точки успешно обновлено.")
     else:
-        @sync_to_async
+        @database_sync_to_async
         def create_audio():
             audio_obj = PointAudio(point=point)
             audio_obj.file.save(f"{point.name}_{audio.file_id}.mp3", ContentFile(audio_bytes), save=True)
@@ -1077,7 +1114,7 @@ async def handle_point_audio_edit(message: Message, state: FSMContext, bot):
         from_user=message.from_user,
         chat_instance=str(message.chat.id),
         message=message,
-        data=f"view_pt:{str(point.id)[:8]}"
+        data=f"view_pt:{point.short_id}"
     )
     await handle_view_point(new_callback)
 
@@ -1092,7 +1129,7 @@ async def handle_point_video_edit(message: Message, state: FSMContext):
     mode = data.get('mode', 'add')
 
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
@@ -1114,7 +1151,7 @@ async def handle_point_video_edit(message: Message, state: FSMContext):
     from django.core.files.base import ContentFile
     
     if mode == "edit":
-        @sync_to_async
+        @database_sync_to_async
         def update_video():
             point.video_file.save(f"{point.name}.mp4", ContentFile(video_bytes.read()), save=True)
             return point
@@ -1122,7 +1159,7 @@ async def handle_point_video_edit(message: Message, state: FSMContext):
         await update_video()
         await message.answer("Видео успешно обновлено!")
     else:
-        @sync_to_async
+        @database_sync_to_async
         def create_video():
             video_obj = PointVideo(point=point)
             video_obj.file.save(f"{point.name}_{video.file_id}.mp4", ContentFile(video_bytes.read()), save=True)
@@ -1133,7 +1170,7 @@ async def handle_point_video_edit(message: Message, state: FSMContext):
 
     await state.clear()
 
-    short_point_id = str(point.id)[:8]
+    short_point_id = point.short_id
     await handle_view_point(CallbackQuery(
         id=str(message.message_id),
         from_user=message.from_user,
@@ -1143,7 +1180,7 @@ async def handle_point_video_edit(message: Message, state: FSMContext):
     ))
 
 
-@router.callback_query(F.data == "edit_point_name")
+@callbacks.action("edit_point_name")
 async def handle_edit_point_name(callback: CallbackQuery, state: FSMContext):
     """Редактирование названия точки"""
     if not await check_admin(callback.from_user.id):
@@ -1167,7 +1204,7 @@ async def handle_edit_point_name(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("Введите новое название точки:", reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "edit_point_description")
+@callbacks.action("edit_point_description")
 async def handle_edit_point_description(callback: CallbackQuery, state: FSMContext):
     """Редактирование описания точки"""
     if not await check_admin(callback.from_user.id):
@@ -1191,7 +1228,7 @@ async def handle_edit_point_description(callback: CallbackQuery, state: FSMConte
     await callback.message.answer("Введите новое описание точки:", reply_markup=keyboard)
 
 
-@router.callback_query(F.data == "edit_point_location")
+@callbacks.action("edit_point_location")
 async def handle_edit_point_location(callback: CallbackQuery, state: FSMContext):
     """Редактирование локации точки"""
     if not await check_admin(callback.from_user.id):
@@ -1233,14 +1270,14 @@ async def handle_point_name_edit(message: Message, state: FSMContext):
         return
 
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
         return
 
     point.name = message.text
-    await point.asave()
+    await database_sync_to_async(point.save)()
 
     await message.answer("Название точки успешно обновлено.")
     await state.clear()
@@ -1250,7 +1287,7 @@ async def handle_point_name_edit(message: Message, state: FSMContext):
         from_user=message.from_user,
         chat_instance=str(message.chat.id),
         message=message,
-        data=f"view_pt:{str(point.id)[:8]}"
+        data=f"view_pt:{point.short_id}"
     )
     await handle_view_point(new_callback)
 
@@ -1269,14 +1306,14 @@ async def handle_point_description_edit(message: Message, state: FSMContext):
         return
 
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
         return
 
     point.description = message.text
-    await point.asave()
+    await database_sync_to_async(point.save)()
 
     await message.answer("Описание точки успешно обновлено.")
     await state.clear()
@@ -1286,7 +1323,7 @@ async def handle_point_description_edit(message: Message, state: FSMContext):
         from_user=message.from_user,
         chat_instance=str(message.chat.id),
         message=message,
-        data=f"view_pt:{str(point.id)[:8]}"
+        data=f"view_pt:{point.short_id}"
     )
     await handle_view_point(new_callback)
 
@@ -1305,7 +1342,7 @@ async def handle_point_location_edit(message: Message, state: FSMContext):
         return
 
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await message.answer("Точка не найдена.")
         await state.clear()
@@ -1313,7 +1350,7 @@ async def handle_point_location_edit(message: Message, state: FSMContext):
 
     point.latitude = message.location.latitude
     point.longitude = message.location.longitude
-    await point.asave()
+    await database_sync_to_async(point.save)()
 
     await message.answer("Локация точки успешно обновлена.")
     await state.clear()
@@ -1323,12 +1360,12 @@ async def handle_point_location_edit(message: Message, state: FSMContext):
         from_user=message.from_user,
         chat_instance=str(message.chat.id),
         message=message,
-        data=f"view_pt:{str(point.id)[:8]}"
+        data=f"view_pt:{point.short_id}"
     )
     await handle_view_point(new_callback)
 
 
-@router.callback_query(F.data.startswith("view_pt:"))
+@callbacks.action("view_pt")
 async def handle_view_point(callback: CallbackQuery):
     """Просмотр конкретной точки (теперь все медиа)"""
     if not await check_admin(callback.from_user.id):
@@ -1336,9 +1373,7 @@ async def handle_view_point(callback: CallbackQuery):
 
     short_point_id = callback.data.split(":")[1]
     try:
-        all_points = await sync_to_async(list)(
-            Point.objects.filter(id__icontains=short_point_id)
-        )
+        all_points = await find_points(short_point_id)
         if not all_points:
             raise Point.DoesNotExist
         elif len(all_points) > 1:
@@ -1352,42 +1387,24 @@ async def handle_view_point(callback: CallbackQuery):
 
     point_id = str(point.id)
 
-    photos = await sync_to_async(list)(point.photos.all())
-    print(f"DEBUG: Point {point.name} has {len(photos)} photos in PointPhoto table")
-    if point.photo:
-        print(f"DEBUG: Point {point.name} also has old photo field: {point.photo.url}")
-    
+    photos = await database_sync_to_async(list)(point.photos.all())
+
     if photos:
-        from aiogram.types import InputMediaPhoto
-        media_group = []
-        for i, photo in enumerate(photos):
-            print(f"DEBUG: Adding photo {i+1}: {photo.image.url}")
-            media_group.append(InputMediaPhoto(
-                media=URLInputFile(photo.image.url),
-                caption=f"📍 {point.name}" if i == 0 else None
-            ))
-        print(f"DEBUG: Sending media group with {len(media_group)} photos")
         try:
-            await callback.message.answer_media_group(media_group)
-            print(f"DEBUG: Media group sent successfully")
+            await answer_photo_group(callback.message, [photo.image for photo in photos], caption=f"📍 {point.name}")
         except Exception as e:
-            print(f"DEBUG: Error sending media group: {e}")
+            logging.warning(f"Не удалось отправить альбом точки {point.name}: {e}")
             for i, photo in enumerate(photos):
                 try:
-                    await callback.message.answer_photo(
-                        photo=URLInputFile(photo.image.url),
+                    await answer_media(
+                        callback.message, 'photo', photo.image,
                         caption=f"📍 {point.name} (фото {i+1}/{len(photos)})"
                     )
                 except Exception as photo_error:
-                    print(f"DEBUG: Error sending individual photo {i+1}: {photo_error}")
+                    logging.warning(f"Не удалось отправить фото {i+1} точки {point.name}: {photo_error}")
     elif point.photo:
-        print(f"DEBUG: Sending old photo field")
-        await callback.message.answer_photo(
-            photo=URLInputFile(point.photo.url),
-            caption=f"📍 {point.name}"
-        )
+        await answer_media(callback.message, 'photo', point.photo, caption=f"📍 {point.name}")
     else:
-        print(f"DEBUG: No photos found, sending text message")
         await callback.message.answer(
             f"📍 Точка: {point.name}\n"
             f"ID: {point.id}\n"
@@ -1407,23 +1424,17 @@ async def handle_view_point(callback: CallbackQuery):
             text += f"📄 {point.text_content}"
         await callback.message.answer(text)
 
-    audios = await sync_to_async(list)(point.audios.all())
+    audios = await database_sync_to_async(list)(point.audios.all())
     for audio in audios:
-        await callback.message.answer_audio(
-            audio=URLInputFile(audio.file.url),
-            caption=f"🎵 {point.name}"
-        )
+        await answer_media(callback.message, 'audio', audio.file, caption=f"🎵 {point.name}")
     if point.audio_file and not audios:
-        await callback.message.answer_audio(
-            audio=URLInputFile(point.audio_file.url),
-            caption=f"🎵 {point.name}"
-        )
+        await answer_media(callback.message, 'audio', point.audio_file, caption=f"🎵 {point.name}")
 
-    videos = await sync_to_async(list)(point.videos.all())
+    videos = await database_sync_to_async(list)(point.videos.all())
     for video in videos:
         try:
-            await callback.message.answer_video(
-                video=URLInputFile(video.file.url),
+            await answer_media(
+                callback.message, 'video', video.file,
                 caption=f"🎥 {point.name}",
                 width=None,
                 height=None
@@ -1433,8 +1444,8 @@ async def handle_view_point(callback: CallbackQuery):
             await callback.message.answer("Не удалось загрузить видео точки.")
     if point.video_file and point.video_file.name and not videos:
         try:
-            await callback.message.answer_video(
-                video=URLInputFile(point.video_file.url),
+            await answer_media(
+                callback.message, 'video', point.video_file,
                 caption=f"🎥 {point.name}",
                 width=None,
                 height=None
@@ -1463,7 +1474,7 @@ async def handle_view_point(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("del_rt:"))
+@callbacks.action("del_rt")
 async def handle_delete_route(callback: CallbackQuery):
     """Удаление маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -1471,17 +1482,17 @@ async def handle_delete_route(callback: CallbackQuery):
 
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
 
-    await route.adelete()
+    await database_sync_to_async(route.delete)()
     await callback.message.answer("Маршрут успешно удален.")
     await handle_list_routes_callback(callback)
 
 
-@router.callback_query(F.data == "cancel_edit")
+@callbacks.action("cancel_edit")
 async def handle_cancel_edit(callback: CallbackQuery, state: FSMContext):
     """Отмена редактирования"""
     if not await check_admin(callback.from_user.id):
@@ -1503,7 +1514,7 @@ async def handle_cancel_edit(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data.startswith("edit_pt_audio:"))
+@callbacks.action("edit_pt_audio")
 async def handle_edit_point_audio(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования аудио точки"""
     if not await check_admin(callback.from_user.id):
@@ -1511,7 +1522,7 @@ async def handle_edit_point_audio(callback: CallbackQuery, state: FSMContext):
 
     short_point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=uuid.UUID(short_point_id))
+        point = await database_sync_to_async(Point.objects.get)(id=uuid.UUID(short_point_id))
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -1523,7 +1534,7 @@ async def handle_edit_point_audio(callback: CallbackQuery, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("edit_pt_video:"))
+@callbacks.action("edit_pt_video")
 async def handle_edit_point_video(callback: CallbackQuery, state: FSMContext):
     """Начало редактирования видео точки"""
     if not await check_admin(callback.from_user.id):
@@ -1531,7 +1542,7 @@ async def handle_edit_point_video(callback: CallbackQuery, state: FSMContext):
 
     short_point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=uuid.UUID(short_point_id))
+        point = await database_sync_to_async(Point.objects.get)(id=uuid.UUID(short_point_id))
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -1542,7 +1553,7 @@ async def handle_edit_point_video(callback: CallbackQuery, state: FSMContext):
         "Отправьте новое видео для замены существующего (или отправьте /cancel для отмены)."
     )
 
-@router.callback_query(F.data == "edit_route_photo")
+@callbacks.action("edit_route_photo")
 async def handle_edit_route_photo(callback: CallbackQuery, state: FSMContext):
     """Редактирование фото маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -1556,7 +1567,7 @@ async def handle_edit_route_photo(callback: CallbackQuery, state: FSMContext):
         return
 
     try:
-        route = await Route.objects.aget(id=route_id)
+        route = await database_sync_to_async(Route.objects.get)(id=route_id)
     except Route.DoesNotExist:
         await callback.message.answer("Маршрут не найден.")
         await state.clear()
@@ -1574,8 +1585,8 @@ async def handle_edit_route_photo(callback: CallbackQuery, state: FSMContext):
                 ]
             ]
         )
-        await callback.message.answer_photo(
-            photo=URLInputFile(route.photo.url),
+        await answer_media(
+            callback.message, 'photo', route.photo,
             caption="Текущее фото маршрута. Выберите действие:",
             reply_markup=keyboard
         )
@@ -1607,7 +1618,7 @@ async def handle_route_photo_save(message: Message, state: FSMContext, bot):
         return
 
     try:
-        route = await Route.objects.aget(id=route_id)
+        route = await database_sync_to_async(Route.objects.get)(id=route_id)
     except Route.DoesNotExist:
         await message.answer("Маршрут не найден.")
         await state.clear()
@@ -1628,7 +1639,7 @@ async def handle_route_photo_save(message: Message, state: FSMContext, bot):
 
     from django.core.files.base import ContentFile
     
-    @sync_to_async
+    @database_sync_to_async
     def save_photo():
         route.photo.save(f"{route.name}.jpg", ContentFile(photo_bytes), save=True)
         return route
@@ -1646,7 +1657,7 @@ async def handle_route_photo_save(message: Message, state: FSMContext, bot):
     )
     await handle_view_route(new_callback)
 
-@router.callback_query(F.data == "replace_route_photo")
+@callbacks.action("replace_route_photo")
 async def handle_replace_route_photo(callback: CallbackQuery, state: FSMContext):
     """Замена фото маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -1665,7 +1676,7 @@ async def handle_replace_route_photo(callback: CallbackQuery, state: FSMContext)
         reply_markup=keyboard
     )
 
-@router.callback_query(F.data == "delete_route_photo")
+@callbacks.action("delete_route_photo")
 async def handle_delete_route_photo(callback: CallbackQuery, state: FSMContext):
     """Удаление фото маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -1679,9 +1690,9 @@ async def handle_delete_route_photo(callback: CallbackQuery, state: FSMContext):
         return
 
     try:
-        route = await Route.objects.aget(id=route_id)
+        route = await database_sync_to_async(Route.objects.get)(id=route_id)
         
-        @sync_to_async
+        @database_sync_to_async
         def delete_photo():
             if route.photo:
                 route.photo.delete()
@@ -1712,7 +1723,7 @@ async def handle_delete_route_photo(callback: CallbackQuery, state: FSMContext):
         await state.clear()
 
 
-@router.callback_query(F.data.startswith("add_pt_photo:"))
+@callbacks.action("add_pt_photo")
 async def handle_add_point_photo(callback: CallbackQuery, state: FSMContext):
     """Добавление нового фото к точке"""
     if not await check_admin(callback.from_user.id):
@@ -1720,7 +1731,7 @@ async def handle_add_point_photo(callback: CallbackQuery, state: FSMContext):
 
     point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -1732,7 +1743,7 @@ async def handle_add_point_photo(callback: CallbackQuery, state: FSMContext):
         "Нажмите на кнопку 📎 и выберите 'Фото'"
     )
 
-@router.callback_query(F.data.startswith("add_pt_audio:"))
+@callbacks.action("add_pt_audio")
 async def handle_add_point_audio(callback: CallbackQuery, state: FSMContext):
     """Добавление нового аудио к точке"""
     if not await check_admin(callback.from_user.id):
@@ -1740,7 +1751,7 @@ async def handle_add_point_audio(callback: CallbackQuery, state: FSMContext):
 
     point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -1751,7 +1762,7 @@ async def handle_add_point_audio(callback: CallbackQuery, state: FSMContext):
         "Отправьте новое аудио для добавления к точке.\nНажмите на скрепку и выберите 'Аудио'."
     )
 
-@router.callback_query(F.data.startswith("add_pt_video:"))
+@callbacks.action("add_pt_video")
 async def handle_add_point_video(callback: CallbackQuery, state: FSMContext):
     """Добавление нового видео к точке"""
     if not await check_admin(callback.from_user.id):
@@ -1759,7 +1770,7 @@ async def handle_add_point_video(callback: CallbackQuery, state: FSMContext):
 
     point_id = callback.data.split(":")[1]
     try:
-        point = await Point.objects.aget(id=point_id)
+        point = await database_sync_to_async(Point.objects.get)(id=point_id)
     except Point.DoesNotExist:
         await callback.message.answer("Точка не найдена.")
         return
@@ -1770,7 +1781,7 @@ async def handle_add_point_video(callback: CallbackQuery, state: FSMContext):
         "Отправьте новое видео для добавления к точке (или отправьте /cancel для отмены)."
     )
 
-@router.callback_query(F.data.startswith("edit_photo_old:"))
+@callbacks.action("edit_photo_old")
 async def handle_edit_old_photo(callback: CallbackQuery, state: FSMContext):
     """Редактирование старого фото точки"""
     if not await check_admin(callback.from_user.id):
@@ -1784,7 +1795,7 @@ async def handle_edit_old_photo(callback: CallbackQuery, state: FSMContext):
         "Нажмите на кнопку 📎 и выберите 'Фото'"
     )
 
-@router.callback_query(F.data.startswith("edit_photo_new:"))
+@callbacks.action("edit_photo_new")
 async def handle_edit_new_photo(callback: CallbackQuery, state: FSMContext):
     """Редактирование нового фото точки"""
     if not await check_admin(callback.from_user.id):
@@ -1801,7 +1812,7 @@ async def handle_edit_new_photo(callback: CallbackQuery, state: FSMContext):
         "Нажмите на кнопку 📎 и выберите 'Фото'"
     )
 
-@router.callback_query(F.data.startswith("add_route_photo:"))
+@callbacks.action("add_route_photo")
 async def handle_add_route_photo(callback: CallbackQuery, state: FSMContext):
     """Добавление фото к новому маршруту"""
     if not await check_admin(callback.from_user.id):
@@ -1809,7 +1820,7 @@ async def handle_add_route_photo(callback: CallbackQuery, state: FSMContext):
 
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=route_id)
+        route = await database_sync_to_async(Route.objects.get)(id=route_id)
     except Route.DoesNotExist:
         await callback.message.answer("Маршрут не найден.")
         return
@@ -1821,8 +1832,8 @@ async def handle_add_route_photo(callback: CallbackQuery, state: FSMContext):
         "Нажмите на кнопку 📎 и выберите 'Фото'"
     )
 
-@router.callback_query(F.data.startswith("filter_points:"))
-async def handle_filter_points(callback: CallbackQuery):
+@callbacks.action("filter_points")
+async def handle_filter_points(callback: CallbackQuery, state: FSMContext):
     """Обработка фильтрации точек"""
     if not await check_admin(callback.from_user.id):
         return
@@ -1830,8 +1841,8 @@ async def handle_filter_points(callback: CallbackQuery):
     filter_type = callback.data.split(":")[1]
     
     if filter_type == "by_date":
-        # Сортировка по дате создания
-        points = await sync_to_async(list)(Point.objects.all().order_by('-created_at'))
+        # Сортировка по дате создания: читаем 20 новых точек и одну лишнюю, чтобы знать, есть ли ещё
+        points = await database_sync_to_async(list)(points_queryset()[:21])
         if not points:
             await callback.message.answer("Список точек пуст.")
             return
@@ -1843,11 +1854,11 @@ async def handle_filter_points(callback: CallbackQuery):
             text += f"   📍 {point.description[:50]}{'...' if len(point.description) > 50 else ''}\n\n"
         
         if len(points) > 20:
-            text += f"... и еще {len(points) - 20} точек"
+            text += "... и более старые точки"
         
         keyboard = []
         for point in points[:20]:
-            short_point_id = str(point.id)[:8]
+            short_point_id = point.short_id
             keyboard.append([
                 InlineKeyboardButton(
                     text=f"👁️ {point.name}",
@@ -1860,21 +1871,23 @@ async def handle_filter_points(callback: CallbackQuery):
         return
     
     # Получаем отфильтрованные точки с пагинацией
-    page_obj, total_pages = await get_filtered_points(filter_type, page=1)
+    page_obj = await get_points_page(filter_type, page=1, state=state)
     
     if not page_obj:
         await callback.message.answer("По выбранному фильтру точки не найдены.")
         return
     
     # Формируем текст с информацией о точках
-    text = f"📋 Точки (страница 1/{total_pages})\n\n"
+    text = f"📋 Точки (страница 1)\n\n"
     
+    # Маршруты всех точек страницы одним запросом
+    usage = await get_point_usage(page_obj)
     for point in page_obj:
         # Проверяем, используется ли точка в маршрутах
-        route_info = await sync_to_async(lambda: list(RoutePoint.objects.filter(point=point).select_related('route')))()
+        route_names = usage.get(point.id)
         
-        if route_info:
-            routes_text = ", ".join([f"'{rp.route.name}'" for rp in route_info])
+        if route_names:
+            routes_text = ", ".join([f"'{name}'" for name in route_names])
             text += f"📍 {point.name}\n"
             text += f"   🗺 В маршрутах: {routes_text}\n"
         else:
@@ -1886,7 +1899,7 @@ async def handle_filter_points(callback: CallbackQuery):
     # Создаем клавиатуру для точек
     keyboard = []
     for point in page_obj:
-        short_point_id = str(point.id)[:8]
+        short_point_id = point.short_id
         keyboard.append([
             InlineKeyboardButton(
                 text=f"👁️ {point.name}",
@@ -1895,7 +1908,7 @@ async def handle_filter_points(callback: CallbackQuery):
         ])
     
     # Добавляем пагинацию, если есть несколько страниц
-    if total_pages > 1:
+    if page_obj.has_next:
         keyboard.append([
             InlineKeyboardButton(text="◀️", callback_data="current_page"),
             InlineKeyboardButton(text="1", callback_data="current_page"),
@@ -1906,7 +1919,7 @@ async def handle_filter_points(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data == "search_points")
+@callbacks.action("search_points")
 async def handle_search_points(callback: CallbackQuery, state: FSMContext):
     """Начало поиска точек по названию"""
     if not await check_admin(callback.from_user.id):
@@ -1949,7 +1962,7 @@ async def handle_point_search_query(message: Message, state: FSMContext):
     route_id = data.get('route_id')
     
     # Получаем результаты поиска
-    page_obj, total_pages = await get_filtered_points("search", search_query, page=1)
+    page_obj = await get_points_page("search", search_query, page=1, state=state)
     
     if not page_obj:
         # Даже при неудачном поиске не очищаем состояние и даем возможность продолжить
@@ -1973,14 +1986,16 @@ async def handle_point_search_query(message: Message, state: FSMContext):
         text += f"📋 Найдено: {len(page_obj)} точек для добавления в маршрут\n\n"
     else:
         text = f"🔍 Результаты поиска по '{search_query}'\n"
-        text += f"📋 Найдено: {len(page_obj)} из {total_pages} результатов\n\n"
+        text += f"📋 На странице: {len(page_obj)}\n\n"
     
+    # Маршруты всех точек страницы одним запросом
+    usage = await get_point_usage(page_obj)
     for point in page_obj:
         # Проверяем использование в маршрутах
-        route_info = await sync_to_async(lambda: list(RoutePoint.objects.filter(point=point).select_related('route')))()
+        route_names = usage.get(point.id)
         
-        if route_info:
-            routes_text = ", ".join([f"'{rp.route.name}'" for rp in route_info])
+        if route_names:
+            routes_text = ", ".join([f"'{name}'" for name in route_names])
             text += f"📍 {point.name}\n"
             text += f"   🗺 В маршрутах: {routes_text}\n"
         else:
@@ -1992,7 +2007,7 @@ async def handle_point_search_query(message: Message, state: FSMContext):
     # Создаем клавиатуру в зависимости от режима
     keyboard = []
     for point in page_obj:
-        short_point_id = str(point.id)[:8]
+        short_point_id = point.short_id
         
         if mode == "add_to_route":
             # Режим добавления в маршрут
@@ -2012,7 +2027,7 @@ async def handle_point_search_query(message: Message, state: FSMContext):
             ])
     
     # Пагинация для результатов поиска
-    if total_pages > 1:
+    if page_obj.has_next:
         if mode == "add_to_route":
             keyboard.append([
                 InlineKeyboardButton(text="◀️", callback_data="current_page"),
@@ -2042,8 +2057,8 @@ async def handle_point_search_query(message: Message, state: FSMContext):
     if mode != "add_to_route":
         await state.update_data(last_search_query=search_query)
 
-@router.callback_query(F.data.startswith("page_points:"))
-async def handle_points_pagination(callback: CallbackQuery):
+@callbacks.action("page_points")
+async def handle_points_pagination(callback: CallbackQuery, state: FSMContext):
     """Обработка пагинации точек"""
     if not await check_admin(callback.from_user.id):
         return
@@ -2058,7 +2073,7 @@ async def handle_points_pagination(callback: CallbackQuery):
         return
     
     # Получаем точки для указанной страницы
-    page_obj, total_pages = await get_filtered_points(filter_type, search_query, page)
+    page_obj = await get_points_page(filter_type, search_query, page, state=state)
     
     if not page_obj:
         await callback.message.answer("На этой странице нет точек.")
@@ -2068,16 +2083,18 @@ async def handle_points_pagination(callback: CallbackQuery):
     if filter_type == "search":
         text = f"🔍 Результаты поиска по '{search_query}'\n"
     else:
-        text = f"📋 Точки (страница {page}/{total_pages})\n"
+        text = f"📋 Точки (страница {page})\n"
     
-    text += f"📋 Найдено: {len(page_obj)} из {total_pages} результатов\n\n"
+    text += f"📋 На странице: {len(page_obj)}\n\n"
     
+    # Маршруты всех точек страницы одним запросом
+    usage = await get_point_usage(page_obj)
     for point in page_obj:
         # Проверяем использование в маршрутах
-        route_info = await sync_to_async(lambda: list(RoutePoint.objects.filter(point=point).select_related('route')))()
+        route_names = usage.get(point.id)
         
-        if route_info:
-            routes_text = ", ".join([f"'{rp.route.name}'" for rp in route_info])
+        if route_names:
+            routes_text = ", ".join([f"'{name}'" for name in route_names])
             text += f"📍 {point.name}\n"
             text += f"   🗺 В маршрутах: {routes_text}\n"
         else:
@@ -2089,7 +2106,7 @@ async def handle_points_pagination(callback: CallbackQuery):
     # Создаем клавиатуру
     keyboard = []
     for point in page_obj:
-        short_point_id = str(point.id)[:8]
+        short_point_id = point.short_id
         keyboard.append([
             InlineKeyboardButton(
                 text=f"👁️ {point.name}",
@@ -2098,12 +2115,12 @@ async def handle_points_pagination(callback: CallbackQuery):
         ])
     
     # Пагинация
-    keyboard.append(get_points_pagination_keyboard(page, total_pages, filter_type, search_query).inline_keyboard[0])
+    keyboard.append(get_points_pagination_keyboard(page, page_obj.has_next, filter_type, search_query).inline_keyboard[0])
     keyboard.append([InlineKeyboardButton(text="🔙 К фильтрам", callback_data="list_points")])
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data == "group_points_by_routes")
+@callbacks.action("group_points_by_routes")
 async def handle_group_points_by_routes(callback: CallbackQuery):
     """Показать точки, сгруппированные по маршрутам"""
     if not await check_admin(callback.from_user.id):
@@ -2165,12 +2182,12 @@ async def handle_group_points_by_routes(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data == "current_page")
+@callbacks.action("current_page")
 async def handle_current_page(callback: CallbackQuery):
     """Обработка нажатия на текущую страницу (ничего не делает)"""
     await callback.answer("Текущая страница")
 
-@router.callback_query(F.data.startswith("search_for_route:"))
+@callbacks.action("search_for_route")
 async def handle_search_for_route(callback: CallbackQuery, state: FSMContext):
     """Поиск точки для добавления в маршрут"""
     if not await check_admin(callback.from_user.id):
@@ -2181,7 +2198,7 @@ async def handle_search_for_route(callback: CallbackQuery, state: FSMContext):
     await state.update_data(route_id=route_id, mode="add_to_route")
     await callback.message.answer("🔍 Введите название точки для поиска:")
 
-@router.callback_query(F.data.startswith("filter_unused_for_route:"))
+@callbacks.action("filter_unused_for_route")
 async def handle_filter_unused_for_route(callback: CallbackQuery):
     """Показать только неиспользуемые точки для добавления в маршрут"""
     if not await check_admin(callback.from_user.id):
@@ -2190,16 +2207,16 @@ async def handle_filter_unused_for_route(callback: CallbackQuery):
     route_id = callback.data.split(":")[1]
     
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
     
     # Получаем неиспользуемые точки
-    used_point_ids = await sync_to_async(list)(
+    used_point_ids = await database_sync_to_async(list)(
         RoutePoint.objects.values_list('point_id', flat=True)
     )
-    unused_points = await sync_to_async(list)(
+    unused_points = await database_sync_to_async(list)(
         Point.objects.exclude(id__in=used_point_ids).order_by('-created_at')
     )
     
@@ -2241,8 +2258,8 @@ async def handle_filter_unused_for_route(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data.startswith("add_pt_page:"))
-async def handle_add_point_page(callback: CallbackQuery):
+@callbacks.action("add_pt_page")
+async def handle_add_point_page(callback: CallbackQuery, state: FSMContext):
     """Пагинация при добавлении точек в маршрут"""
     if not await check_admin(callback.from_user.id):
         return
@@ -2255,25 +2272,19 @@ async def handle_add_point_page(callback: CallbackQuery):
         return
     
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
     
-    existing_points = await sync_to_async(list)(
-        RoutePoint.objects.filter(route=route).values_list('point_id', flat=True))
-    available_points = await sync_to_async(list)(Point.objects.exclude(id__in=existing_points))
+    page_obj = await get_points_page(page=page, state=state, exclude_route=route.id)
     
-    if not available_points:
+    if not page_obj:
         await callback.message.answer("Нет доступных точек для добавления в маршрут.")
         return
     
-    # Пагинация
-    paginator = Paginator(available_points, 10)
-    page_obj = paginator.get_page(page)
-    
     text = f"➕ Добавление точки в маршрут '{route.name}'\n"
-    text += f"📋 Страница {page}/{paginator.num_pages}\n\n"
+    text += f"📋 Страница {page}\n\n"
     
     for i, point in enumerate(page_obj, 1):
         text += f"{i}. {point.name}\n"
@@ -2301,7 +2312,7 @@ async def handle_add_point_page(callback: CallbackQuery):
         InlineKeyboardButton(text=f"{page}", callback_data="current_page")
     )
     
-    if page < paginator.num_pages:
+    if page_obj.has_next:
         nav_buttons.append(
             InlineKeyboardButton(text="▶️", callback_data=f"add_pt_page:{str(route.id)}:{page+1}")
         )
@@ -2311,8 +2322,8 @@ async def handle_add_point_page(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data.startswith("search_route_page:"))
-async def handle_search_route_page(callback: CallbackQuery):
+@callbacks.action("search_route_page")
+async def handle_search_route_page(callback: CallbackQuery, state: FSMContext):
     """Пагинация поиска при добавлении точек в маршрут"""
     if not await check_admin(callback.from_user.id):
         return
@@ -2325,7 +2336,7 @@ async def handle_search_route_page(callback: CallbackQuery):
         return
     
     # Получаем результаты поиска для указанной страницы
-    page_obj, total_pages = await get_filtered_points("search", search_query, page)
+    page_obj = await get_points_page("search", search_query, page, state=state)
     
     if not page_obj:
         await callback.message.answer("На этой странице нет результатов.")
@@ -2333,14 +2344,16 @@ async def handle_search_route_page(callback: CallbackQuery):
     
     # Формируем текст
     text = f"🔍 Результаты поиска по '{search_query}'\n"
-    text += f"📋 Страница {page}/{total_pages}\n\n"
+    text += f"📋 Страница {page}\n\n"
     
+    # Маршруты всех точек страницы одним запросом
+    usage = await get_point_usage(page_obj)
     for point in page_obj:
         # Проверяем использование в маршрутах
-        route_info = await sync_to_async(lambda: list(RoutePoint.objects.filter(point=point).select_related('route')))()
+        route_names = usage.get(point.id)
         
-        if route_info:
-            routes_text = ", ".join([f"'{rp.route.name}'" for rp in route_info])
+        if route_names:
+            routes_text = ", ".join([f"'{name}'" for name in route_names])
             text += f"📍 {point.name}\n"
             text += f"   🗺 В маршрутах: {routes_text}\n"
         else:
@@ -2352,7 +2365,7 @@ async def handle_search_route_page(callback: CallbackQuery):
     # Создаем клавиатуру
     keyboard = []
     for point in page_obj:
-        short_point_id = str(point.id)[:8]
+        short_point_id = point.short_id
         keyboard.append([
             InlineKeyboardButton(
                 text=f"➕ {point.name}",
@@ -2371,7 +2384,7 @@ async def handle_search_route_page(callback: CallbackQuery):
         InlineKeyboardButton(text=f"{page}", callback_data="current_page")
     )
     
-    if page < total_pages:
+    if page_obj.has_next:
         nav_buttons.append(
             InlineKeyboardButton(text="▶️", callback_data=f"search_route_page:{route_id}:{page+1}:{search_query}")
         )
@@ -2381,7 +2394,7 @@ async def handle_search_route_page(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data.startswith("view_route_points:"))
+@callbacks.action("view_route_points")
 async def handle_view_route_points(callback: CallbackQuery):
     """Показать точки конкретного маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -2389,13 +2402,13 @@ async def handle_view_route_points(callback: CallbackQuery):
     
     route_id = callback.data.split(":")[1]
     try:
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (Route.DoesNotExist, ValueError):
         await callback.message.answer("Маршрут не найден.")
         return
     
     # Получаем точки маршрута
-    route_points = await sync_to_async(list)(
+    route_points = await database_sync_to_async(list)(
         RoutePoint.objects.filter(route=route).order_by('order').select_related('point')
     )
     
@@ -2468,7 +2481,7 @@ async def handle_view_route_points(callback: CallbackQuery):
     
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data.startswith("route_points_page:"))
+@callbacks.action("route_points_page")
 async def handle_route_points_pagination(callback: CallbackQuery):
     """Пагинация для точек маршрута"""
     if not await check_admin(callback.from_user.id):
@@ -2477,13 +2490,13 @@ async def handle_route_points_pagination(callback: CallbackQuery):
     try:
         _, route_id, page_str = callback.data.split(":")
         page = int(page_str)
-        route = await Route.objects.aget(id=uuid.UUID(route_id))
+        route = await database_sync_to_async(Route.objects.get)(id=uuid.UUID(route_id))
     except (ValueError, Route.DoesNotExist):
         await callback.message.answer("Маршрут не найден.")
         return
     
     # Получаем точки маршрута
-    route_points = await sync_to_async(list)(
+    route_points = await database_sync_to_async(list)(
         RoutePoint.objects.filter(route=route).order_by('order').select_related('point')
     )
     
@@ -2577,7 +2590,7 @@ async def handle_route_points_pagination(callback: CallbackQuery):
         # Если не удалось отредактировать, отправляем новое сообщение
         await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
 
-@router.callback_query(F.data.startswith("repeat_search:"))
+@callbacks.action("repeat_search")
 async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
     """Повторный поиск с тем же запросом"""
     if not await check_admin(callback.from_user.id):
@@ -2586,7 +2599,7 @@ async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
     search_query = callback.data.split(":", 1)[1]
     
     # Получаем результаты поиска
-    page_obj, total_pages = await get_filtered_points("search", search_query, page=1)
+    page_obj = await get_points_page("search", search_query, page=1, state=state)
     
     if not page_obj:
         # Даже при неудачном поиске даем возможность продолжить
@@ -2606,14 +2619,16 @@ async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
     
     # Формируем текст результатов
     text = f"🔍 Результаты поиска по '{search_query}'\n"
-    text += f"📋 Найдено: {len(page_obj)} из {total_pages} результатов\n\n"
+    text += f"📋 На странице: {len(page_obj)}\n\n"
     
+    # Маршруты всех точек страницы одним запросом
+    usage = await get_point_usage(page_obj)
     for point in page_obj:
         # Проверяем использование в маршрутах
-        route_info = await sync_to_async(lambda: list(RoutePoint.objects.filter(point=point).select_related('route')))()
+        route_names = usage.get(point.id)
         
-        if route_info:
-            routes_text = ", ".join([f"'{rp.route.name}'" for rp in route_info])
+        if route_names:
+            routes_text = ", ".join([f"'{name}'" for name in route_names])
             text += f"📍 {point.name}\n"
             text += f"   🗺 В маршрутах: {routes_text}\n"
         else:
@@ -2625,7 +2640,7 @@ async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
     # Создаем клавиатуру
     keyboard = []
     for point in page_obj:
-        short_point_id = str(point.id)[:8]
+        short_point_id = point.short_id
         keyboard.append([
             InlineKeyboardButton(
                 text=f"👁️ {point.name}",
@@ -2634,7 +2649,7 @@ async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
         ])
     
     # Пагинация для результатов поиска
-    if total_pages > 1:
+    if page_obj.has_next:
         keyboard.append([
             InlineKeyboardButton(text="◀️", callback_data="current_page"),
             InlineKeyboardButton(text="1", callback_data="current_page"),
@@ -2650,7 +2665,7 @@ async def handle_repeat_search(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
     await state.update_data(last_search_query=search_query)
 
-@router.callback_query(F.data == "new_search")
+@callbacks.action("new_search")
 async def handle_new_search(callback: CallbackQuery, state: FSMContext):
     """Начало нового поиска"""
     if not await check_admin(callback.from_user.id):
@@ -0,0 +1,36 @@
+from core.models import Route
+from core.route_geometry import route_geometry
+from .db import database_sync_to_async
+from .nearby import format_distance
+
+
+def plural(n, one, few, many):
+    """Форма слова для числа: 1 локация, 2 локации, 5 локаций"""
+    if n % 10 == 1 and n % 100 != 11:
+        return one
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return few
+    return many
+
+
+def format_duration(minutes):
+    if minutes < 60:
+        return f"{minutes} мин"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes} мин" if minutes else f"{hours} ч"
+
+
+def route_summary(geometry):
+    """Сколько точек в маршруте, какой он длины и сколько займёт прогулка"""
+    return (
+        f"Всего маршрут включает {geometry.point_count} "
+        f"{plural(geometry.point_count, 'локацию', 'локации', 'локаций')} "
+        f"({format_distance(geometry.length)} пешком), а вся прогулка займет около {format_duration(geometry.duration)}."
+    )
+
+
+@database_sync_to_async
+def get_main_route_geometry():
+    """Геометрия первого активного маршрута — того, что первым стоит в списке маршрутов"""
+    route = Route.objects.filter(is_active=True).select_related('geometry').order_by('created_at').first()
+    return route_geometry(route) if route else None
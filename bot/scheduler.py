@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ScheduledMessage
+from .db import database_sync_to_async
+from .sender import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд повторять неудачную отправку и сколько раз пробовать
+RETRY_DELAY = 60
+MAX_ATTEMPTS = 5
+
+
+class MessageScheduler:
+    """
+    Отложенные и повторяющиеся сообщения.
+
+    Все сообщения хранятся в базе и переживают перезапуск. В памяти лежат только те,
+    что нужно отправить в ближайшие horizon секунд: они разложены по ячейкам
+    колеса времени (одна ячейка на tick секунд), и каждый тик отправляется одна ячейка.
+    Просроченные за время простоя сообщения отправляются сразу после запуска.
+    """
+
+    def __init__(self, horizon=60, tick=1.0):
+        self.horizon = horizon
+        self.tick = tick
+        self._wheel = [[] for _ in range(int(horizon / tick) * 2 + 1)]
+        self._cursor = None  # номер следующего тика для отправки
+        self._loaded_until = None  # всё, что раньше этого времени, уже в колесе
+        self._loading_until = None  # граница окна, которое сейчас читается из базы
+        self._bot = None
+        self._task = None
+        self._queued = set()  # id сообщений в колесе: строку могут одновременно загрузить и перенести
+
+        self._sent = 0
+        self._failed = 0
+
+    def _ticks(self, ts):
+        return int(ts / self.tick)
+
+    def _put(self, message_id, chat_id, text, send_at, repeat_every):
+        if message_id in self._queued:
+            return
+        self._queued.add(message_id)
+        due = max(self._ticks(send_at.timestamp()), self._cursor)
+        self._wheel[due % len(self._wheel)].append((due, message_id, chat_id, text, repeat_every))
+
+    async def schedule(self, chat_id, text, delay=0, at=None, every=None):
+        """Запланировать сообщение через delay секунд (или на время at), every — период повтора"""
+        send_at = at or timezone.now() + timedelta(seconds=delay)
+        message = await database_sync_to_async(ScheduledMessage.objects.create)(
+            chat_id=chat_id, text=text, send_at=send_at, repeat_every=every
+        )
+        if self._in_window(send_at):
+            self._put(message.id, chat_id, text, send_at, every)
+        return message.id
+
+    def _in_window(self, send_at):
+        """
+        Попадает ли время в окно колеса. Окно, которое ещё читается из базы, тоже считается:
+        строка, созданная во время чтения, может в него не попасть, а следующее чтение
+        начнётся уже после его границы. Если строка всё же прочитается, её отсеет _queued.
+        """
+        until = self._loading_until or self._loaded_until
+        return until is not None and send_at < until
+
+    def _load_window(self, since, until):
+        queryset = ScheduledMessage.objects.filter(send_at__lt=until)
+        if since is not None:
+            queryset = queryset.filter(send_at__gte=since)
+        return list(queryset.values_list('id', 'chat_id', 'text', 'send_at', 'repeat_every').iterator())
+
+    async def _load(self):
+        """Переносит в колесо сообщения, время которых наступит в пределах horizon"""
+        until = self._loading_until = timezone.now() + timedelta(seconds=self.horizon)
+        try:
+            rows = await database_sync_to_async(self._load_window)(self._loaded_until, until)
+        finally:
+            self._loading_until = None
+        for row in rows:
+            self._put(*row)
+        self._loaded_until = until
+        if rows:
+            logger.info(f"Загружено отложенных сообщений: {len(rows)}")
+
+    def start(self, bot):
+        self._bot = bot
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        self._cursor = self._ticks(time.time())
+        while True:
+            try:
+                if self._loaded_until is None or \
+                        timezone.now() + timedelta(seconds=self.horizon / 2) >= self._loaded_until:
+                    await self._load()
+            except Exception as e:
+                logger.error(f"Ошибка загрузки отложенных сообщений: {e}")
+
+            now_tick = self._ticks(time.time())
+            while self._cursor <= now_tick:
+                slot = self._wheel[self._cursor % len(self._wheel)]
+                due = [entry for entry in slot if entry[0] <= self._cursor]
+                if due:
+                    slot[:] = [entry for entry in slot if entry[0] > self._cursor]
+                    self._queued.difference_update(entry[1] for entry in due)
+                    asyncio.create_task(self._fire(due))
+                self._cursor += 1
+
+            await asyncio.sleep((self._cursor * self.tick) - time.time())
+
+    async def _send(self, entry):
+        _, message_id, chat_id, text, repeat_every = entry
+        try:
+            with bulk_sends():
+                await self._bot.send_message(chat_id, text)
+            return 'sent'
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Пользователь заблокировал бота или чат недоступен — повторять бессмысленно
+            logger.warning(f"Отложенное сообщение {message_id} не доставлено: {e}")
+            return 'dropped'
+        except Exception as e:
+            logger.error(f"Ошибка отправки отложенного сообщения {message_id}: {e}")
+            return 'retry'
+
+    async def _fire(self, entries):
+        results = await asyncio.gather(*(self._send(entry) for entry in entries))
+        finished, repeating, retries = [], [], []
+        for entry, result in zip(entries, results):
+            message_id, repeat_every = entry[1], entry[4]
+            if result == 'retry':
+                self._failed += 1
+                retries.append(entry)
+            elif result == 'sent' and repeat_every:
+                self._sent += 1
+                repeating.append(entry)
+            else:
+                self._sent += result == 'sent'
+                self._failed += result == 'dropped'
+                finished.append(message_id)
+        try:
+            requeue = await database_sync_to_async(self._save_results)(finished, repeating, retries)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения результатов отложенных сообщений: {e}")
+            return
+        for message_id, chat_id, text, send_at, repeat_every in requeue:
+            if self._in_window(send_at):
+                self._put(message_id, chat_id, text, send_at, repeat_every)
+
+    def _save_results(self, finished, repeating, retries):
+        """Удаляет отправленные сообщения и переносит повторяющиеся и неудачные; возвращает перенесённые"""
+        requeue = []
+        if finished:
+            ScheduledMessage.objects.filter(id__in=finished).delete()
+
+        for due, message_id, chat_id, text, repeat_every in repeating:
+            send_at = datetime.fromtimestamp(due * self.tick, dt_timezone.utc) + timedelta(seconds=repeat_every)
+            ScheduledMessage.objects.filter(id=message_id).update(send_at=send_at, attempts=0)
+            requeue.append((message_id, chat_id, text, send_at, repeat_every))
+
+        if retries:
+            ids = [entry[1] for entry in retries]
+            ScheduledMessage.objects.filter(id__in=ids, attempts__gte=MAX_ATTEMPTS - 1).delete()
+            send_at = timezone.now() + timedelta(seconds=RETRY_DELAY)
+            ScheduledMessage.objects.filter(id__in=ids).update(send_at=send_at, attempts=F('attempts') + 1)
+            retried = set(ScheduledMessage.objects.filter(id__in=ids).values_list('id', flat=True))
+            requeue += [
+                (message_id, chat_id, text, send_at, repeat_every)
+                for _, message_id, chat_id, text, repeat_every in retries if message_id in retried
+            ]
+        return requeue
+
+    def metrics(self):
+        return {
+            'in_memory': len(self._queued),
+            'sent': self._sent,
+            'failed': self._failed,
+        }
+
+
+message_scheduler = MessageScheduler()
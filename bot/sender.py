@@ -0,0 +1,280 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from .metrics import latency_summary
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты отправки: ответы пользователю идут раньше массовых рассылок
+INTERACTIVE = 0
+BULK = 1
+
+# Методы Bot API, на которые действуют лимиты Telegram на отправку сообщений
+RATE_LIMITED_METHODS = {
+    'SendMessage', 'SendPhoto', 'SendAudio', 'SendVideo', 'SendDocument', 'SendVoice',
+    'SendAnimation', 'SendLocation', 'SendVenue', 'SendContact', 'SendSticker',
+    'SendMediaGroup', 'CopyMessage', 'ForwardMessage',
+    'EditMessageText', 'EditMessageCaption', 'EditMessageMedia', 'EditMessageReplyMarkup',
+}
+
+_priority = contextvars.ContextVar('send_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def bulk_sends():
+    """Все отправки внутри блока идут с низким приоритетом (рассылки, отложенные сообщения)"""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Сколько секунд ждать до появления токена"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds, now):
+        """Блокирует отправку после RetryAfter от Telegram"""
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+        self.updated = now
+
+    def is_idle(self, now):
+        return now >= self.blocked_until and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Job:
+    __slots__ = ('priority', 'seq', 'call', 'future', 'enqueued_at', 'attempts')
+
+    def __init__(self, priority, seq, call, future):
+        self.priority = priority
+        self.seq = seq
+        self.call = call
+        self.future = future
+        self.enqueued_at = monotonic()
+        self.attempts = 0
+
+
+class SendScheduler:
+    """
+    Очередь исходящих запросов к Telegram.
+
+    Сообщения одного чата отправляются строго по порядку и не чаще лимита чата,
+    все чаты вместе — не чаще глобального лимита бота. Чаты, которые упёрлись
+    в свой лимит, не задерживают остальные.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, group_rate=20 / 60,
+                 group_burst=3, max_concurrency=8, max_retries=3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._buckets = {}
+        self._chats = {}  # chat_id -> очередь заданий чата
+        self._ready = []  # куча (приоритет, порядковый номер, chat_id) чатов, готовых к отправке
+        self._in_flight = set()
+        self._seq = itertools.count()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_prune = monotonic()
+
+        self._queued = [0, 0]
+        self._sent = 0
+        self._failed = 0
+        self._retries = 0
+        self._latencies = deque(maxlen=1000)
+
+    async def submit(self, chat_id, call, priority=INTERACTIVE):
+        """Ставит запрос в очередь и ждёт его результата"""
+        self._ensure_started()
+        job = _Job(priority, next(self._seq), call, asyncio.get_running_loop().create_future())
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+        queue.append(job)
+        self._queued[priority] += 1
+        if len(queue) == 1 and chat_id not in self._in_flight:
+            self._schedule(chat_id)
+        return await job.future
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Неотправленные запросы отменяем, чтобы их не ждали вечно
+        for queue in self._chats.values():
+            for job in queue:
+                self._queued[job.priority] -= 1
+                if not job.future.done():
+                    job.future.cancel()
+        self._chats.clear()
+        self._ready.clear()
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _schedule(self, chat_id):
+        """Помещает чат в очередь готовых по приоритету его первого задания"""
+        queue = self._chats.get(chat_id)
+        if not queue:
+            return
+        head = queue[0]
+        heapq.heappush(self._ready, (head.priority, head.seq, chat_id))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = monotonic()
+            if now - self._last_prune > 60:
+                self._prune(now)
+
+            priority, seq, chat_id = heapq.heappop(self._ready)
+            bucket = self._bucket(chat_id)
+            chat_delay = bucket.delay(now)
+            if chat_delay > 0:
+                # Чат пока нельзя — возвращаемся к нему позже, не блокируя остальные
+                asyncio.get_running_loop().call_later(chat_delay, self._schedule, chat_id)
+                continue
+
+            global_delay = self._global.delay(now)
+            if global_delay > 0:
+                heapq.heappush(self._ready, (priority, seq, chat_id))
+                await asyncio.sleep(global_delay)
+                continue
+
+            await self._slots.acquire()
+            self._global.take()
+            bucket.take()
+            job = self._chats[chat_id].popleft()
+            self._queued[job.priority] -= 1
+            self._in_flight.add(chat_id)
+            asyncio.create_task(self._execute(chat_id, job))
+
+    async def _execute(self, chat_id, job):
+        try:
+            job.attempts += 1
+            result = await job.call()
+        except TelegramRetryAfter as e:
+            self._retries += 1
+            if job.attempts > self.max_retries:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                logger.warning(f"Flood control в чате {chat_id}, повтор через {e.retry_after} с")
+                self._bucket(chat_id).pause(e.retry_after, monotonic())
+                # Возвращаем задание в начало очереди чата, чтобы не нарушить порядок
+                self._chats.setdefault(chat_id, deque()).appendleft(job)
+                self._queued[job.priority] += 1
+        except Exception as e:
+            self._failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self._sent += 1
+            self._latencies.append(monotonic() - job.enqueued_at)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight.discard(chat_id)
+            self._slots.release()
+            if self._chats.get(chat_id):
+                self._schedule(chat_id)
+            else:
+                self._chats.pop(chat_id, None)
+
+    def _prune(self, now):
+        """Удаляет лимиты чатов, которые давно ничего не отправляли"""
+        self._last_prune = now
+        for chat_id in [c for c, b in self._buckets.items() if c not in self._chats and b.is_idle(now)]:
+            del self._buckets[chat_id]
+
+    def metrics(self):
+        """Глубина очереди, число запросов и задержка от постановки в очередь до отправки"""
+        return {
+            'queued': sum(self._queued),
+            'queued_interactive': self._queued[INTERACTIVE],
+            'queued_bulk': self._queued[BULK],
+            'chats_waiting': len(self._chats),
+            'in_flight': len(self._in_flight),
+            'sent': self._sent,
+            'failed': self._failed,
+            'retry_after': self._retries,
+            'latency': latency_summary(self._latencies),
+        }
+
+
+class SendSchedulerMiddleware(BaseRequestMiddleware):
+    """Пропускает отправку сообщений через SendScheduler"""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if chat_id is None or type(method).__name__ not in RATE_LIMITED_METHODS:
+            return await make_request(bot, method)
+        return await self.scheduler.submit(chat_id, lambda: make_request(bot, method), _priority.get())
+
+
+send_scheduler = SendScheduler()
+
+
+def install_send_scheduler(bot):
+    """Подключает общий планировщик отправки к сессии бота (один раз)"""
+    if getattr(bot.session, '_send_scheduler_installed', False):
+        return
+    bot.session.middleware(SendSchedulerMiddleware(send_scheduler))
+    bot.session._send_scheduler_installed = True
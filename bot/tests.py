@@ -0,0 +1,463 @@
+import asyncio
+import threading
+import time
+import uuid
+from datetime import timedelta
+from unittest import IsolatedAsyncioTestCase, mock
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import SendMessage
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core.models import FSMRecord, Point, RoutePointPass, ScheduledMessage, UserRouteProgress
+from core.testing import build_point, bulk_create_points, create_route, create_user
+from bot import progress, scheduler
+from bot.fsm_storage import DatabaseStorage
+from bot.point_lookup import _find_points
+from bot.point_pages import POINTS_PER_PAGE, _fetch_page, points_queryset
+from bot.progress import ProgressRecorder, new_progress_id
+from bot.scheduler import MessageScheduler
+from bot.sender import BULK, INTERACTIVE, SendScheduler
+from bot.walk_session import WalkSession
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not await condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Не дождались условия')
+        await asyncio.sleep(0.02)
+
+
+def retry_after(seconds=0):
+    return TelegramRetryAfter(SendMessage(chat_id=1, text=''), 'Flood control', seconds)
+
+
+class SendSchedulerTests(IsolatedAsyncioTestCase):
+    """Очередь исходящих запросов: порядок в чате, повтор после RetryAfter, остановка"""
+
+    def setUp(self):
+        self.scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000)
+        self.calls = []
+
+    async def asyncTearDown(self):
+        await self.scheduler.close()
+
+    def call(self, name, fail_with=()):
+        errors = list(fail_with)
+
+        async def call():
+            self.calls.append(name)
+            if errors:
+                raise errors.pop(0)
+            await asyncio.sleep(0)
+            return name
+        return call
+
+    async def test_chat_order(self):
+        results = await asyncio.gather(*(
+            self.scheduler.submit(1, self.call(i)) for i in range(10)
+        ))
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(self.calls, list(range(10)))
+
+    async def test_interactive_before_bulk(self):
+        self.scheduler = SendScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000, max_concurrency=1)
+        tasks = [asyncio.create_task(self.scheduler.submit(chat, self.call(f'bulk{chat}'), BULK))
+                 for chat in range(1, 4)]
+        tasks.append(asyncio.create_task(self.scheduler.submit(10, self.call('interactive'), INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        # Ответ пользователю поставлен последним, но уходит раньше рассылки
+        self.assertEqual(self.calls, ['interactive', 'bulk1', 'bulk2', 'bulk3'])
+
+    async def test_retry_after_keeps_order(self):
+        first = asyncio.create_task(self.scheduler.submit(1, self.call('first', [retry_after()])))
+        second = asyncio.create_task(self.scheduler.submit(1, self.call('second')))
+        with self.assertLogs('bot.sender', 'WARNING'):
+            self.assertEqual(await asyncio.gather(first, second), ['first', 'second'])
+        # Повтор первого сообщения идёт раньше второго
+        self.assertEqual(self.calls, ['first', 'first', 'second'])
+        self.assertEqual(self.scheduler.metrics()['retry_after'], 1)
+
+    async def test_retry_after_gives_up(self):
+        self.scheduler.max_retries = 1
+        with self.assertRaises(TelegramRetryAfter), self.assertLogs('bot.sender', 'WARNING'):
+            await self.scheduler.submit(1, self.call('message', [retry_after(), retry_after()]))
+        self.assertEqual(self.scheduler.metrics()['failed'], 1)
+
+    async def test_error_is_returned_to_caller(self):
+        with self.assertRaises(ValueError):
+            await self.scheduler.submit(1, self.call('message', [ValueError('bad request')]))
+        self.assertEqual(await self.scheduler.submit(1, self.call('next')), 'next')
+
+    async def test_close_cancels_queued(self):
+        # Лимит чата — одно сообщение, остальные ждут в очереди
+        self.scheduler = SendScheduler(global_rate=1000, chat_rate=0.001, chat_burst=1)
+        sent = asyncio.create_task(self.scheduler.submit(1, self.call('sent')))
+        queued = [asyncio.create_task(self.scheduler.submit(1, self.call(i))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        await self.scheduler.close()
+
+        self.assertEqual(await sent, 'sent')
+        for task in queued:
+            with self.assertRaises(asyncio.CancelledError):
+                await asyncio.wait_for(task, 1)
+        self.assertEqual(self.scheduler.metrics()['queued'], 0)
+
+
+class DatabaseStorageTests(TransactionTestCase):
+    """FSM-хранилище в базе: изменения копятся в памяти и пишутся пачкой"""
+
+    def setUp(self):
+        # Фоновую запись не ждём: каждый тест вызывает flush сам
+        self.storage = DatabaseStorage(flush_interval=3600)
+
+    def key(self, user_id):
+        return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+
+    async def test_changes_coalesce(self):
+        with mock.patch.object(DatabaseStorage, '_write_rows', autospec=True,
+                               side_effect=DatabaseStorage._write_rows) as write_rows:
+            for step in range(5):
+                await self.storage.set_state(self.key(1), f'step{step}')
+                await self.storage.set_data(self.key(1), {'step': step})
+            await self.storage.set_state(self.key(2), 'start')
+            await self.storage.flush()
+
+        # Десять изменений первого ключа — одна строка, обе строки — одна пачка
+        self.assertEqual(write_rows.call_count, 1)
+        self.assertEqual(len(write_rows.call_args.args[1]), 2)
+        record = await FSMRecord.objects.aget(key__endswith=':1:1:default')
+        self.assertEqual((record.state, record.data), ('step4', {'step': 4}))
+        self.assertEqual(self.storage.metrics()['written'], 2)
+
+    async def test_finished_session_is_deleted(self):
+        await self.storage.set_state(self.key(1), 'start')
+        await self.storage.set_data(self.key(1), {'route': 1})
+        await self.storage.flush()
+        self.assertEqual(await FSMRecord.objects.acount(), 1)
+
+        await self.storage.set_state(self.key(1), None)
+        await self.storage.set_data(self.key(1), {})
+        await self.storage.flush()
+        self.assertEqual(await FSMRecord.objects.acount(), 0)
+
+    async def test_bad_row_does_not_block_others(self):
+        await self.storage.set_state(self.key(1), 'start')
+        # Данные, которые не сериализуются в JSON, не запишутся никогда
+        await self.storage.set_data(self.key(2), {'bad': object()})
+        await self.storage.set_state(self.key(3), 'start')
+        with self.assertLogs('bot.fsm_storage', 'ERROR'):
+            await self.storage.flush()
+
+        states = [state async for state in FSMRecord.objects.values_list('state', flat=True)]
+        self.assertEqual(states, ['start', 'start'])
+        metrics = self.storage.metrics()
+        self.assertEqual((metrics['written'], metrics['rejected'], metrics['dirty']), (2, 1, 0))
+        # Состояние отвергнутой записи осталось в памяти
+        self.assertIsInstance((await self.storage.get_data(self.key(2)))['bad'], object)
+
+    async def test_database_error_keeps_changes(self):
+        await self.storage.set_state(self.key(1), 'start')
+        await self.storage.set_state(self.key(2), 'start')
+        with mock.patch.object(DatabaseStorage, '_write_rows', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                await self.storage.flush()
+        self.assertEqual(self.storage.metrics()['dirty'], 2)
+
+        await self.storage.flush()
+        self.assertEqual(await FSMRecord.objects.acount(), 2)
+
+
+class FakeBot:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append((chat_id, text))
+        if self.error is not None:
+            raise self.error
+
+
+class MessageSchedulerTests(TransactionTestCase):
+    """Отложенные сообщения: колесо времени поверх строк ScheduledMessage"""
+
+    def setUp(self):
+        self.scheduler = MessageScheduler(horizon=4, tick=0.05)
+
+    async def asyncTearDown(self):
+        await self.scheduler.close()
+
+    async def create(self, send_at, **fields):
+        message = await ScheduledMessage.objects.acreate(chat_id=1, text='Напоминание', send_at=send_at, **fields)
+        return message.id
+
+    async def row(self, message_id):
+        return await ScheduledMessage.objects.filter(id=message_id).values('send_at', 'attempts').afirst()
+
+    async def loaded(self):
+        return self.scheduler._loaded_until is not None
+
+    def start(self, bot):
+        self.scheduler.start(bot)
+        return bot
+
+    async def test_overdue_sent_on_startup(self):
+        message_id = await self.create(timezone.now() - timedelta(hours=1))
+        bot = self.start(FakeBot())
+
+        async def deleted():
+            return await self.row(message_id) is None
+        await wait_until(deleted)
+        self.assertEqual(bot.sent, [(1, 'Напоминание')])
+        self.assertEqual(self.scheduler.metrics()['sent'], 1)
+
+    async def test_scheduled_while_running(self):
+        bot = self.start(FakeBot())
+        await wait_until(self.loaded)
+        message_id = await self.scheduler.schedule(1, 'Скоро', delay=0.1)
+
+        async def deleted():
+            return await self.row(message_id) is None
+        await wait_until(deleted)
+        self.assertEqual(bot.sent, [(1, 'Скоро')])
+
+    async def test_repeat_moves_to_next_period(self):
+        send_at = timezone.now() - timedelta(seconds=0.5)
+        message_id = await self.create(send_at, repeat_every=1)
+        bot = self.start(FakeBot())
+
+        async def sent_twice():
+            return len(bot.sent) >= 2
+        await wait_until(sent_twice)
+        row = await self.row(message_id)
+        # Строка осталась, время сдвинуто на период от времени отправки
+        self.assertGreater(row['send_at'], send_at + timedelta(seconds=1))
+        self.assertEqual(row['attempts'], 0)
+
+    async def test_retry_after_error(self):
+        message_id = await self.create(timezone.now())
+        with self.assertLogs('bot.scheduler', 'ERROR'):
+            self.start(FakeBot(RuntimeError('network is down')))
+
+            async def attempted():
+                return (await self.row(message_id))['attempts'] == 1
+            await wait_until(attempted)
+        row = await self.row(message_id)
+        self.assertGreater(row['send_at'], timezone.now() + timedelta(seconds=scheduler.RETRY_DELAY / 2))
+        self.assertEqual(self.scheduler.metrics()['failed'], 1)
+
+    async def test_retries_exhausted(self):
+        message_id = await self.create(timezone.now(), attempts=scheduler.MAX_ATTEMPTS - 1)
+        with self.assertLogs('bot.scheduler', 'ERROR'):
+            self.start(FakeBot(RuntimeError('network is down')))
+
+            async def deleted():
+                return await self.row(message_id) is None
+            await wait_until(deleted)
+
+    async def test_blocked_chat_dropped(self):
+        message_id = await self.create(timezone.now())
+        error = TelegramForbiddenError(SendMessage(chat_id=1, text=''), 'bot was blocked by the user')
+        with self.assertLogs('bot.scheduler', 'WARNING'):
+            bot = self.start(FakeBot(error))
+
+            async def deleted():
+                return await self.row(message_id) is None
+            await wait_until(deleted)
+        # Повторов нет: ошибка постоянная
+        self.assertEqual(len(bot.sent), 1)
+        self.assertEqual(self.scheduler.metrics()['failed'], 1)
+
+    async def test_scheduled_during_load(self):
+        self.scheduler._cursor = self.scheduler._ticks(time.time())
+        reading, release = threading.Event(), threading.Event()
+
+        def snapshot(since, until):
+            # Чтение окна уже выполнено, строка появится после него
+            reading.set()
+            release.wait(5)
+            return []
+
+        with mock.patch.object(self.scheduler, '_load_window', snapshot):
+            load = asyncio.create_task(self.scheduler._load())
+            await asyncio.to_thread(reading.wait, 5)
+            message_id = await self.scheduler.schedule(1, 'Во время загрузки', delay=1)
+            release.set()
+            await load
+
+        self.assertIn(message_id, self.scheduler._queued)
+
+
+class PointPagesTests(TestCase):
+    """Пагинация точек по ключу (created_at, id)"""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def add_points(self, count, created_at):
+        points = bulk_create_points([build_point(self.user, name=f"Точка {i}") for i in range(count)])
+        # created_at ставится при сохранении, одинаковое время задаём отдельно
+        Point.objects.filter(id__in=[point.id for point in points]).update(created_at=created_at)
+        return points
+
+    def walk(self, filter_type='all', exclude_route=None):
+        """Проходит все страницы по курсорам, как кнопка ▶️"""
+        pages, cursor = [], None
+        while True:
+            page = _fetch_page(filter_type, None, exclude_route, len(pages) + 1, cursor)
+            pages.append([point.id for point in page])
+            if not page.has_next:
+                return pages
+            cursor = page.cursor
+
+    def assertWalksAll(self, **filters):
+        pages = self.walk(**filters)
+        ids = [point_id for page in pages for point_id in page]
+        expected = list(points_queryset(**filters).values_list('id', flat=True))
+        # Ни одна точка не пропала и не повторилась на стыке страниц
+        self.assertEqual(ids, expected)
+        self.assertTrue(all(len(page) == POINTS_PER_PAGE for page in pages[:-1]))
+        return pages
+
+    def test_equal_created_at_across_pages(self):
+        self.add_points(POINTS_PER_PAGE * 2 + 5, timezone.now())
+        self.assertEqual(len(self.assertWalksAll()), 3)
+
+    def test_tie_group_on_page_boundary(self):
+        now = timezone.now()
+        self.add_points(POINTS_PER_PAGE - 3, now)
+        # Группа с одинаковым временем начинается на первой странице и кончается на второй
+        self.add_points(6, now - timedelta(minutes=1))
+        self.add_points(POINTS_PER_PAGE, now - timedelta(minutes=2))
+        self.assertWalksAll()
+
+    def test_unused_and_excluded_route(self):
+        points = self.add_points(POINTS_PER_PAGE * 2, timezone.now())
+        route = create_route(self.user, points[::3])
+        self.assertWalksAll(filter_type='unused')
+        self.assertWalksAll(exclude_route=route.id)
+
+    def test_exact_page_has_no_next(self):
+        self.add_points(POINTS_PER_PAGE, timezone.now())
+        self.assertEqual(len(self.assertWalksAll()), 1)
+
+
+class PointLookupTests(TestCase):
+    """Поиск точки по id из callback-данных: полный UUID, короткий id или его начало"""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def create(self, hex_id):
+        # Короткий id задаёт сигнал, как при обычном сохранении точки
+        point = build_point(self.user, id=uuid.UUID(hex_id))
+        point.save()
+        return point
+
+    def find(self, handle):
+        return [point.id for point in _find_points(handle)]
+
+    def test_full_uuid(self):
+        point = self.create('abcd1234' + '0' * 24)
+        self.assertEqual(self.find(str(point.id)), [point.id])
+        self.assertEqual(self.find(point.id.hex), [point.id])
+
+    def test_short_id(self):
+        point = self.create('abcd1234' + '0' * 24)
+        self.assertEqual(point.short_id, 'abcd1234')
+        self.assertEqual(self.find('abcd1234'), [point.id])
+        self.assertEqual(self.find('ffff0000'), [])
+
+    def test_collision_gets_longer_short_id(self):
+        first = self.create('abcd1234' + '0' * 24)
+        second = self.create('abcd1234' + 'f' * 24)
+        self.assertEqual(second.short_id, 'abcd1234f')
+        # Точное совпадение важнее совпадения по началу
+        self.assertEqual(self.find('abcd1234'), [first.id])
+        self.assertEqual(self.find('abcd1234f'), [second.id])
+
+    def test_prefix_of_longer_short_id(self):
+        first = self.create('abcd1234' + '0' * 24)
+        second = self.create('abcd1234' + 'f' * 24)
+        first.delete()
+        # Старая кнопка с восьмисимвольным id ведёт на единственную подходящую точку
+        self.assertEqual(self.find('abcd1234'), [second.id])
+
+    def test_ambiguous_prefix(self):
+        points = bulk_create_points([
+            build_point(self.user, short_id='abcd1234e'),
+            build_point(self.user, short_id='abcd1234f'),
+        ])
+        self.assertCountEqual(self.find('abcd1234'), [point.id for point in points])
+
+
+class ProgressRecorderTests(TransactionTestCase):
+    """Отложенная запись прохождения маршрутов"""
+
+    def setUp(self):
+        self.recorder = ProgressRecorder(flush_interval=3600)
+        self.user = create_user(telegram_id=1)
+        self.points = bulk_create_points([build_point(self.user, name=f"Точка {i}") for i in range(3)])
+        route = create_route(self.user, self.points)
+        self.walk = WalkSession.start(route.id, route.version, new_progress_id())
+
+    async def asyncTearDown(self):
+        await self.recorder.close()
+
+    def pass_point(self, position):
+        self.recorder.passed(self.walk, 1, self.points[position], position,
+                             completed=position == len(self.points) - 1)
+
+    async def test_events_coalesce(self):
+        self.recorder.started(self.walk, 1)
+        for position in range(3):
+            self.pass_point(position)
+        await self.recorder.flush()
+
+        row = await UserRouteProgress.objects.aget(id=self.walk.progress_id)
+        self.assertEqual((row.status, row.points_passed), (UserRouteProgress.Status.COMPLETED, 3))
+        self.assertEqual(await RoutePointPass.objects.acount(), 3)
+
+    async def test_failed_flush_keeps_newer_state(self):
+        self.recorder.started(self.walk, 1)
+        self.pass_point(0)
+
+        def failing_write(write):
+            async def write_while_user_walks(*args):
+                # Пока пачка пишется, пользователь проходит следующую точку, а база отвечает ошибкой
+                self.pass_point(1)
+                raise RuntimeError('database is down')
+            return write_while_user_walks
+
+        with mock.patch.object(progress, 'database_sync_to_async', failing_write):
+            with self.assertRaises(RuntimeError):
+                await self.recorder.flush()
+        self.assertEqual(self.recorder.metrics()['pending_progress'], 1)
+
+        await self.recorder.flush()
+        row = await UserRouteProgress.objects.aget(id=self.walk.progress_id)
+        # Вернувшееся из неудачной записи старое состояние не затёрло новое
+        self.assertEqual(row.points_passed, 2)
+        positions = [p async for p in RoutePointPass.objects.order_by('passed_at').values_list('position', flat=True)]
+        self.assertEqual(positions, [0, 1])
+        self.assertEqual(self.recorder.metrics()['failed_flushes'], 1)
+
+    async def test_bad_progress_does_not_block_others(self):
+        other = WalkSession.start(self.walk.route_id, self.walk.route_version, new_progress_id())
+        self.recorder.started(self.walk, 1)
+        self.recorder.started(other, 1)
+        # Номер версии, который не помещается в столбец, не запишется никогда
+        self.recorder._progress[other.progress_id]['route_version'] = 'not a number'
+        with self.assertLogs('bot.progress', 'ERROR'):
+            await self.recorder.flush()
+
+        self.assertTrue(await UserRouteProgress.objects.filter(id=self.walk.progress_id).aexists())
+        metrics = self.recorder.metrics()
+        self.assertEqual((metrics['rejected'], metrics['pending_progress']), (1, 0))
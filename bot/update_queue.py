@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from collections import deque
+from time import monotonic
+
+from .metrics import latency_summary
+
+logger = logging.getLogger(__name__)
+
+
+def chat_key(update):
+    """Чат, к которому относится апдейт: апдейты одного чата обрабатываются строго по порядку"""
+    event = update.event
+    chat = getattr(event, 'chat', None)
+    if chat is None and getattr(event, 'message', None) is not None:
+        chat = event.message.chat  # callback_query
+    if chat is not None:
+        return chat.id
+    user = getattr(event, 'from_user', None)
+    if user is not None:
+        return user.id
+    # Апдейты без чата и пользователя упорядочивать не нужно
+    return f"update_{update.update_id}"
+
+
+class UpdateQueue:
+    """
+    Очередь входящих апдейтов вебхука.
+
+    Вебхук только кладёт апдейт в очередь и сразу отвечает Telegram, а обрабатывают
+    апдейты workers фоновых задач. В каждый момент для чата обрабатывается не больше
+    одного апдейта, поэтому порядок внутри чата сохраняется, а разные чаты идут параллельно.
+    """
+
+    def __init__(self, dispatcher, bot, workers=16, max_pending=10000):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.workers = workers
+        self.max_pending = max_pending
+        self._chats = {}  # чат -> очередь (апдейт, время постановки); первый элемент сейчас обрабатывается
+        self._ready = asyncio.Queue()  # чаты, у которых есть необработанные апдейты
+        self._tasks = []
+        self._pending = 0
+        self._busy = 0
+        self._closing = False
+
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._latencies = deque(maxlen=1000)
+
+    def submit(self, update):
+        """Ставит апдейт в очередь. False — очередь переполнена, Telegram повторит доставку позже"""
+        if self._closing or self._pending >= self.max_pending:
+            self._rejected += 1
+            return False
+        self._ensure_started()
+
+        key = chat_key(update)
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = self._chats[key] = deque()
+        queue.append((update, monotonic()))
+        self._pending += 1
+        if len(queue) == 1:
+            self._ready.put_nowait(key)
+        return True
+
+    def _ensure_started(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._chats[key]
+            update, enqueued_at = queue[0]
+            self._busy += 1
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Ошибка обработки апдейта {update.update_id}: {e}")
+            else:
+                self._processed += 1
+            finally:
+                self._busy -= 1
+                self._pending -= 1
+                self._latencies.append(monotonic() - enqueued_at)
+                queue.popleft()
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+
+    async def close(self, timeout=10):
+        """Перестаёт принимать апдейты и даёт обработать уже принятые"""
+        self._closing = True
+        deadline = monotonic() + timeout
+        while self._pending and monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._pending:
+            logger.warning(f"Не обработано {self._pending} апдейтов при остановке")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def metrics(self):
+        """Глубина очереди, загрузка обработчиков и задержка от получения апдейта до конца обработки"""
+        return {
+            'pending': self._pending,
+            'chats_waiting': len(self._chats),
+            'workers': self.workers,
+            'busy_workers': self._busy,
+            'processed': self._processed,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'latency': latency_summary(self._latencies),
+        }
@@ -0,0 +1,52 @@
+import time
+from dataclasses import dataclass
+
+# Ключ в данных FSM, под которым хранится прохождение маршрута
+STATE_KEY = 'walk'
+
+
+@dataclass(slots=True)
+class WalkSession:
+    """
+    Прохождение маршрута пользователем. В FSM хранится только эта запись,
+    содержимое маршрута берётся из общего кэша скомпилированных маршрутов.
+    """
+    route_id: str
+    route_version: int
+    index: int = 0  # Индекс следующей точки для отправки
+    started_at: int = 0
+    updated_at: int = 0
+    progress_id: str = ''  # UserRouteProgress, куда пишется прохождение
+
+    @classmethod
+    def start(cls, route_id, route_version, progress_id='', index=0, started_at=None):
+        now = int(time.time())
+        return cls(str(route_id), route_version, index, started_at or now, now, progress_id)
+
+    def advance(self, route_version):
+        """Переходит к следующей точке; версия обновляется, если маршрут пересобрали"""
+        self.index += 1
+        self.route_version = route_version
+        self.updated_at = int(time.time())
+
+    def to_state(self):
+        # Список вместо словаря: данные FSM лежат в памяти или базе для каждого пользователя
+        return {STATE_KEY: [
+            self.route_id, self.route_version, self.index, self.started_at, self.updated_at, self.progress_id
+        ]}
+
+    @classmethod
+    def from_state(cls, data):
+        record = data.get(STATE_KEY)
+        if not record:
+            return None
+        return cls(*record)
+
+
+async def load_walk(state):
+    """Текущее прохождение маршрута из FSM или None"""
+    return WalkSession.from_state(await state.get_data())
+
+
+async def save_walk(state, session):
+    await state.update_data(session.to_state())
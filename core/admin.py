@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Quest, PromoCode, UserQuestProgress, Point, PointPhoto, PointAudio, PointVideo
+from .models import User, Quest, PromoCode, UserQuestProgress, UserRouteProgress, RoutePointPass, Point, PointPhoto, PointAudio, PointVideo
 
 
 @admin.register(User)
@@ -31,6 +31,21 @@ class UserQuestProgressAdmin(admin.ModelAdmin):
     raw_id_fields = ('user', 'quest', 'promo_code')
 
 
+class RoutePointPassInline(admin.TabularInline):
+    model = RoutePointPass
+    extra = 0
+    raw_id_fields = ('point',)
+
+
+@admin.register(UserRouteProgress)
+class UserRouteProgressAdmin(admin.ModelAdmin):
+    inlines = [RoutePointPassInline]
+    list_display = ('user', 'route', 'status', 'points_passed', 'started_at', 'completed_at')
+    list_filter = ('status', 'route', 'started_at')
+    search_fields = ('user__name', 'route__name')
+    raw_id_fields = ('user', 'route', 'last_point')
+
+
 class PointPhotoInline(admin.TabularInline):
     model = PointPhoto
     extra = 1
@@ -0,0 +1,147 @@
+import math
+import threading
+from collections import defaultdict
+from time import monotonic
+
+from .models import ContentVersion, Point, RoutePoint
+
+EARTH_RADIUS = 6371000  # м
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками по поверхности Земли, м"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Пространственный индекс: сетка ячеек cell×cell градусов, в каждой — объекты внутри неё.
+    Ближайшие ищутся кольцами ячеек вокруг точки запроса, поэтому смотрятся только
+    объекты поблизости, а не все. У одного ключа может быть несколько координат
+    (например, все точки маршрута) — в ответе он один, с ближайшим расстоянием.
+    """
+
+    def __init__(self, items=(), cell=0.01):
+        self.cell = cell
+        self._cells = defaultdict(list)
+        self._size = 0
+        for lat, lon, key in items:
+            self._cells[self._cell_of(lat, lon)].append((lat, lon, key))
+            self._size += 1
+        if self._cells:
+            rows, cols = zip(*self._cells)
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def __len__(self):
+        return self._size
+
+    def _cell_of(self, lat, lon):
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def _collect(self, lat, lon, best, cells):
+        for cell in cells:
+            for item_lat, item_lon, key in self._cells.get(cell, ()):
+                d = distance(lat, lon, item_lat, item_lon)
+                if d < best.get(key, math.inf):
+                    best[key] = d
+
+    def nearest(self, lat, lon, k=10, radius=None):
+        """k ближайших ключей как [(расстояние в м, ключ)], по возрастанию; radius — не дальше, м"""
+        if not self._size:
+            return []
+        row, col = self._cell_of(lat, lon)
+        min_row, max_row, min_col, max_col = self._bounds
+        # Сколько колец нужно, чтобы накрыть все занятые ячейки
+        max_ring = max(row - min_row, max_row - row, col - min_col, max_col - col, 0)
+
+        best = {}
+        ring = 0
+        while ring <= max_ring:
+            if (2 * ring + 1) ** 2 > self._size:
+                # Колец стало больше, чем объектов: проще проверить оставшиеся ячейки целиком
+                self._collect(lat, lon, best, self._cells)
+                break
+            self._collect(lat, lon, best, self._ring(row, col, ring))
+            # Всё, что ближе ring ячеек, уже просмотрено. Ячейка уже по долготе, чем по широте,
+            # и тем уже, чем дальше от экватора, — берём ширину на дальнем краю колец
+            far_lat = min(abs(lat) + (ring + 1) * self.cell, 89.9)
+            covered = ring * self.cell * METERS_PER_DEGREE * math.cos(math.radians(far_lat))
+            if radius is not None and covered >= radius:
+                break
+            if len(best) >= k and sorted(best.values())[k - 1] <= covered:
+                break
+            ring += 1
+
+        found = sorted((d, key) for key, d in best.items() if radius is None or d <= radius)
+        return found[:k]
+
+    def within(self, lat, lon, radius):
+        """Все ключи не дальше radius метров как [(расстояние в м, ключ)], по возрастанию"""
+        return self.nearest(lat, lon, k=self._size, radius=radius)
+
+
+class GeoIndex:
+    """
+    Индексы точек и активных маршрутов (по координатам их точек) в памяти процесса.
+    Перестраиваются, когда сигналы core.signals увеличивают версии точек или маршрутов;
+    версии проверяются не чаще раза в refresh_interval секунд.
+    """
+
+    VERSION_KEYS = ('points', 'routes', 'route_points')
+
+    def __init__(self, refresh_interval=5.0, cell=0.01):
+        self.refresh_interval = refresh_interval
+        self.cell = cell
+        self._version = None
+        self._checked = -math.inf
+        self._points = GridIndex(cell=cell)
+        self._routes = GridIndex(cell=cell)
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        versions = dict(ContentVersion.objects.filter(key__in=self.VERSION_KEYS).values_list('key', 'version'))
+        return tuple(versions.get(key, 0) for key in self.VERSION_KEYS)
+
+    def _refresh(self):
+        if monotonic() - self._checked < self.refresh_interval:
+            return
+        with self._lock:
+            if monotonic() - self._checked < self.refresh_interval:
+                return
+            version = self._current_version()
+            if version != self._version:
+                self._points = GridIndex(Point.objects.values_list('latitude', 'longitude', 'id'), self.cell)
+                self._routes = GridIndex(
+                    RoutePoint.objects.filter(route__is_active=True).values_list(
+                        'point__latitude', 'point__longitude', 'route_id'
+                    ),
+                    self.cell,
+                )
+                self._version = version
+            self._checked = monotonic()
+
+    def nearest_points(self, lat, lon, k=10, radius=None):
+        self._refresh()
+        return self._points.nearest(lat, lon, k, radius)
+
+    def nearest_routes(self, lat, lon, k=5, radius=None):
+        """Активные маршруты, у которых есть точка рядом; расстояние — до ближайшей из них"""
+        self._refresh()
+        return self._routes.nearest(lat, lon, k, radius)
+
+
+geo_index = GeoIndex()
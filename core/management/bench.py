@@ -0,0 +1,38 @@
+from contextlib import contextmanager, nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+@contextmanager
+def scratch_database():
+    """
+    Временная база на время замера: та же СУБД и те же миграции, что у тестовой базы Django
+    (test_<имя>, для SQLite — в памяти). После замера база удаляется.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+class BenchCommand(BaseCommand):
+    """
+    Замер на собственных данных. Данные создаются в run() во временной базе, а с
+    --use-configured-db — в настроенной базе внутри транзакции, которая откатывается.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--use-configured-db', action='store_true',
+                            help='Создавать данные в настроенной базе (DATABASE_URL) и откатить их после замера')
+
+    def handle(self, *args, **options):
+        with nullcontext() if options['use_configured_db'] else scratch_database():
+            with transaction.atomic():
+                self.run(options)
+                transaction.set_rollback(True)
+
+    def run(self, options):
+        raise NotImplementedError
@@ -0,0 +1,70 @@
+import asyncio
+import socket
+import statistics
+import time
+
+from aiohttp import ClientSession, TCPConnector, web
+from django.core.management.base import BaseCommand, CommandError
+
+from quest_bot.aiohttp_django import django_handler
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный замер Django API внутри aiohttp: ASGI против WSGI-моста aiohttp_wsgi. '
+            'Оба обработчика монтируются как в run_bot.py (/api/...), выводятся запросы в секунду и p50/p99')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', nargs='+', default=['/api/routes/', '/api/nearby/?lat=56.13&lon=47.25'],
+                            help='Пути для замера')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на каждый путь')
+        parser.add_argument('--concurrency', type=int, default=10, help='Одновременных запросов')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        self.stdout.write(f"{'Путь':<40} {'интерфейс':>9} {'запр/с':>9} {'p50, мс':>9} {'p99, мс':>9}")
+        for path in options['paths']:
+            for interface in ('wsgi', 'asgi'):
+                rps, p50, p99 = await self.measure(interface, path, options['requests'], options['concurrency'])
+                self.stdout.write(f"{path:<40} {interface:>9} {rps:>9.0f} {p50:>9.1f} {p99:>9.1f}")
+
+    async def measure(self, interface, path, total, concurrency):
+        app = web.Application()
+        app.router.add_route('*', '/api/{path_info:.*}', django_handler(interface))
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        # Свободный порт выбирает система; сокет создаём сами, чтобы знать его номер
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        site = web.SockSite(runner, sock)
+        await site.start()
+        url = f'http://127.0.0.1:{port}{path}'
+
+        timings = []
+        queue = iter(range(total))
+
+        async def worker(session):
+            for _ in queue:
+                started = time.perf_counter()
+                async with session.get(url) as response:
+                    body = await response.read()
+                    if response.status != 200:
+                        raise CommandError(f"{interface} {path}: ответ {response.status}: {body[:200]}")
+                timings.append((time.perf_counter() - started) * 1000)
+
+        try:
+            async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+                # Прогрев: первая сборка ответа, геометрия маршрутов, соединение с базой
+                async with session.get(url) as response:
+                    await response.read()
+                started = time.perf_counter()
+                await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - started
+        finally:
+            await runner.cleanup()
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return total / elapsed, statistics.median(timings), p99
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from aiogram import F, Router
+from aiogram.types import CallbackQuery, User as TelegramUser
+from django.core.management.base import BaseCommand
+
+from bot.callbacks import CallbackTable
+from bot.route_handlers import callbacks as route_callbacks
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стоимость выбора обработчика callback-кнопки: фильтр на каждую кнопку против таблицы действий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--callbacks', type=int, default=20000, help='Число callback-апдейтов в замере')
+        parser.add_argument('--actions', type=int, nargs='+', default=[0, 100, 500],
+                            help='Сколько действий добавить к действиям бота, чтобы посмотреть рост')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Действий':>9} {'фильтры, мкс':>14} {'таблица, мкс':>14}")
+        for extra in options['actions']:
+            actions = route_callbacks.actions + [f"extra_action_{i}" for i in range(extra)]
+            old, new = asyncio.run(self.measure(actions, options['callbacks']))
+            self.stdout.write(f"{len(actions):>9} {old:>14.1f} {new:>14.1f}")
+
+    async def measure(self, actions, count):
+        async def handler(callback):
+            pass
+
+        # Как раньше: отдельный обработчик с фильтром F.data.startswith на каждое действие
+        filters_router = Router()
+        for action in actions:
+            filters_router.callback_query.register(handler, F.data.startswith(f"{action}:"))
+
+        table_router = Router()
+        table = CallbackTable(table_router)
+        for action in actions:
+            table.action(action)(handler)
+
+        user = TelegramUser(id=1, is_bot=False, first_name='bench')
+        events = [
+            CallbackQuery(id=str(i), from_user=user, chat_instance='bench', data=f"{actions[i % len(actions)]}:1")
+            for i in range(count)
+        ]
+        return [await self.per_callback(router, events) for router in (filters_router, table_router)]
+
+    async def per_callback(self, router, events):
+        """Среднее время выбора и вызова обработчика, мкс"""
+        started = time.perf_counter()
+        for event in events:
+            await router.propagate_event('callback_query', event)
+        return (time.perf_counter() - started) / len(events) * 1e6
@@ -0,0 +1,52 @@
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand
+
+from bot.db import database_sync_to_async, DB_THREADS
+from core.models import User, Route
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность sync_to_async и пула потоков бота для запросов к базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--updates', type=int, default=2000, help='Число обработанных апдейтов в каждом замере')
+        parser.add_argument('--walkers', type=int, nargs='+', default=[1, 4, 16, 64],
+                            help='Число одновременно проходящих маршрут пользователей')
+        parser.add_argument('--latency', type=float, default=2.0,
+                            help='Задержка сети до базы на запрос, мс (для локального SQLite)')
+
+    def handle(self, *args, **options):
+        latency = options['latency'] / 1000
+        telegram_ids = list(User.objects.values_list('telegram_id', flat=True)[:1000]) or [0]
+
+        def handle_update():
+            # Как обработчик шага маршрута: пользователь и текущая версия маршрута
+            time.sleep(latency)
+            User.objects.filter(telegram_id=random.choice(telegram_ids)).first()
+            time.sleep(latency)
+            Route.objects.filter(is_active=True).values_list('id', 'version').first()
+
+        self.stdout.write(f"Потоков в пуле бота: {DB_THREADS}, апдейтов в замере: {options['updates']}")
+        self.stdout.write(f"{'Пользователей':>14} {'sync_to_async':>16} {'пул потоков':>16}")
+        for walkers in options['walkers']:
+            single = asyncio.run(self.measure(sync_to_async(handle_update), walkers, options['updates']))
+            pooled = asyncio.run(self.measure(database_sync_to_async(handle_update), walkers, options['updates']))
+            self.stdout.write(f"{walkers:>14} {single:>12.0f} / с {pooled:>12.0f} / с")
+
+    async def measure(self, handle_update, walkers, updates):
+        """Апдейтов в секунду, когда их одновременно обрабатывают walkers пользователей"""
+        remaining = updates
+
+        async def walker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await handle_update()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(walker() for _ in range(walkers)))
+        return updates / (time.perf_counter() - started)
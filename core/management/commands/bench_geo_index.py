@@ -0,0 +1,50 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.geo import GridIndex, distance
+
+
+class Command(BaseCommand):
+    help = 'Замеряет поиск ближайших точек в сеточном индексе против перебора всех точек'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000, help='Число точек в индексе')
+        parser.add_argument('--spread', type=float, default=0.5,
+                            help='Разброс координат вокруг центра, градусов (0.5 — крупный город с областью)')
+        parser.add_argument('--queries', type=int, default=1000, help='Число запросов в замере')
+        parser.add_argument('--k', type=int, default=10, help='Сколько ближайших искать')
+        parser.add_argument('--radius', type=float, default=1000, help='Радиус поиска, м')
+
+    def handle(self, *args, **options):
+        center_lat, center_lon, spread = 56.13, 47.25, options['spread']
+        items = [
+            (center_lat + random.uniform(-spread, spread), center_lon + random.uniform(-spread, spread), i)
+            for i in range(options['points'])
+        ]
+        started = time.perf_counter()
+        index = GridIndex(items)
+        self.stdout.write(f"Точек: {len(index)}, построение индекса: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+        queries = [
+            (center_lat + random.uniform(-spread, spread), center_lon + random.uniform(-spread, spread))
+            for _ in range(options['queries'])
+        ]
+        k, radius = options['k'], options['radius']
+        self.report(f"{k} ближайших", lambda lat, lon: index.nearest(lat, lon, k), queries)
+        self.report(f"в радиусе {radius:.0f} м", lambda lat, lon: index.within(lat, lon, radius), queries)
+        self.report("перебор всех точек", lambda lat, lon: sorted(
+            (distance(lat, lon, item_lat, item_lon), key) for item_lat, item_lon, key in items
+        )[:k], queries[:5])
+
+    def report(self, title, search, queries):
+        timings = []
+        for lat, lon in queries:
+            started = time.perf_counter()
+            search(lat, lon)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f"{title}: медиана {statistics.median(timings):.3f} мс, p99 {p99:.3f} мс")
@@ -0,0 +1,55 @@
+import random
+import statistics
+import time
+
+from django.db.models import Q
+
+from bot.point_search import search_backend, search_points
+from core.management.bench import BenchCommand
+from core.models import Point
+from core.testing import build_point, bulk_create_points, create_user
+
+WORDS = ('собор', 'фонтан', 'музей', 'парк', 'усадьба', 'мост', 'набережная', 'театр', 'площадь', 'башня',
+         'церковь', 'сквер', 'памятник', 'особняк', 'рынок', 'вокзал', 'библиотека', 'аллея', 'маяк', 'крепость')
+
+
+class Command(BenchCommand):
+    help = ('Сравнивает поиск точек: icontains по названию против индекса полнотекстового поиска '
+            '(Postgres или FTS5 в SQLite)')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--points', type=int, default=100000, help='Число точек в базе')
+        parser.add_argument('--queries', type=int, default=50, help='Число поисковых запросов в замере')
+
+    def run(self, options):
+        user = create_user()
+        # Номер в названии делает слова редкими, как названия реальных мест
+        vocabulary = [f"{word}{n}" for word in WORDS for n in range(500)]
+        created = 0
+        while created < options['points']:
+            batch = bulk_create_points([
+                build_point(user, name=' '.join(random.sample(vocabulary, 2)),
+                            description=' '.join(random.sample(vocabulary, 12)))
+                for _ in range(min(5000, options['points'] - created))
+            ])
+            created += len(batch)
+
+        queries = random.choices(vocabulary, k=options['queries'])
+        old = self.measure(lambda query: list(
+            Point.objects.filter(Q(name__icontains=query) | Q(description__icontains=query))
+            .order_by('-created_at')[:11]
+        ), queries)
+        new = self.measure(lambda query: search_points(query, 0, 11), queries)
+        self.stdout.write(f"Точек: {created}, поиск: {search_backend()}")
+        self.stdout.write(f"icontains:           {old:.2f} мс на запрос")
+        self.stdout.write(f"полнотекстовый:      {new:.2f} мс на запрос")
+
+    def measure(self, search, queries):
+        """Медиана времени одного поиска, мс"""
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
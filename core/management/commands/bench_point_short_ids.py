@@ -0,0 +1,57 @@
+import random
+import statistics
+import time
+import uuid
+
+from bot.point_lookup import _find_points
+from core.management.bench import BenchCommand
+from core.models import SHORT_ID_LENGTH, Point
+from core.testing import build_point, bulk_create_points, create_user
+
+
+class Command(BenchCommand):
+    help = ('Сравнивает поиск точки по 8-символьному id из callback-данных: id__icontains '
+            'против индекса по short_id')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--points', type=int, default=1000000, help='Число точек в базе')
+        parser.add_argument('--lookups', type=int, default=200, help='Число поисков в каждом замере')
+        parser.add_argument('--old-lookups', type=int, default=5, help='Число поисков через id__icontains')
+
+    def run(self, options):
+        user = create_user()
+        taken = set(Point.objects.values_list('short_id', flat=True))
+        handles = []
+        collisions = 0
+        created = 0
+        while created < options['points']:
+            batch = []
+            for _ in range(min(10000, options['points'] - created)):
+                point_id = uuid.uuid4()
+                length = SHORT_ID_LENGTH
+                while point_id.hex[:length] in taken:
+                    length += 1
+                collisions += length > SHORT_ID_LENGTH
+                taken.add(point_id.hex[:length])
+                batch.append(build_point(user, id=point_id, short_id=point_id.hex[:length]))
+            bulk_create_points(batch)
+            handles += [point.short_id for point in random.sample(batch, min(len(batch), 20))]
+            created += len(batch)
+
+        self.stdout.write(f"Точек: {created}, совпадений первых {SHORT_ID_LENGTH} символов: {collisions}")
+        new = self.measure(_find_points, handles, options['lookups'])
+        old = self.measure(lambda handle: list(Point.objects.filter(id__icontains=handle)),
+                           handles, options['old_lookups'])
+        self.stdout.write(f"id__icontains: {old:.2f} мс на поиск")
+        self.stdout.write(f"short_id:      {new:.3f} мс на поиск")
+
+    def measure(self, find, handles, lookups):
+        """Медиана времени одного поиска, мс"""
+        timings = []
+        for handle in random.choices(handles, k=lookups):
+            started = time.perf_counter()
+            found = find(handle)
+            timings.append((time.perf_counter() - started) * 1000)
+            assert found, handle
+        return statistics.median(timings)
@@ -0,0 +1,59 @@
+from django.core.paginator import Paginator
+
+from bot.point_pages import POINTS_PER_PAGE, _fetch_page, points_queryset
+from core.management.bench import BenchCommand
+from core.models import Point, RoutePoint
+from core.testing import build_point, bulk_create_points, create_route, create_user, median_ms
+
+
+class Command(BenchCommand):
+    help = ('Сравнивает время открытия страницы списка точек: Paginator поверх всех точек '
+            'против пагинации по ключу (created_at, id)')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000],
+                            help='Число точек в базе для каждого замера')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого замера')
+        parser.add_argument('--skip-old', action='store_true', help='Не замерять старый способ на больших объёмах')
+
+    def run(self, options):
+        user = create_user()
+        route = create_route(user, name='bench')
+        created = 0
+
+        self.stdout.write(f"{'Точек':>8} {'фильтр':>8} {'Paginator, мс':>14} {'по ключу, мс':>14}")
+        for size in sorted(options['sizes']):
+            while created < size:
+                batch = bulk_create_points([
+                    build_point(user, name=f"Точка {created + i}") for i in range(min(5000, size - created))
+                ])
+                # Каждая вторая точка используется в маршруте
+                RoutePoint.objects.bulk_create([
+                    RoutePoint(route=route, point=point, order=created + i)
+                    for i, point in enumerate(batch) if i % 2 == 0
+                ])
+                created += len(batch)
+
+            for filter_type in ('all', 'unused'):
+                # Страница ближе к концу списка — для OFFSET и Paginator самая дорогая
+                total = points_queryset(filter_type).count()
+                page = max(1, total * 9 // 10 // POINTS_PER_PAGE)
+                prev = points_queryset(filter_type)[(page - 1) * POINTS_PER_PAGE - 1] if page > 1 else None
+                cursor = [prev.created_at.isoformat(), str(prev.id)] if prev else None
+
+                new = median_ms(lambda: _fetch_page(filter_type, None, None, page, cursor), options['repeat'])
+                old = None
+                if not options['skip_old'] or size <= 10000:
+                    old = median_ms(lambda: self.old_page(filter_type, page), options['repeat'])
+                old_text = f"{old:>14.2f}" if old is not None else f"{'—':>14}"
+                self.stdout.write(f"{size:>8} {filter_type:>8} {old_text} {new:>14.2f}")
+
+    def old_page(self, filter_type, page):
+        """Как раньше: все точки (или все point_id маршрутов) в память, затем Paginator"""
+        if filter_type == 'unused':
+            used_point_ids = list(RoutePoint.objects.values_list('point_id', flat=True))
+            points = list(Point.objects.exclude(id__in=used_point_ids).order_by('-created_at'))
+        else:
+            points = list(Point.objects.all().order_by('-created_at'))
+        return list(Paginator(points, POINTS_PER_PAGE).get_page(page))
@@ -0,0 +1,38 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.route_order import distance_matrix, nearest_neighbour, optimize_order, path_length
+
+
+class Command(BaseCommand):
+    help = ('Замеряет оптимизацию порядка точек маршрута на случайных точках в пределах города: '
+            'длина пути в порядке добавления, после ближайшего соседа и после 2-opt/Or-opt, и время расчёта')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 30, 100],
+                            help='Число точек в маршруте для каждого замера')
+        parser.add_argument('--repeat', type=int, default=5, help='Маршрутов на каждый размер')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{'Точек':>6} {'как есть, км':>13} {'сосед, км':>10} {'итог, км':>9} {'время, мс':>10}")
+        for size in options['sizes']:
+            lengths = {'initial': [], 'nearest': [], 'optimized': []}
+            timings = []
+            for _ in range(options['repeat']):
+                coords = [(56.10 + rng.random() * 0.05, 47.20 + rng.random() * 0.08) for _ in range(size)]
+                started = time.perf_counter()
+                matrix = distance_matrix(coords)
+                order = optimize_order(matrix)
+                timings.append((time.perf_counter() - started) * 1000)
+                lengths['initial'].append(path_length(matrix, list(range(size))))
+                lengths['nearest'].append(path_length(matrix, nearest_neighbour(matrix)))
+                lengths['optimized'].append(path_length(matrix, order))
+            initial, nearest, optimized = (statistics.mean(lengths[key]) / 1000 for key in lengths)
+            self.stdout.write(
+                f"{size:>6} {initial:>13.1f} {nearest:>10.1f} {optimized:>9.1f} {statistics.median(timings):>10.1f}"
+            )
@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+
+from api.fast import RouteValuesSerializer
+from api.serializers import ROUTE_POINTS_PREFETCH, RouteSerializer
+from core.management.bench import BenchCommand
+from core.models import Route, RoutePoint
+from core.testing import build_point, bulk_create_points, create_route, create_user, median_ms
+
+
+class Command(BenchCommand):
+    help = ('Сравнивает время сериализации маршрутов: RouteSerializer поверх моделей против RouteValuesSerializer '
+            'из .values(), на 1000 точек. Что JSON совпадает байт в байт, проверяют тесты api.tests')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--routes', type=int, default=10, help='Число маршрутов')
+        parser.add_argument('--points', type=int, default=100, help='Точек в каждом маршруте')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого замера')
+
+    def run(self, options):
+        user = create_user()
+        for r in range(options['routes']):
+            points = bulk_create_points([
+                build_point(user, name=f"Точка {r}-{i}", description='Описание точки',
+                            text_content='Текст' if i % 2 else None,
+                            latitude=56.1 + i / 1000, longitude=47.2 + r / 1000)
+                for i in range(options['points'])
+            ])
+            create_route(user, points, name=f"Маршрут {r}", description='Описание')
+
+        queryset = Route.objects.filter(is_active=True).select_related('geometry').order_by('created_at')
+        ids = list(queryset.values_list('id', flat=True))
+        total_points = RoutePoint.objects.filter(route_id__in=ids).count()
+        renderer = JSONRenderer()
+
+        def models():
+            return renderer.render(RouteSerializer(queryset.prefetch_related(ROUTE_POINTS_PREFETCH), many=True).data)
+
+        def values():
+            return renderer.render(RouteValuesSerializer().serialize(ids))
+
+        for name, serialize in (('RouteSerializer', models), ('RouteValuesSerializer', values)):
+            per_thousand = median_ms(serialize, options['repeat']) / total_points * 1000
+            self.stdout.write(f"{name:>22}: {per_thousand:8.1f} мс на 1000 точек")
@@ -0,0 +1,50 @@
+from django.core.management.base import CommandError
+from rest_framework.test import APIRequestFactory
+
+from api.views import RouteViewSet
+from core.management.bench import BenchCommand
+from core.models import RoutePoint
+from core.testing import build_point, bulk_create_points, create_route, create_user, median_ms
+
+
+class Command(BenchCommand):
+    help = ('Время ответа списка и карточки маршрутов (/routes) при росте числа маршрутов и точек. '
+            'Что число запросов к базе не растёт, проверяют тесты api.tests')
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20],
+                            help='Число маршрутов для каждого замера; точек в маршруте — вдвое больше')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторов каждого замера')
+
+    def run(self, options):
+        user = create_user()
+        factory = APIRequestFactory()
+        list_view = RouteViewSet.as_view({'get': 'list'})
+        detail_view = RouteViewSet.as_view({'get': 'retrieve'})
+        routes = []
+
+        self.stdout.write(f"{'Маршрутов':>10} {'точек':>7} {'list, мс':>10} {'retrieve, мс':>13}")
+        for size in sorted(options['sizes']):
+            while len(routes) < size:
+                points = bulk_create_points([
+                    build_point(user, name=f"Точка {i}", latitude=56.1 + i / 1000, longitude=47.2)
+                    for i in range(size * 2)
+                ])
+                routes.append(create_route(user, points, name=f"Маршрут {len(routes)}"))
+            points = RoutePoint.objects.filter(route__in=routes).count()
+
+            list_ms = median_ms(self.request(lambda: list_view(factory.get('/routes/'))), options['repeat'])
+            detail_ms = median_ms(self.request(
+                lambda: detail_view(factory.get(f'/routes/{routes[-1].id}/'), pk=routes[-1].id)
+            ), options['repeat'])
+            self.stdout.write(f"{size:>10} {points:>7} {list_ms:>10.1f} {detail_ms:>13.1f}")
+
+    def request(self, call):
+        """Запрос мимо кэша готовых ответов: замеряем сборку ответа"""
+        def uncached():
+            RouteViewSet._responses.clear()
+            response = call()
+            if response.status_code != 200:
+                raise CommandError(f"Ответ {response.status_code}: {response.content[:200]}")
+        return uncached
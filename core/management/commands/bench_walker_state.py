@@ -0,0 +1,82 @@
+import asyncio
+import gc
+import tracemalloc
+import uuid
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from django.core.management.base import BaseCommand
+
+from bot.route_bundle import CompiledPoint, CompiledRoute, MediaRef
+from bot.walk_session import WalkSession
+from core.models import RoutePoint
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает память FSM на одного проходящего маршрут: список RoutePoint против компактной записи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=10000, help='Число одновременных прохождений')
+        parser.add_argument('--points', type=int, default=11, help='Число точек в маршруте')
+
+    def handle(self, *args, **options):
+        sessions = options['sessions']
+        points = options['points']
+        route_id = uuid.uuid4()
+        point_ids = [uuid.uuid4() for _ in range(points)]
+
+        def old_state():
+            # Так хранилось раньше: у каждого пользователя свой список объектов из базы
+            return {
+                'current_index': 1,
+                'route_points': [
+                    RoutePoint(id=uuid.uuid4(), route_id=route_id, point_id=point_id, order=i)
+                    for i, point_id in enumerate(point_ids)
+                ],
+            }
+
+        def new_state():
+            walk = WalkSession.start(route_id, 1)
+            walk.advance(1)
+            return walk.to_state()
+
+        def shared_bundle():
+            # Скомпилированный маршрут один на процесс, сколько бы пользователей его ни проходили
+            return CompiledRoute(str(route_id), 1, 'Маршрут', tuple(
+                CompiledPoint(
+                    id=str(point_id), name=f"Точка {i}", description='Описание ' * 20, text_content='',
+                    latitude=56.13, longitude=47.25,
+                    photo=MediaRef(f"points/photos/{point_id}.jpg", 'a' * 32, 'F' * 80),
+                    audio=MediaRef(f"points/audio/{point_id}.mp3", 'b' * 32, 'F' * 80),
+                )
+                for i, point_id in enumerate(point_ids)
+            ))
+
+        old_bytes = asyncio.run(self.measure(sessions, old_state))
+        new_bytes = asyncio.run(self.measure(sessions, new_state, shared_bundle))
+
+        self.stdout.write(f"Прохождений: {sessions}, точек в маршруте: {points}")
+        self.stdout.write(f"Список RoutePoint:  {old_bytes / sessions:10.0f} байт на пользователя, всего {old_bytes / 2**20:.1f} МБ")
+        self.stdout.write(f"Компактная запись:  {new_bytes / sessions:10.0f} байт на пользователя, всего {new_bytes / 2**20:.1f} МБ")
+        self.stdout.write(self.style.SUCCESS(f"Экономия: в {old_bytes / max(new_bytes, 1):.1f} раза"))
+
+    async def measure(self, sessions, make_state, make_shared=None):
+        """Сколько памяти занимает MemoryStorage с заданным числом прохождений"""
+        storage = MemoryStorage()
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+
+        shared = make_shared() if make_shared else None
+        for user_id in range(sessions):
+            key = StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+            await storage.set_state(key, 'RouteState:waiting_for_next_point')
+            await storage.set_data(key, make_state())
+
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        del shared
+        await storage.close()
+        return total
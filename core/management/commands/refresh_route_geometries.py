@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Route
+from core.route_geometry import refresh_route_geometries
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает и сохраняет геометрию всех маршрутов. Обычно она пересчитывается сама при изменении '
+            'маршрута; команда нужна для маршрутов, созданных до появления геометрии')
+
+    def handle(self, *args, **options):
+        geometries = refresh_route_geometries(Route.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Пересчитана геометрия маршрутов: {len(geometries)}"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 13:53
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_add_point_media_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramFileCache',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('storage_name', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('media_type', models.CharField(max_length=10)),
+                ('file_id', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('storage_name', 'content_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 13:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_telegram_file_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_broadcast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['-created_at', '-id'], name='point_created_id_idx'),
+        ),
+    ]
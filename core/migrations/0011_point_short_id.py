@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 14:32
+
+from django.db import migrations, models
+
+
+def fill_short_ids(apps, schema_editor):
+    """Старые точки получают короткий id по порядку создания, чтобы у давних точек он остался 8-символьным"""
+    Point = apps.get_model('core', 'Point')
+    taken = set()
+    batch = []
+    for point in Point.objects.order_by('created_at', 'id').only('id').iterator(chunk_size=2000):
+        hex_id = point.id.hex
+        length = 8
+        while hex_id[:length] in taken:
+            length += 1
+        point.short_id = hex_id[:length]
+        taken.add(point.short_id)
+        batch.append(point)
+        if len(batch) >= 2000:
+            Point.objects.bulk_update(batch, ['short_id'])
+            batch = []
+    Point.objects.bulk_update(batch, ['short_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_point_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='short_id',
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(fill_short_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='point',
+            name='short_id',
+            field=models.CharField(editable=False, max_length=32, unique=True),
+        ),
+    ]
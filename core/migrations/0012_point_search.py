@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-17 14:45
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Выражение должно совпадать с bot/point_search.py, иначе Postgres не возьмёт индекс
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(text_content, '')), 'C')"
+)
+
+PG_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS point_search_vector_idx ON core_point USING gin (({PG_SEARCH_VECTOR}))",
+    "CREATE INDEX IF NOT EXISTS point_name_trgm_idx ON core_point USING gin (name gin_trgm_ops)",
+]
+PG_BACKWARD = [
+    "DROP INDEX IF EXISTS point_search_vector_idx",
+    "DROP INDEX IF EXISTS point_name_trgm_idx",
+]
+
+# Для локального SQLite — отдельная FTS5-таблица, которую поддерживают триггеры
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE core_point_fts USING fts5("
+    "point_id UNINDEXED, name, description, text_content, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER core_point_fts_insert AFTER INSERT ON core_point BEGIN "
+    "INSERT INTO core_point_fts (point_id, name, description, text_content) "
+    "VALUES (new.id, new.name, new.description, new.text_content); END",
+    "CREATE TRIGGER core_point_fts_update AFTER UPDATE OF name, description, text_content ON core_point BEGIN "
+    "DELETE FROM core_point_fts WHERE point_id = old.id; "
+    "INSERT INTO core_point_fts (point_id, name, description, text_content) "
+    "VALUES (new.id, new.name, new.description, new.text_content); END",
+    "CREATE TRIGGER core_point_fts_delete AFTER DELETE ON core_point BEGIN "
+    "DELETE FROM core_point_fts WHERE point_id = old.id; END",
+    "INSERT INTO core_point_fts (point_id, name, description, text_content) "
+    "SELECT id, name, description, text_content FROM core_point",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS core_point_fts_insert",
+    "DROP TRIGGER IF EXISTS core_point_fts_update",
+    "DROP TRIGGER IF EXISTS core_point_fts_delete",
+    "DROP TABLE IF EXISTS core_point_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        if vendor not in statements:
+            return
+        try:
+            for sql in statements[vendor]:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite собран без FTS5 — поиск будет работать через icontains
+            if vendor != 'sqlite':
+                raise
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_point_short_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': PG_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': PG_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
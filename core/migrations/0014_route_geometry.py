@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 14:43
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_content_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteGeometry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('route_version', models.PositiveIntegerField()),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('leg_distances', models.JSONField(default=list)),
+                ('length', models.FloatField(default=0)),
+                ('duration', models.PositiveIntegerField(default=0)),
+                ('min_latitude', models.FloatField(null=True)),
+                ('max_latitude', models.FloatField(null=True)),
+                ('min_longitude', models.FloatField(null=True)),
+                ('max_longitude', models.FloatField(null=True)),
+                ('center_latitude', models.FloatField(null=True)),
+                ('center_longitude', models.FloatField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('route', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='geometry', to='core.route')),
+            ],
+        ),
+    ]
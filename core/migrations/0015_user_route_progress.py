@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-17 14:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_route_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRouteProgress',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('route_version', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('in_progress', 'В процессе'), ('completed', 'Завершён')], default='in_progress', max_length=20)),
+                ('points_passed', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_point', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.point')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.route')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_progress', to='core.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RoutePointPass',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('position', models.PositiveIntegerField()),
+                ('via', models.CharField(choices=[('button', 'Кнопка'), ('location', 'Геопозиция')], default='button', max_length=20)),
+                ('passed_at', models.DateTimeField()),
+                ('point', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.point')),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passes', to='core.userrouteprogress')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userrouteprogress',
+            index=models.Index(fields=['user', 'route', 'status', '-updated_at'], name='route_progress_resume_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_user_route_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='promocode',
+            index=models.Index(fields=['-created_at', '-id'], name='promocode_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='user_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userquestprogress',
+            index=models.Index(fields=['-completed_at', '-id'], name='quest_progress_completed_idx'),
+        ),
+    ]
@@ -37,6 +37,12 @@ class User(models.Model):
     is_admin = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Ключ постраничного вывода по курсору (api.pagination)
+            models.Index(fields=['-created_at', '-id'], name='user_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.telegram_id})"
 
@@ -62,6 +68,12 @@ class PromoCode(models.Model):
     is_used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Ключ постраничного вывода по курсору (api.pagination)
+            models.Index(fields=['-created_at', '-id'], name='promocode_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.code} ({self.quest.name})"
 
@@ -83,6 +95,10 @@ class UserQuestProgress(models.Model):
 
     class Meta:
         unique_together = ('user', 'quest')
+        indexes = [
+            # Ключ постраничного вывода по курсору (api.pagination)
+            models.Index(fields=['-completed_at', '-id'], name='quest_progress_completed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.name} - {self.quest.name} ({self.status})"
@@ -102,6 +118,8 @@ class Point(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_points')
+    # Короткий id для callback-кнопок бота: начало UUID, при совпадении — длиннее
+    short_id = models.CharField(max_length=32, unique=True, editable=False)
 
     def __str__(self):
         return self.name
@@ -112,6 +130,22 @@ class Point(models.Model):
     class Meta:
         verbose_name = 'Точка'
         verbose_name_plural = 'Точки'
+        indexes = [
+            # Ключ постраничного вывода точек от новых к старым
+            models.Index(fields=['-created_at', '-id'], name='point_created_id_idx'),
+        ]
+
+
+# Длина короткого id точки в callback-данных
+SHORT_ID_LENGTH = 8
+
+
+def point_short_id(point_id):
+    """Самое короткое начало UUID точки (не меньше SHORT_ID_LENGTH символов), которое ещё не занято"""
+    hex_id = point_id.hex
+    for length in range(SHORT_ID_LENGTH, len(hex_id) + 1):
+        if not Point.objects.filter(short_id=hex_id[:length]).exists():
+            return hex_id[:length]
 
 
 class Route(models.Model):
@@ -123,6 +157,7 @@ class Route(models.Model):
     is_active = models.BooleanField(default=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_routes')
     points = models.ManyToManyField(Point, through='RoutePoint')
+    version = models.PositiveIntegerField(default=1)  # Увеличивается при любом изменении маршрута или его точек
 
     def __str__(self):
         return self.name
@@ -142,6 +177,71 @@ class RoutePoint(models.Model):
         return f"{self.point.name} (Маршрут: {self.route.name}, порядок: {self.order})"
 
 
+class RouteGeometry(models.Model):
+    """Производные данные маршрута по координатам его точек; пересчитываются при смене версии маршрута"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    route = models.OneToOneField(Route, on_delete=models.CASCADE, related_name='geometry')
+    route_version = models.PositiveIntegerField()  # Версия маршрута, по которой посчитано
+    point_count = models.PositiveIntegerField(default=0)
+    leg_distances = models.JSONField(default=list)  # Расстояния между соседними точками, м
+    length = models.FloatField(default=0)  # м
+    duration = models.PositiveIntegerField(default=0)  # Оценка времени прогулки с остановками, минут
+    min_latitude = models.FloatField(null=True)
+    max_latitude = models.FloatField(null=True)
+    min_longitude = models.FloatField(null=True)
+    max_longitude = models.FloatField(null=True)
+    center_latitude = models.FloatField(null=True)
+    center_longitude = models.FloatField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.route.name}: {self.point_count} точек, {round(self.length)} м"
+
+
+class UserRouteProgress(models.Model):
+    """Прохождение маршрута пользователем: начало, сколько точек пройдено, завершение"""
+    class Status(models.TextChoices):
+        IN_PROGRESS = 'in_progress', 'В процессе'
+        COMPLETED = 'completed', 'Завершён'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='route_progress')
+    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    route_version = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.IN_PROGRESS)
+    points_passed = models.PositiveIntegerField(default=0)
+    last_point = models.ForeignKey(Point, on_delete=models.SET_NULL, null=True, blank=True)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Незавершённое прохождение пользователя, чтобы продолжить с места остановки
+            models.Index(fields=['user', 'route', 'status', '-updated_at'], name='route_progress_resume_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.name} - {self.route.name} ({self.status}, {self.points_passed})"
+
+
+class RoutePointPass(models.Model):
+    """Пройденная точка маршрута — для аналитики, где пользователи задерживаются и бросают маршрут"""
+    class Via(models.TextChoices):
+        BUTTON = 'button', 'Кнопка'
+        LOCATION = 'location', 'Геопозиция'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    progress = models.ForeignKey(UserRouteProgress, on_delete=models.CASCADE, related_name='passes')
+    point = models.ForeignKey(Point, on_delete=models.SET_NULL, null=True, blank=True)
+    position = models.PositiveIntegerField()  # Номер точки в маршруте, с нуля
+    via = models.CharField(max_length=20, choices=Via.choices, default=Via.BUTTON)
+    passed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.progress_id}: точка {self.position + 1}"
+
+
 class PointPhoto(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     point = models.ForeignKey(Point, on_delete=models.CASCADE, related_name='photos')
@@ -156,3 +256,104 @@ class PointVideo(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     point = models.ForeignKey(Point, on_delete=models.CASCADE, related_name='videos')
     file = models.FileField(upload_to=get_video_path, storage=ClientDocsStorage())
+
+
+class TelegramFileCache(models.Model):
+    """file_id медиафайла, уже загруженного в Telegram"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    storage_name = models.CharField(max_length=255)  # Имя файла в хранилище
+    content_hash = models.CharField(max_length=64)  # ETag S3 или sha256 содержимого
+    media_type = models.CharField(max_length=10)  # photo / audio / video
+    file_id = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('storage_name', 'content_hash')
+
+    def __str__(self):
+        return f"{self.storage_name} ({self.media_type})"
+
+
+class FSMRecord(models.Model):
+    """Состояние FSM и данные пользователя бота"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=255, unique=True)  # Ключ aiogram: fsm:<chat>:<user>:<destiny>
+    state = models.CharField(max_length=255, blank=True, null=True)
+    data = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField(db_index=True)  # Брошенные сессии удаляются после этого времени
+
+    def __str__(self):
+        return f"{self.key}: {self.state}"
+
+
+class ScheduledMessage(models.Model):
+    """Отложенное или повторяющееся сообщение бота пользователю"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chat_id = models.BigIntegerField()
+    text = models.TextField()
+    send_at = models.DateTimeField(db_index=True)
+    repeat_every = models.PositiveIntegerField(blank=True, null=True)  # Период повтора в секундах
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.chat_id} в {self.send_at}"
+
+
+class Broadcast(models.Model):
+    """Рассылка сообщения всем пользователям бота"""
+    class Status(models.TextChoices):
+        RUNNING = 'running', 'Идёт'
+        DONE = 'done', 'Завершена'
+        CANCELLED = 'cancelled', 'Отменена'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    text = models.TextField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.RUNNING)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='broadcasts')
+    # Сообщение администратору, в котором обновляется прогресс
+    progress_chat_id = models.BigIntegerField(blank=True, null=True)
+    progress_message_id = models.BigIntegerField(blank=True, null=True)
+    # Контрольная точка: id последнего пользователя, которому рассылка уже обработана
+    last_user_id = models.UUIDField(blank=True, null=True)
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Рассылка {self.created_at:%d.%m.%Y %H:%M} ({self.get_status_display()})"
+
+
+class BroadcastDelivery(models.Model):
+    """Результат доставки рассылки одному пользователю"""
+    class Status(models.TextChoices):
+        SENT = 'sent', 'Доставлено'
+        BLOCKED = 'blocked', 'Бот заблокирован'
+        FAILED = 'failed', 'Ошибка'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='deliveries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_deliveries')
+    status = models.CharField(max_length=20, choices=Status.choices)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('broadcast', 'user')
+
+    def __str__(self):
+        return f"{self.user} — {self.get_status_display()}"
+
+
+class ContentVersion(models.Model):
+    """Версия набора данных, из которого бот строит кэшированные клавиатуры (например, список маршрутов)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
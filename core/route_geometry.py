@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .geo import distance
+from .models import Route, RouteGeometry, RoutePoint
+
+# Скорость прогулки, м/мин (4,5 км/ч), и время на остановку у точки — послушать аудио, посмотреть, мин
+WALK_SPEED = 75
+STOP_MINUTES = 3
+
+GEOMETRY_FIELDS = [
+    'route_version', 'point_count', 'leg_distances', 'length', 'duration',
+    'min_latitude', 'max_latitude', 'min_longitude', 'max_longitude',
+    'center_latitude', 'center_longitude', 'updated_at',
+]
+
+
+def build_geometry(route_id, route_version, coords):
+    """Геометрия маршрута по координатам точек [(широта, долгота)] в порядке обхода"""
+    legs = [round(distance(*a, *b), 1) for a, b in zip(coords, coords[1:])]
+    length = sum(legs)
+    geometry = RouteGeometry(
+        route_id=route_id,
+        route_version=route_version,
+        point_count=len(coords),
+        leg_distances=legs,
+        length=length,
+        duration=round(length / WALK_SPEED + len(coords) * STOP_MINUTES),
+    )
+    if coords:
+        lats, lons = zip(*coords)
+        geometry.min_latitude, geometry.max_latitude = min(lats), max(lats)
+        geometry.min_longitude, geometry.max_longitude = min(lons), max(lons)
+        geometry.center_latitude = sum(lats) / len(lats)
+        geometry.center_longitude = sum(lons) / len(lons)
+    return geometry
+
+
+def compute_route_geometries(route_ids):
+    """
+    Геометрия маршрутов по текущим точкам, без записи в базу: один запрос за версиями
+    и один за координатами всех точек.
+    """
+    # Версии читаем до координат: если точки поменяются в промежутке, сохранится старая версия
+    # и геометрия просто пересчитается после следующего изменения
+    versions = dict(Route.objects.filter(id__in=route_ids).values_list('id', 'version'))
+    coords = defaultdict(list)
+    for route_id, lat, lon in RoutePoint.objects.filter(route_id__in=versions).order_by(
+        'route_id', 'order'
+    ).values_list('route_id', 'point__latitude', 'point__longitude'):
+        coords[route_id].append((lat, lon))
+    return {
+        route_id: build_geometry(route_id, version, coords[route_id]) for route_id, version in versions.items()
+    }
+
+
+def refresh_route_geometries(route_ids):
+    """Пересчитывает и сохраняет геометрию маршрутов одной вставкой с обновлением существующих строк"""
+    geometries = compute_route_geometries(route_ids)
+    RouteGeometry.objects.bulk_create(
+        list(geometries.values()), update_conflicts=True, unique_fields=['route'], update_fields=GEOMETRY_FIELDS
+    )
+    return geometries
+
+
+def refresh_route_geometries_on_commit(route_ids):
+    """Пересчитывает геометрию после фиксации транзакции, в которой изменились маршруты"""
+    route_ids = list(route_ids)
+    transaction.on_commit(lambda: refresh_route_geometries(route_ids))
+
+
+def route_geometries(routes):
+    """
+    Актуальная геометрия маршрутов {route_id: RouteGeometry}. Сохранённая берётся как есть,
+    если посчитана для текущей версии маршрута (загрузите маршруты с select_related('geometry')).
+    Остальные считаются одной пачкой в памяти: чтение ничего не пишет в базу, сохраняется
+    геометрия при изменении маршрута (refresh_route_geometries_on_commit).
+    """
+    result = {}
+    stale = []
+    for route in routes:
+        try:
+            geometry = route.geometry
+        except RouteGeometry.DoesNotExist:
+            geometry = None
+        if geometry is not None and geometry.route_version == route.version:
+            result[route.id] = geometry
+        else:
+            stale.append(route.id)
+    if stale:
+        computed = compute_route_geometries(stale)
+        result.update(computed)
+        # Кладём посчитанное в маршруты, чтобы следующее обращение к ним его не считало
+        for route in routes:
+            if route.id in computed:
+                route.geometry = computed[route.id]
+    return result
+
+
+def route_geometry(route):
+    """Актуальная геометрия одного маршрута"""
+    return route_geometries([route]).get(route.id)
@@ -0,0 +1,149 @@
+import math
+
+from django.db import transaction
+
+from .geo import EARTH_RADIUS
+from .models import RoutePoint
+from .signals import bump_content_version, bump_route_versions
+
+# Улучшения меньше этого не считаются, чтобы поиск не зацикливался на погрешностях, м
+MIN_GAIN = 1e-6
+
+
+def distance_matrix(coords):
+    """
+    Расстояния между всеми парами точек [(широта, долгота)], м.
+    Радианы и косинусы считаются один раз на точку, а не на каждую пару.
+    """
+    lats = [math.radians(lat) for lat, _ in coords]
+    lons = [math.radians(lon) for _, lon in coords]
+    coss = [math.cos(lat) for lat in lats]
+    matrix = [[0.0] * len(coords) for _ in coords]
+    for i in range(len(coords)):
+        lat1, lon1, cos1 = lats[i], lons[i], coss[i]
+        row = matrix[i]
+        for j in range(i + 1, len(coords)):
+            a = math.sin((lats[j] - lat1) / 2) ** 2 + cos1 * coss[j] * math.sin((lons[j] - lon1) / 2) ** 2
+            row[j] = matrix[j][i] = 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+    return matrix
+
+
+def path_length(matrix, order):
+    """Длина пути по точкам в порядке order, м; путь не замкнут — от первой точки до последней"""
+    return sum(matrix[a][b] for a, b in zip(order, order[1:]))
+
+
+def nearest_neighbour(matrix, start=0):
+    """Порядок «каждый раз к ближайшей непосещённой точке», начиная со start"""
+    left = set(range(len(matrix))) - {start}
+    order = [start]
+    while left:
+        row = matrix[order[-1]]
+        nearest = min(left, key=row.__getitem__)
+        left.remove(nearest)
+        order.append(nearest)
+    return order
+
+
+def two_opt(matrix, order):
+    """Разворачивает участки пути, пока это его укорачивает; первая точка остаётся на месте"""
+    order = list(order)
+    n = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, n):
+                c = order[j]
+                if j + 1 < n:
+                    d = order[j + 1]
+                    gain = matrix[a][b] + matrix[c][d] - matrix[a][c] - matrix[b][d]
+                else:
+                    gain = matrix[a][b] - matrix[a][c]
+                if gain > MIN_GAIN:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    b = order[i]
+                    improved = True
+    return order
+
+
+def or_opt(matrix, order, max_segment=3):
+    """Переносит участки из 1–3 точек (в том числе развёрнутыми) туда, где путь станет короче"""
+    order = list(order)
+    improved = True
+    while improved:
+        improved = False
+        for size in range(1, max_segment + 1):
+            for i in range(1, len(order) - size + 1):
+                segment = order[i:i + size]
+                first, last = segment[0], segment[-1]
+                prev = order[i - 1]
+                nxt = order[i + size] if i + size < len(order) else None
+                removed = matrix[prev][first] + (matrix[last][nxt] - matrix[prev][nxt] if nxt is not None else 0)
+
+                rest = order[:i] + order[i + size:]
+                best = None
+                for k in range(len(rest)):
+                    if k == i - 1:
+                        continue  # то же место
+                    p, q = rest[k], rest[k + 1] if k + 1 < len(rest) else None
+                    base = -matrix[p][q] if q is not None else 0
+                    for head, tail, reverse in ((first, last, False), (last, first, True)):
+                        added = matrix[p][head] + (matrix[tail][q] if q is not None else 0) + base
+                        if removed - added > MIN_GAIN and (best is None or added < best[0]):
+                            best = (added, k, reverse)
+                if best is not None:
+                    _, k, reverse = best
+                    rest[k + 1:k + 1] = segment[::-1] if reverse else segment
+                    order = rest
+                    improved = True
+                    break
+            if improved:
+                break
+    return order
+
+
+def optimize_order(matrix):
+    """
+    Короткий порядок обхода точек, первая остаётся первой: ближайший сосед как начальный путь,
+    затем 2-opt и Or-opt, пока они что-то улучшают. Из текущего порядка улучшаем так же
+    и берём лучший — результат никогда не длиннее исходного.
+    """
+    n = len(matrix)
+    if n < 3:
+        return list(range(n))
+    candidates = []
+    for seed in (nearest_neighbour(matrix), list(range(n))):
+        order = seed
+        while True:
+            improved = or_opt(matrix, two_opt(matrix, order))
+            if path_length(matrix, improved) >= path_length(matrix, order) - MIN_GAIN:
+                break
+            order = improved
+        candidates.append(order)
+    return min(candidates, key=lambda order: path_length(matrix, order))
+
+
+def plan_route_order(route_id):
+    """
+    Точки маршрута в текущем и оптимизированном порядке и длины путей в метрах:
+    (route_points, new_route_points, before, after)
+    """
+    route_points = list(RoutePoint.objects.filter(route_id=route_id).select_related('point').order_by('order'))
+    matrix = distance_matrix([(rp.point.latitude, rp.point.longitude) for rp in route_points])
+    order = optimize_order(matrix)
+    before = path_length(matrix, list(range(len(route_points))))
+    after = path_length(matrix, order)
+    return route_points, [route_points[i] for i in order], before, after
+
+
+def apply_route_order(route_id, route_points):
+    """Записывает порядок точек маршрута одним bulk_update"""
+    for order, route_point in enumerate(route_points, 1):
+        route_point.order = order
+    with transaction.atomic():
+        RoutePoint.objects.bulk_update(route_points, ['order'])
+        # bulk_update не вызывает сигналы: сами сообщаем боту, что маршрут изменился
+        bump_route_versions([route_id])
+        bump_content_version('route_points')
@@ -0,0 +1,22 @@
+from django.conf import settings
+
+FSM_DATABASE = 'fsm'
+
+
+class FSMRouter:
+    """Хранит состояния FSM бота в отдельной базе 'fsm', если она настроена"""
+
+    def _enabled(self):
+        return FSM_DATABASE in settings.DATABASES
+
+    def db_for_read(self, model, **hints):
+        if model._meta.model_name == 'fsmrecord' and self._enabled():
+            return FSM_DATABASE
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == FSM_DATABASE:
+            return app_label == 'core' and model_name == 'fsmrecord'
+        return None
@@ -91,12 +91,26 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 
 # Database
+# Соединения переиспользуются между запросами и потоками бота, сломанные проверяются перед использованием
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 600))
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.getenv("DATABASE_URL")
+        default=os.getenv("DATABASE_URL"),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
     )
 }
 
+# Отдельная база для состояний FSM бота, например локальный SQLite на одном сервере:
+# FSM_DATABASE_URL=sqlite:////app/data/fsm.sqlite3, затем manage.py migrate --database fsm
+if os.getenv("FSM_DATABASE_URL"):
+    DATABASES['fsm'] = dj_database_url.parse(
+        os.getenv("FSM_DATABASE_URL"), conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True
+    )
+
+DATABASE_ROUTERS = ['core.routers.FSMRouter']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,80 @@
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ContentVersion, Route, RoutePoint, Point, PointPhoto, PointAudio, PointVideo, point_short_id
+from .route_geometry import refresh_route_geometries_on_commit
+
+
+def bump_route_versions(route_ids):
+    """
+    Увеличивает версию маршрутов, чтобы бот пересобрал их скомпилированные копии,
+    и после фиксации транзакции пересчитывает их геометрию
+    """
+    route_ids = list(route_ids)
+    Route.objects.filter(id__in=route_ids).update(version=F('version') + 1)
+    refresh_route_geometries_on_commit(route_ids)
+
+
+def bump_content_version(key):
+    """Сообщает процессам бота, что клавиатуры, построенные по этим данным, устарели"""
+    if not ContentVersion.objects.filter(key=key).update(version=F('version') + 1):
+        ContentVersion.objects.get_or_create(key=key)
+
+
+@receiver(pre_save, sender=Route)
+def route_saving(sender, instance, update_fields=None, **kwargs):
+    # Увеличиваем версию в самом UPDATE, чтобы устаревший объект не записал старое значение
+    if not instance._state.adding and update_fields is None:
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Route)
+def route_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        refresh_route_geometries_on_commit([instance.id])
+        return
+    if update_fields is not None:
+        bump_route_versions([instance.id])
+    else:
+        refresh_route_geometries_on_commit([instance.id])
+    instance.refresh_from_db(fields=['version'])
+
+
+@receiver([post_save, post_delete], sender=Route)
+def route_list_changed(sender, instance, **kwargs):
+    bump_content_version('routes')
+
+
+@receiver([post_save, post_delete], sender=RoutePoint)
+def route_point_changed(sender, instance, **kwargs):
+    bump_route_versions([instance.route_id])
+    bump_content_version('route_points')
+
+
+@receiver(pre_save, sender=Point)
+def point_saving(sender, instance, **kwargs):
+    if not instance.short_id:
+        instance.short_id = point_short_id(instance.id)
+
+
+@receiver(post_delete, sender=Point)
+def point_deleted(sender, instance, **kwargs):
+    bump_content_version('points')
+
+
+@receiver(post_save, sender=Point)
+def point_saved(sender, instance, created, **kwargs):
+    bump_content_version('points')
+    if not created:
+        bump_route_versions(
+            RoutePoint.objects.filter(point_id=instance.id).values_list('route_id', flat=True)
+        )
+
+
+@receiver([post_save, post_delete], sender=PointPhoto)
+@receiver([post_save, post_delete], sender=PointAudio)
+@receiver([post_save, post_delete], sender=PointVideo)
+def point_media_changed(sender, instance, **kwargs):
+    # Галереи точек отдаются API маршрутов, закэшированные ответы нужно обновить
+    bump_content_version('points')
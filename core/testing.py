@@ -0,0 +1,50 @@
+"""
+Фабрики данных для тестов и замеров производительности
+"""
+import statistics
+import time
+
+from .models import Point, Route, RoutePoint, User
+from .route_geometry import refresh_route_geometries
+from .signals import bump_route_versions
+
+
+def create_user(telegram_id=-1, name='bench', **fields):
+    return User.objects.create(telegram_id=telegram_id, name=name, **fields)
+
+
+def build_point(user, **fields):
+    """Несохранённая точка с пустыми полями по умолчанию"""
+    fields = {'name': '', 'description': '', 'latitude': 0, 'longitude': 0, **fields}
+    return Point(created_by=user, **fields)
+
+
+def bulk_create_points(points, batch_size=5000):
+    # bulk_create не вызывает сигналы, поэтому короткий id задаём сами
+    for point in points:
+        if not point.short_id:
+            point.short_id = point.id.hex
+    return Point.objects.bulk_create(points, batch_size=batch_size)
+
+
+def create_route(user, points=(), name='Маршрут', description='', **fields):
+    """Маршрут с точками в заданном порядке; версия и геометрия — как после правки через сигналы"""
+    route = Route.objects.create(name=name, description=description, created_by=user, **fields)
+    RoutePoint.objects.bulk_create([
+        RoutePoint(route=route, point=point, order=order) for order, point in enumerate(points, 1)
+    ])
+    bump_route_versions([route.id])
+    # Внутри транзакции теста или замера пересчёт после фиксации не наступит — считаем сразу
+    refresh_route_geometries([route.id])
+    route.refresh_from_db(fields=['version'])
+    return route
+
+
+def median_ms(call, repeat):
+    """Медиана времени выполнения call за repeat повторов, мс"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
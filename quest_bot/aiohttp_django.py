@@ -0,0 +1,120 @@
+"""
+Подключение Django к aiohttp-серверу бота: через WSGI-мост aiohttp_wsgi (по умолчанию) или через ASGI.
+
+Пока вьюхи DRF и middleware Django синхронные, ASGI медленнее: каждый шаг middleware и вьюха
+по отдельности уходят в поток Django, а WSGI-мост выполняет весь запрос в потоке за один переход.
+Сравнение — manage.py bench_api_server.
+"""
+import asyncio
+import os
+
+from aiohttp import hdrs, web
+from aiohttp_wsgi import WSGIHandler
+from multidict import CIMultiDict
+
+# Заголовки, которые aiohttp выставляет сам по готовому телу ответа
+_SKIP_RESPONSE_HEADERS = {'content-length', 'transfer-encoding'}
+
+
+def _host(request):
+    # Django проверяет ALLOWED_HOSTS без порта
+    return request.headers.get(hdrs.HOST, '').split(':', 1)[0]
+
+
+class FixedWSGIHandler(WSGIHandler):
+    def prepare_environ(self, request):
+        # Построим стандартный WSGI-environ
+        environ = super().prepare_environ(request)
+
+        host = _host(request)
+        environ['HTTP_HOST'] = host
+        environ['SERVER_NAME'] = host
+        environ['SERVER_PORT'] = os.getenv('PORT', '8000')
+
+        environ['SCRIPT_NAME'] = ''
+
+        return environ
+
+
+class ASGIHandler:
+    """
+    Обработчик aiohttp, который передаёт запрос ASGI-приложению Django (quest_bot.asgi) в том же
+    цикле событий. Разбор запроса и отдача ответа идут в цикле; синхронный код (middleware,
+    вьюхи) Django выполняет в своём потоке, асинхронные вьюхи — прямо в цикле.
+    """
+
+    def __init__(self, application, port=None):
+        self.application = application
+        self.port = int(port or os.getenv('PORT', 8000))
+
+    def _scope(self, request):
+        host = _host(request)
+        headers = [
+            (name.lower(), value) for name, value in request.raw_headers if name.lower() != b'host'
+        ]
+        headers.append((b'host', host.encode('latin-1')))
+        peer = request.transport.get_extra_info('peername') if request.transport else None
+        # Как и WSGI-мосту, Django передаётся путь без префикса монтирования (/api, /docs)
+        path = '/' + request.match_info.get('path_info', request.path.lstrip('/'))
+        return {
+            'type': 'http',
+            'asgi': {'version': '3.0', 'spec_version': '2.3'},
+            'http_version': f'{request.version.major}.{request.version.minor}',
+            'method': request.method,
+            'scheme': request.scheme,
+            'path': path,
+            'raw_path': path.encode('utf-8'),
+            'query_string': request.query_string.encode('latin-1'),
+            'root_path': '',
+            'headers': headers,
+            'client': tuple(peer[:2]) if peer else None,
+            'server': (host, self.port),
+        }
+
+    async def __call__(self, request):
+        finished = asyncio.Event()
+        status = 500
+        headers = CIMultiDict()
+        body = []
+        request_read = False
+
+        async def receive():
+            nonlocal request_read
+            if not request_read:
+                # Хотя бы одно сообщение http.request нужно и для запроса без тела
+                chunk = await request.content.readany()
+                request_read = request.content.at_eof()
+                return {'type': 'http.request', 'body': chunk, 'more_body': not request_read}
+            # Тело прочитано: Django ждёт здесь обрыва соединения, пока готовит ответ
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                for name, value in message.get('headers', ()):
+                    name = name.decode('latin-1')
+                    if name.lower() not in _SKIP_RESPONSE_HEADERS:
+                        headers.add(name, value.decode('latin-1'))
+            elif message['type'] == 'http.response.body':
+                body.append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    finished.set()
+
+        try:
+            await self.application(self._scope(request), receive, send)
+        finally:
+            finished.set()
+        # Ответ собирается целиком, чтобы middleware aiohttp (CORS) могли дописать заголовки
+        return web.Response(status=status, headers=headers, body=b''.join(body))
+
+
+def django_handler(interface=None):
+    """Обработчик aiohttp для Django: DJANGO_INTERFACE=wsgi (по умолчанию) или asgi"""
+    interface = interface or os.getenv('DJANGO_INTERFACE', 'wsgi')
+    if interface == 'asgi':
+        from quest_bot.asgi import application
+        return ASGIHandler(application)
+    from django.core.wsgi import get_wsgi_application
+    return FixedWSGIHandler(get_wsgi_application())
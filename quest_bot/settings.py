@@ -39,6 +39,9 @@ DEBUG = os.getenv('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
 
+# Токен для записи через API и для /bot/metrics
+API_TOKEN = os.getenv('API_TOKEN')
+
 
 # Application definition
 
@@ -88,12 +91,26 @@ WSGI_APPLICATION = 'quest_bot.wsgi.application'
 
 
 
+# Соединения переиспользуются между запросами и потоками бота, сломанные проверяются перед использованием
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 600))
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.getenv("DATABASE_URL")
+        default=os.getenv("DATABASE_URL"),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
     )
 }
 
+# Отдельная база для состояний FSM бота, например локальный SQLite на одном сервере:
+# FSM_DATABASE_URL=sqlite:////app/data/fsm.sqlite3, затем manage.py migrate --database fsm
+if os.getenv("FSM_DATABASE_URL"):
+    DATABASES['fsm'] = dj_database_url.parse(
+        os.getenv("FSM_DATABASE_URL"), conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True
+    )
+
+DATABASE_ROUTERS = ['core.routers.FSMRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
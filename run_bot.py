@@ -3,8 +3,6 @@ import os
 import logging
 from pathlib import Path
 from aiohttp import web, hdrs
-from aiohttp_wsgi import WSGIHandler
-from django.core.wsgi import get_wsgi_application
 import drf_yasg
 from aiogram import Bot, types
 from aiogram.client.default import DefaultBotProperties
@@ -31,6 +29,19 @@ bot = Bot(token=TELEGRAM_TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
 from bot.bot import dp, register_handlers  # register_handlers подключает admin и route routers
 register_handlers(dp)
 from bot.bot import dp
+from bot.sender import send_scheduler
+from bot.scheduler import message_scheduler
+from bot.geofence import location_throttle
+from bot.progress import progress_recorder
+from bot.update_queue import UpdateQueue
+from api.permissions import has_valid_token
+
+# Апдейты вебхука обрабатываются в фоне, чтобы сразу отвечать Telegram
+update_queue = UpdateQueue(
+    dp, bot,
+    workers=int(os.getenv('WEBHOOK_WORKERS', 16)),
+    max_pending=int(os.getenv('WEBHOOK_MAX_PENDING', 10000)),
+)
 
 # Monkey-patch Request.host, чтобы убрать ":порт"
 def _strip_port_host(self):
@@ -38,28 +49,9 @@ def _strip_port_host(self):
     return raw.split(':', 1)[0]
 web.Request.host = property(_strip_port_host)
 
-# WSGI обёртка для Django
-class FixedWSGIHandler(WSGIHandler):
-    def prepare_environ(self, request):
- # Построим стандартный WSGI-environ
-
-        environ = super().prepare_environ(request)
-
-        raw_host = request.headers.get(hdrs.HOST, '')
-        host = raw_host.split(':', 1)[0]
-        environ['HTTP_HOST'] = host
-        environ['SERVER_NAME'] = host
-        environ['SERVER_PORT'] = os.getenv('PORT', '8000')
-
-        environ['SCRIPT_NAME'] = ''
-
-
-        return environ
-
-
-# Настройка Django WSGI-приложения
-django_app = get_wsgi_application()
-wsgi_handler = FixedWSGIHandler(django_app)
+# Django API: через WSGI-мост, DJANGO_INTERFACE=asgi — через ASGI в том же цикле событий
+from quest_bot.aiohttp_django import django_handler  # noqa: E402
+django_app_handler = django_handler()
 
 # Пути к статическим файлам
 DRF_YASG_STATIC = Path(drf_yasg.__file__).resolve().parent / 'static' / 'drf-yasg'
@@ -91,24 +83,46 @@ async def simple_web_server():
         return web.Response(text="Bot is running")
     app.router.add_get('/', handle_root)
 
+    # Метрики очередей бота, отложенных сообщений и хранилища FSM — только с токеном API
+    async def handle_metrics(request):
+        if not has_valid_token(request.headers.get(hdrs.AUTHORIZATION)):
+            return web.Response(status=401, text="Unauthorized")
+        metrics = {
+            'sender': send_scheduler.metrics(),
+            'updates': update_queue.metrics(),
+            'scheduled': message_scheduler.metrics(),
+            'geofence': location_throttle.metrics(),
+            'progress': progress_recorder.metrics(),
+        }
+        if hasattr(dp.storage, 'metrics'):
+            metrics['fsm'] = dp.storage.metrics()
+        return web.json_response(metrics)
+    app.router.add_get('/bot/metrics', handle_metrics)
+
     # Swagger UI (DRF YASG)
     docs_app = web.Application()
     docs_app.router.add_static(
         '/static/drf-yasg/', str(DRF_YASG_STATIC), show_index=False
     )
-    docs_app.router.add_route('*', '/{path_info:.*}', wsgi_handler)
+    docs_app.router.add_route('*', '/{path_info:.*}', django_app_handler)
     app.add_subapp('/docs', docs_app)
 
     # Django API подприложение
-    app.router.add_route('*', '/api/{path_info:.*}', wsgi_handler)
+    app.router.add_route('*', '/api/{path_info:.*}', django_app_handler)
     # Telegram webhook endpoint
     async def handle_telegram_webhook(request):
         payload = await request.json()
         update = types.Update(**payload)
-        await dp.feed_update(bot, update)
+        if not update_queue.submit(update):
+            # Очередь переполнена — Telegram повторит доставку позже
+            return web.Response(status=503, text="Busy")
         return web.Response(text="OK")
     app.router.add_post('/telegram/webhook/', handle_telegram_webhook)
 
+    async def close_update_queue(app):
+        await update_queue.close()
+    app.on_cleanup.append(close_update_queue)
+
     # Catch-all для SPA
     async def handle_webapp(request):
         init_data = request.query.get('initData')
@@ -139,7 +153,7 @@ async def main():
     try:
         await dp.start_polling(bot)
     finally:
-        await runner.cleanup
+        await runner.cleanup()
 
 if __name__ == '__main__':
     asyncio.run(main())